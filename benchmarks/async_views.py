@@ -0,0 +1,45 @@
+"""
+Concurrency benchmark of the sync journey search against its async version.
+
+Start one server process so both endpoints get the same resources, with
+throttling out of the way, e.g.
+
+    THROTTLE_ANON_RATE=1000000/second THROTTLE_USER_RATE=1000000/second CONN_MAX_AGE=0 \\
+    GUNICORN_WORKERS=1 GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn train_service.asgi
+
+then compare requests/sec and p95 latency as the number of clients grows:
+
+    python benchmarks/async_views.py http://127.0.0.1:8000 --query "source=Lviv"
+"""
+import argparse
+
+from load_test import measure, percentile, request_headers
+
+ENDPOINTS = {
+    "sync": "/api/train_station/journeys/",
+    "async": "/api/train_station/async/journeys/",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base_url")
+    parser.add_argument("--query", default="", help="journey filters, e.g. source=Lviv")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("-d", "--duration", type=float, default=10, help="seconds per run")
+    parser.add_argument("--token", help="JWT access token")
+    args = parser.parse_args()
+
+    headers = request_headers(args.token)
+    print(f"{'clients':>7} {'endpoint':>8} {'req/s':>8} {'p95 ms':>8} {'errors':>7}")
+    for concurrency in args.concurrency:
+        for name, path in ENDPOINTS.items():
+            url = f"{args.base_url.rstrip('/')}{path}?{args.query}"
+            elapsed, latencies, statuses = measure(url, concurrency, args.duration, headers)
+            errors = sum(count for status, count in statuses.items() if status != 200)
+            p95 = percentile(latencies, 0.95) * 1000 if latencies else float("nan")
+            print(f"{concurrency:>7} {name:>8} {len(latencies) / elapsed:>8.1f} {p95:>8.1f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
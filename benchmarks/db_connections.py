@@ -0,0 +1,77 @@
+"""
+Per-request database overhead with and without persistent connections.
+
+Every simulated request runs Django's request_started/request_finished
+connection handling around one cheap query, first with CONN_MAX_AGE=0
+(a new connection per request) and then with the configured persistent
+connections and health checks.
+
+    python benchmarks/db_connections.py --requests 500
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "train_service.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import close_old_connections, connection  # noqa: E402
+
+from train_station.models import Station  # noqa: E402
+
+
+def simulate_requests(count, conn_max_age, health_checks):
+    connection.close()
+    connection.settings_dict["CONN_MAX_AGE"] = conn_max_age
+    connection.settings_dict["CONN_HEALTH_CHECKS"] = health_checks
+
+    timings = []
+    for _ in range(count):
+        started = time.perf_counter()
+        close_old_connections()
+        list(Station.objects.order_by("id")[:1])
+        close_old_connections()
+        timings.append(time.perf_counter() - started)
+
+    connection.close()
+    return timings
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    print(
+        f"{label:<32} mean {statistics.mean(timings) * 1000:7.2f} ms   "
+        f"p50 {timings[len(timings) // 2] * 1000:7.2f} ms   "
+        f"p99 {timings[int(len(timings) * 0.99)] * 1000:7.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    conn_max_age = connection.settings_dict["CONN_MAX_AGE"] or 60
+    vendor = connection.vendor
+
+    print(f"{args.requests} requests against {vendor}")
+    report("new connection per request", simulate_requests(args.requests, 0, False))
+    report(
+        f"persistent ({conn_max_age}s)",
+        simulate_requests(args.requests, conn_max_age, False),
+    )
+    report(
+        f"persistent ({conn_max_age}s) + checks",
+        simulate_requests(args.requests, conn_max_age, True),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Closed-loop HTTP load test for comparing serving setups.
+
+Each client thread keeps one connection open and sends the next request
+as soon as the previous response arrives, for the given duration.
+
+    python manage.py runserver 8000
+    python benchmarks/load_test.py http://127.0.0.1:8000/ready/
+
+    gunicorn train_service.wsgi
+    python benchmarks/load_test.py http://127.0.0.1:8000/ready/
+
+Authenticated endpoints take a JWT access token, e.g.
+    python benchmarks/load_test.py http://127.0.0.1:8000/api/train_station/journeys/ --token <access>
+(the default throttle rates answer most of those requests with 429,
+which shows up in the status counts)
+"""
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+
+def run_client(url, headers, deadline, results, lock):
+    parts = urlsplit(url)
+    connection_class = (
+        http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    )
+    path = parts.path or "/"
+    if parts.query:
+        path = f"{path}?{parts.query}"
+
+    connection = connection_class(parts.netloc, timeout=30)
+    latencies = []
+    statuses = Counter()
+
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            statuses[response.status] += 1
+            if response.getheader("Connection", "").lower() == "close":
+                connection.close()
+        except (OSError, http.client.HTTPException) as error:
+            statuses[type(error).__name__] += 1
+            connection.close()
+            continue
+        latencies.append(time.perf_counter() - started)
+
+    connection.close()
+    with lock:
+        results["latencies"].extend(latencies)
+        results["statuses"].update(statuses)
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def measure(url, concurrency, duration, headers):
+    """Return (seconds, sorted latencies, status counts) of a load test"""
+    results = {"latencies": [], "statuses": Counter()}
+    lock = threading.Lock()
+    started = time.perf_counter()
+    deadline = started + duration
+    clients = [
+        threading.Thread(target=run_client, args=(url, headers, deadline, results, lock))
+        for _ in range(concurrency)
+    ]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+
+    return time.perf_counter() - started, sorted(results["latencies"]), results["statuses"]
+
+
+def request_headers(token=None):
+    headers = {"Accept": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    return headers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url")
+    parser.add_argument("-c", "--concurrency", type=int, default=16, help="client threads")
+    parser.add_argument("-d", "--duration", type=float, default=15, help="seconds")
+    parser.add_argument("--token", help="JWT access token for authenticated endpoints")
+    args = parser.parse_args()
+
+    elapsed, latencies, statuses = measure(
+        args.url, args.concurrency, args.duration, request_headers(args.token)
+    )
+
+    print(f"{args.url} with {args.concurrency} clients for {elapsed:.1f}s")
+    print(f"requests/sec: {len(latencies) / elapsed:.1f}")
+    if latencies:
+        print(
+            "latency ms: "
+            f"mean {statistics.mean(latencies) * 1000:.1f}, "
+            f"p50 {percentile(latencies, 0.50) * 1000:.1f}, "
+            f"p95 {percentile(latencies, 0.95) * 1000:.1f}, "
+            f"p99 {percentile(latencies, 0.99) * 1000:.1f}"
+        )
+    print("responses:", ", ".join(f"{status}: {count}" for status, count in sorted(
+        statuses.items(), key=lambda item: str(item[0])
+    )))
+
+
+if __name__ == "__main__":
+    main()
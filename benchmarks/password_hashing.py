@@ -0,0 +1,89 @@
+"""
+Login throughput per core of the password hashers.
+
+Checks a password against a hash of each configured hasher in one thread
+for a few seconds, which is what a login costs on the core it runs on,
+then runs the same number of checks through the hashing pool from many
+threads at once to show the pool's total throughput and how many calls
+it turned away.
+
+    python benchmarks/password_hashing.py --seconds 3 --clients 64
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "train_service.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.hashers import check_password, get_hashers, make_password  # noqa: E402
+
+from user.hashers import HashingBusy, HashingPool  # noqa: E402
+
+PASSWORD = "correct horse battery staple"
+
+
+def checks_per_second(encoded, seconds):
+    checks = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        check_password(PASSWORD, encoded)
+        checks += 1
+    return checks / (time.perf_counter() - started)
+
+
+def pool_throughput(encoded, checks, clients):
+    pool = HashingPool(settings.PASSWORD_HASHING_WORKERS, settings.PASSWORD_HASHING_QUEUE_SIZE)
+
+    def login(_):
+        try:
+            return pool.run(check_password, PASSWORD, encoded)
+        except HashingBusy:
+            return None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        results = list(executor.map(login, range(checks)))
+    elapsed = time.perf_counter() - started
+
+    turned_away = results.count(None)
+    return (checks - turned_away) / elapsed, turned_away
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--clients", type=int, default=64)
+    args = parser.parse_args()
+
+    encoded = {}
+    for hasher in get_hashers():
+        try:
+            encoded[hasher.algorithm] = make_password(PASSWORD, hasher=hasher.algorithm)
+        except ValueError as error:
+            print(f"{hasher.algorithm:<16} skipped: {error}")
+
+    print(f"logins/s per core ({os.cpu_count()} cores)")
+    for algorithm, password in encoded.items():
+        print(f"{algorithm:<16} {checks_per_second(password, args.seconds):8.1f}")
+
+    preferred = get_hashers()[0].algorithm
+    checks = max(2 * args.clients, int(checks_per_second(encoded[preferred], 1) * args.seconds))
+    throughput, turned_away = pool_throughput(encoded[preferred], checks, args.clients)
+    print(
+        f"\n{preferred} through the pool ({settings.PASSWORD_HASHING_WORKERS} workers, "
+        f"{args.clients} clients): {throughput:.1f} logins/s, "
+        f"{turned_away} of {checks} turned away"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Gunicorn settings, loaded automatically when gunicorn starts in this directory.
+
+WSGI with threaded workers:
+    gunicorn train_service.wsgi
+ASGI with uvicorn workers:
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn train_service.asgi
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+# A sync worker is killed when one request runs longer than the timeout,
+# which cut off streaming exports; a gthread worker's main loop keeps
+# reporting to the master while its threads serve long responses
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+
+# Restart each worker after a number of requests to bound memory growth,
+# jittered so the workers don't all restart at the same time
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+# Import Django once in the master, workers fork with it already loaded
+preload_app = True
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    # Workers don't share a cache in their own memory, catalog invalidation,
+    # throttles, replica pins and login limits would each apply to one worker
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "train_service.settings")
+    from django.conf import settings
+
+    backend = settings.CACHES["default"]["BACKEND"]
+    if server.cfg.workers > 1 and backend.endswith("LocMemCache"):
+        raise RuntimeError(
+            "Set CACHE_BACKEND to a shared cache, e.g. "
+            "django.core.cache.backends.redis.RedisCache, to run more than one worker"
+        )
+
+
+def post_fork(server, worker):
+    # Database connections opened while preloading can't be shared between processes
+    from django.db import connections
+
+    connections.close_all()
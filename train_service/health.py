@@ -0,0 +1,53 @@
+"""
+Liveness and readiness probes for load balancers and orchestrators.
+
+/health/ only shows the process answers requests. /ready/ also checks
+that the database and the cache respond, so an instance is taken out
+of rotation while its backing services are unreachable.
+"""
+import logging
+
+from django.core.cache import cache
+from django.db import connections
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+logger = logging.getLogger(__name__)
+
+READY_CHECK_KEY = "health:ready"
+
+
+def check_database():
+    with connections["default"].cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+
+
+def check_cache():
+    cache.set(READY_CHECK_KEY, 1, 10)
+    if cache.get(READY_CHECK_KEY) != 1:
+        raise RuntimeError("cache did not return the stored value")
+
+
+@require_GET
+def health(request):
+    return JsonResponse({"status": "ok"})
+
+
+@require_GET
+def ready(request):
+    checks = {}
+    for name, check in (("database", check_database), ("cache", check_cache)):
+        try:
+            check()
+        except Exception:
+            logger.exception("Readiness check %s failed", name)
+            checks[name] = "unavailable"
+        else:
+            checks[name] = "ok"
+
+    is_ready = all(result == "ok" for result in checks.values())
+    return JsonResponse(
+        {"status": "ok" if is_ready else "unavailable", "checks": checks},
+        status=200 if is_ready else 503,
+    )
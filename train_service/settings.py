@@ -7,15 +7,25 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+def env_bool(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
 SECRET_KEY = os.environ.get("DJANGO_SECRET_KEY", default="default_key")
 
 
-DEBUG = os.environ.get("DEBUG", default=False)
+DEBUG = env_bool("DEBUG")
+
+ALLOWED_HOSTS = [host for host in os.environ.get("ALLOWED_HOSTS", "").split(",") if host]
 
-ALLOWED_HOSTS = []
+# nginx terminates the client connection and forwards the original scheme
+SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 
 
 INSTALLED_APPS = [
@@ -33,35 +43,96 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "user.authentication.StatelessJWTAuthentication",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle"
+        "train_station.throttling.AnonRateThrottle",
+        "train_station.throttling.UserRateThrottle",
+        "train_station.throttling.ScopedRateThrottle",
     ],
     "DEFAULT_THROTTLE_RATES": {
-        "anon": "10/minute",
-        "user": "30/minute"
+        "anon": os.environ.get("THROTTLE_ANON_RATE", "10/minute"),
+        "user": os.environ.get("THROTTLE_USER_RATE", "30/minute"),
+        # Scopes of views, used instead of the anon and user rates
+        "catalog": os.environ.get("THROTTLE_CATALOG_RATE", "120/minute"),
+        "booking": os.environ.get("THROTTLE_BOOKING_RATE", "10/minute"),
     }
 }
 
+SEAT_HOLD_TTL = timedelta(minutes=int(os.environ.get("SEAT_HOLD_TTL_MINUTES", 10)))
+
+# Milliseconds a booking waits for another booking of the same journey
+# before it gets 409 (PostgreSQL only)
+SEAT_LOCK_TIMEOUT_MS = int(os.environ.get("SEAT_LOCK_TIMEOUT_MS", 2000))
+
+# Rows fetched per round trip of the streaming exports
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 2000))
+
+# Seconds a timetable day version is kept, the longest a connection search
+# served by a worker without a shared cache misses journeys saved elsewhere
+TIMETABLE_VERSION_TIMEOUT = int(os.environ.get("TIMETABLE_VERSION_TIMEOUT", 300))
+
+# Rows of a timetable uploaded to the import endpoint, larger files are
+# loaded with "manage.py import_timetable"
+TIMETABLE_IMPORT_MAX_ROWS = int(os.environ.get("TIMETABLE_IMPORT_MAX_ROWS", 50000))
+
+CONNECTION_MIN_TRANSFER = timedelta(minutes=int(os.environ.get("CONNECTION_MIN_TRANSFER_MINUTES", 15)))
+
+# Days ahead that materialize_journeys creates the journeys of templates for
+JOURNEY_TEMPLATE_HORIZON_DAYS = int(os.environ.get("JOURNEY_TEMPLATE_HORIZON_DAYS", 60))
+# Days ahead that searches may materialize journeys of templates for
+JOURNEY_TEMPLATE_MAX_LOOKAHEAD_DAYS = int(os.environ.get("JOURNEY_TEMPLATE_MAX_LOOKAHEAD_DAYS", 365))
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
-    "ROTATE_REFRESH_TOKENS": True
+    "ROTATE_REFRESH_TOKENS": True,
+    "TOKEN_OBTAIN_SERIALIZER": "user.serializers.TokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "user.serializers.TokenRefreshSerializer",
+    "TOKEN_VERIFY_SERIALIZER": "user.serializers.TokenVerifySerializer",
 }
 
+# Seconds a user's token version is trusted before it is read again,
+# the longest a revoked token keeps working
+TOKEN_VERSION_CACHE_SECONDS = int(os.environ.get("TOKEN_VERSION_CACHE_SECONDS", 30))
+
+# Seconds between syncs of the revoked token filter of a process,
+# the longest a token revoked by another process keeps working
+REVOCATION_SYNC_SECONDS = int(os.environ.get("REVOCATION_SYNC_SECONDS", 5))
+REVOCATION_BLOOM_CAPACITY = int(os.environ.get("REVOCATION_BLOOM_CAPACITY", 100000))
+
 MIDDLEWARE = [
+    "train_station.instrumentation.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "train_station.replicas.ReplicaPinMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Share of requests whose queries and timings are measured, sent in a
+# Server-Timing header and logged (0 turns the instrumentation off)
+INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get("INSTRUMENTATION_SAMPLE_RATE", 0))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "train_station.instrumentation": {
+            "handlers": ["console"],
+            "level": "INFO",
+            "propagate": False,
+        },
+    },
+}
+
 ROOT_URLCONF = "train_service.urls"
 
 AUTH_USER_MODEL = "user.User"
@@ -92,9 +163,72 @@ DATABASES = {
         "NAME": os.environ["POSTGRES_DB"],
         "USER": os.environ["POSTGRES_USER"],
         "PASSWORD": os.environ["POSTGRES_PASSWORD"],
+        "PORT": os.environ.get("POSTGRES_PORT", ""),
+        # Seconds a connection is kept for the next requests of the same worker,
+        # 0 closes it after every request (use 0 with ASGI workers)
+        "CONN_MAX_AGE": int(os.environ.get("CONN_MAX_AGE", 60)),
+        # Check a reused connection is still alive before the first query of a request
+        "CONN_HEALTH_CHECKS": env_bool("CONN_HEALTH_CHECKS", True),
+        # PgBouncer in transaction mode can't keep cursors open between transactions
+        "DISABLE_SERVER_SIDE_CURSORS": env_bool("PGBOUNCER"),
+        "OPTIONS": {
+            "connect_timeout": int(os.environ.get("POSTGRES_CONNECT_TIMEOUT", 5)),
+        },
     }
 }
 
+# Read replicas of the default database, comma separated hosts
+REPLICA_DATABASES = []
+for index, host in enumerate(filter(None, os.environ.get("POSTGRES_REPLICA_HOSTS", "").split(","))):
+    alias = f"replica_{index}"
+    DATABASES[alias] = {**DATABASES["default"], "HOST": host, "TEST": {"MIRROR": "default"}}
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ["train_station.replicas.ReplicaRouter"]
+
+# Seconds a user reads from the primary after writing
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", 10))
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get("REPLICA_MAX_LAG_SECONDS", 5))
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    }
+}
+
+CATALOG_CACHE_TIMEOUT = int(os.environ.get("CATALOG_CACHE_TIMEOUT", 300))
+
+
+# scrypt, or argon2 with argon2-cffi installed; logins upgrade hashes of the other hashers
+PASSWORD_HASHER = os.environ.get("PASSWORD_HASHER", "scrypt")
+PASSWORD_HASHERS = [
+    "user.hashers.ScryptPasswordHasher",
+    "user.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+]
+if PASSWORD_HASHER == "argon2":
+    PASSWORD_HASHERS[:2] = reversed(PASSWORD_HASHERS[:2])
+
+# About 75 ms and 16 MB per hash on one core, a quarter of Django's PBKDF2
+PASSWORD_SCRYPT_WORK_FACTOR = int(os.environ.get("PASSWORD_SCRYPT_WORK_FACTOR", 2**14))
+PASSWORD_SCRYPT_BLOCK_SIZE = int(os.environ.get("PASSWORD_SCRYPT_BLOCK_SIZE", 8))
+PASSWORD_SCRYPT_PARALLELISM = int(os.environ.get("PASSWORD_SCRYPT_PARALLELISM", 1))
+PASSWORD_ARGON2_TIME_COST = int(os.environ.get("PASSWORD_ARGON2_TIME_COST", 2))
+PASSWORD_ARGON2_MEMORY_COST = int(os.environ.get("PASSWORD_ARGON2_MEMORY_COST", 19 * 1024))
+PASSWORD_ARGON2_PARALLELISM = int(os.environ.get("PASSWORD_ARGON2_PARALLELISM", 1))
+
+# Threads per process that hash passwords (0 hashes in the request thread)
+# and the hashing calls that may wait for them before logins get 429
+PASSWORD_HASHING_WORKERS = int(os.environ.get("PASSWORD_HASHING_WORKERS", 2))
+PASSWORD_HASHING_QUEUE_SIZE = int(os.environ.get("PASSWORD_HASHING_QUEUE_SIZE", 32))
+
+# Hashing calls running or waiting at once across all processes, counted in
+# the shared cache (0 leaves only the per-process limits above)
+PASSWORD_HASHING_MAX_CONCURRENT = int(os.environ.get("PASSWORD_HASHING_MAX_CONCURRENT", 16))
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -121,9 +255,34 @@ USE_I18N = True
 USE_TZ = False
 
 
-STATIC_URL = "static/"
+STATIC_URL = "/static/"
+STATIC_ROOT = os.environ.get("STATIC_ROOT", BASE_DIR / "static")
 
 MEDIA_URL = "/media/"
-MEDIA_ROOT = BASE_DIR / "media"
+MEDIA_ROOT = os.environ.get("MEDIA_ROOT", BASE_DIR / "media")
+
+# Upload limits of train images, checked while the body is still streaming
+TRAIN_IMAGE_MAX_SIZE = int(os.environ.get("TRAIN_IMAGE_MAX_SIZE_MB", 10)) * 1024 * 1024
+TRAIN_IMAGE_MAX_DIMENSION = int(os.environ.get("TRAIN_IMAGE_MAX_DIMENSION", 6000))
+
+# Resumable uploads in progress, outside MEDIA_ROOT so they are never served,
+# and the hours an upload may pause before it is dropped
+TRAIN_IMAGE_PARTIAL_DIR = os.environ.get(
+    "TRAIN_IMAGE_PARTIAL_DIR", BASE_DIR / "uploads" / "partial"
+)
+TRAIN_IMAGE_PARTIAL_UPLOAD_HOURS = int(os.environ.get("TRAIN_IMAGE_PARTIAL_UPLOAD_HOURS", 24))
+
+# Bounding boxes of the train image thumbnails, each stored as WebP and JPEG
+TRAIN_THUMBNAIL_SIZES = {
+    "small": (160, 120),
+    "medium": (480, 360),
+}
+
+# Threads encoding thumbnails in the background, 0 encodes them inline
+THUMBNAIL_WORKERS = int(os.environ.get("THUMBNAIL_WORKERS", 2))
+
+# Decoded images, up to TRAIN_IMAGE_MAX_DIMENSION square, waiting for a
+# thumbnail worker before uploads are refused with 503
+THUMBNAIL_QUEUE_SIZE = int(os.environ.get("THUMBNAIL_QUEUE_SIZE", 4))
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
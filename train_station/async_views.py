@@ -0,0 +1,175 @@
+"""
+Async versions of the hot read endpoints, for serving through ASGI.
+
+They return the same data as the journey list/detail and station list
+viewsets, with the same filters, authentication and throttling, but
+load it with the async ORM so a request waiting on the database does
+not hold a worker thread. DRF 3.14 views are sync only, so these are
+plain Django async views that reuse the DRF serializers on fully loaded
+objects.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, JsonResponse
+from rest_framework.exceptions import APIException, MethodNotAllowed, NotFound, Throttled
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from train_station.cache import catalog_cache_key
+from train_station.filters import filter_journeys, filter_stations
+from train_station.instrumentation import serialized
+from train_station.pagination import DefaultPagination
+from train_station.replicas import reading_from, select_replica
+from train_station.schedules import materialize_searched_day
+from train_station.serializers import (
+    StationSerializer,
+    StationNearSerializer,
+    JourneyListSerializer,
+    JourneyDetailSerializer,
+)
+from train_station.views import StationViewSet, JourneyViewSet
+
+
+def authenticate(request):
+    """Set request.user with the authentication classes of the viewsets"""
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = authentication_class().authenticate(request)
+        if result is not None:
+            request.user = result[0]
+            return
+
+    request.user = AnonymousUser()
+
+
+def check_throttles(request, view):
+    for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+        throttle = throttle_class()
+        if not throttle.allow_request(request, view):
+            raise Throttled(throttle.wait())
+
+
+def prepare_request(request, view):
+    """Authenticate and throttle the request, return the database to read from"""
+    authenticate(request)
+    check_throttles(request, view)
+    return select_replica(request.method, request.user.id)
+
+
+def error_response(exception):
+    detail = exception.detail
+    data = detail if isinstance(detail, (list, dict)) else {"detail": detail}
+    response = JsonResponse(data, status=exception.status_code, safe=False)
+    if getattr(exception, "wait", None):
+        response["Retry-After"] = str(int(exception.wait))
+    if exception.status_code == 401:
+        authentication = api_settings.DEFAULT_AUTHENTICATION_CLASSES[0]()
+        response["WWW-Authenticate"] = authentication.authenticate_header(None)
+    return response
+
+
+def async_api_view(view):
+    """Run the view after authentication and throttling, with DRF style error responses"""
+
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return error_response(MethodNotAllowed(request.method))
+
+        try:
+            replica = await sync_to_async(prepare_request)(request, api_view)
+            with reading_from(replica):
+                return await view(request, *args, **kwargs)
+        except Http404:
+            return error_response(NotFound())
+        except APIException as exception:
+            return error_response(exception)
+
+    api_view = functools.wraps(view)(wrapper)
+    return api_view
+
+
+async def paginate(request, queryset):
+    """Return the page of objects and the response builder, like DefaultPagination"""
+    paginator = DefaultPagination()
+    try:
+        page = int(request.GET.get(paginator.page_query_param, 1))
+        page_size = min(
+            int(request.GET.get(paginator.page_size_query_param, paginator.page_size)),
+            paginator.max_page_size,
+        )
+    except ValueError:
+        raise NotFound("Invalid page.")
+    if page < 1 or page_size < 1:
+        raise NotFound("Invalid page.")
+
+    count = await queryset.acount()
+    offset = (page - 1) * page_size
+    if offset >= count and page != 1:
+        raise NotFound("Invalid page.")
+
+    objects = [obj async for obj in queryset[offset:offset + page_size].aiterator()]
+
+    url = request.build_absolute_uri()
+    next_url = None
+    if offset + page_size < count:
+        next_url = replace_query_param(url, paginator.page_query_param, page + 1)
+    previous_url = None
+    if page == 2:
+        previous_url = remove_query_param(url, paginator.page_query_param)
+    elif page > 2:
+        previous_url = replace_query_param(url, paginator.page_query_param, page - 1)
+
+    def response(results):
+        return JsonResponse({
+            "count": count,
+            "next": next_url,
+            "previous": previous_url,
+            "results": results,
+        })
+
+    return objects, response
+
+
+@async_api_view
+async def station_list(request):
+    """Stations filtered by ?name and ?near, served from the catalog cache"""
+    key = await sync_to_async(catalog_cache_key)(request)
+    content = await cache.aget(key)
+    if content is not None:
+        return HttpResponse(content, content_type="application/json")
+
+    queryset = await sync_to_async(filter_stations)(StationViewSet.queryset, request.GET)
+    serializer_class = StationNearSerializer if request.GET.get("near") else StationSerializer
+
+    stations, response = await paginate(request, queryset)
+    response = response(serialized(serializer_class(stations, many=True, context={"request": request})))
+    await cache.aset(key, response.content, settings.CATALOG_CACHE_TIMEOUT)
+    return response
+
+
+station_list.throttle_scope = StationViewSet.throttle_scope
+
+
+@async_api_view
+async def journey_list(request):
+    """Journeys filtered like the journey list endpoint, paginated by page number"""
+    if request.user.is_authenticated:
+        await sync_to_async(materialize_searched_day)(request.GET.get("departure_date"))
+    queryset = filter_journeys(JourneyViewSet.queryset, request.GET)
+
+    journeys, response = await paginate(request, queryset)
+    return response(serialized(JourneyListSerializer(journeys, many=True, context={"request": request})))
+
+
+@async_api_view
+async def journey_detail(request, pk):
+    """A journey with its route, train, crew and taken places"""
+    try:
+        journey = await JourneyViewSet.queryset.prefetch_related("crew", "tickets").aget(pk=pk)
+    except JourneyViewSet.queryset.model.DoesNotExist:
+        raise Http404
+
+    return JsonResponse(serialized(JourneyDetailSerializer(journey, context={"request": request})))
@@ -0,0 +1,58 @@
+"""
+Versioned response cache for the read-mostly catalog endpoints.
+
+Every cached list response is stored under the current catalog version,
+and any change to a station, route, train type or train bumps the version,
+so stale entries are never read again and simply expire.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from train_station.replicas import pin_to_primary
+
+CATALOG_VERSION_KEY = "catalog:version"
+
+
+def catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Start from the clock so a lost version key never reuses old entries
+        cache.add(CATALOG_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def invalidate_catalog():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        catalog_version()
+    # Refill the cache from the primary until the replicas caught up
+    pin_to_primary()
+
+
+def catalog_cache_key(request):
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    url = f"{request.get_host()}{request.path}?{query}"
+    digest = hashlib.md5(url.encode()).hexdigest()
+    return f"catalog:{catalog_version()}:{digest}"
+
+
+class CachedListMixin:
+    """Serve list responses from the cache until a catalog model changes"""
+
+    def list(self, request, *args, **kwargs):
+        key = catalog_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.CATALOG_CACHE_TIMEOUT)
+        return response
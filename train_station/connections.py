@@ -0,0 +1,227 @@
+"""
+Multi-leg connection search over the journey timetable.
+
+Every journey runs along a single route, so it is one elementary
+connection (source, destination, departure, arrival) of the timetable.
+Connections are kept in memory per departure day, for the
+MAX_CACHED_DAYS most recently searched days, and reloaded only for the
+days whose cache version changed, so a search never queries the
+journeys table once its days are loaded. Versions live in the shared
+cache for TIMETABLE_VERSION_TIMEOUT seconds; with a per-process cache a
+worker misses the changes made in other workers for at most that long.
+
+The search works in rounds like RAPTOR: round k extends the arrivals of
+round k - 1 by one more journey, so round k holds the earliest arrivals
+with exactly k - 1 transfers. The first round that reaches the
+destination gives the fewest-transfer itinerary and the last improving
+round the earliest arrival.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+
+from train_station.cache import catalog_version
+from train_station.models import Journey
+from train_station.replicas import pin_to_primary
+
+Connection = namedtuple(
+    "Connection",
+    ["departure_time", "arrival_time", "source_id", "destination_id", "journey_id"],
+)
+Itinerary = namedtuple("Itinerary", ["departure_time", "arrival_time", "legs"])
+
+# Days of connections a process keeps, the least recently searched go first
+MAX_CACHED_DAYS = 60
+
+
+def day_version_key(day):
+    # Routes are part of the catalog, so a route change reloads every day
+    return f"timetable:{catalog_version()}:{day.isoformat()}"
+
+
+def invalidate_timetable_days(days):
+    for day in days:
+        try:
+            cache.incr(day_version_key(day))
+        except ValueError:
+            pass
+    # Reload the days from the primary until the replicas caught up
+    pin_to_primary()
+
+
+class TimetableIndex:
+    """Connections grouped by departure day, sorted by departure time"""
+
+    def __init__(self):
+        self._days = OrderedDict()
+        self._lock = threading.Lock()
+
+    def day_versions(self, days):
+        keys = {day: day_version_key(day) for day in days}
+        versions = cache.get_many(keys.values())
+
+        for day, key in keys.items():
+            if key not in versions:
+                cache.add(key, int(time.time() * 1000), settings.TIMETABLE_VERSION_TIMEOUT)
+                versions[key] = cache.get(key)
+
+        return {day: versions[key] for day, key in keys.items()}
+
+    def load_days(self, days):
+        start = datetime.combine(min(days), datetime.min.time())
+        end = datetime.combine(max(days), datetime.min.time()) + timedelta(days=1)
+        loaded = {day: [] for day in days}
+
+        rows = (
+            Journey.objects
+            .filter(departure_time__gte=start, departure_time__lt=end)
+            .order_by("departure_time")
+            .values_list(
+                "departure_time",
+                "arrival_time",
+                "route__source_id",
+                "route__destination_id",
+                "id",
+            )
+        )
+        for row in rows:
+            connection = Connection(*row)
+            day = connection.departure_time.date()
+            if day in loaded:
+                loaded[day].append(connection)
+
+        return loaded
+
+    def connections(self, first_day, last_day):
+        days = [
+            first_day + timedelta(days=offset)
+            for offset in range((last_day - first_day).days + 1)
+        ]
+        versions = self.day_versions(days)
+
+        found = {}
+        with self._lock:
+            for day in days:
+                cached = self._days.get(day)
+                if cached is not None and cached[0] == versions[day]:
+                    self._days.move_to_end(day)
+                    found[day] = cached[1]
+
+        stale = [day for day in days if day not in found]
+        if stale:
+            # Loaded without the lock, so searches of other days don't wait for it
+            loaded = self.load_days(stale)
+            with self._lock:
+                for day, connections in loaded.items():
+                    self._days[day] = (versions[day], connections)
+                    self._days.move_to_end(day)
+                while len(self._days) > MAX_CACHED_DAYS:
+                    self._days.popitem(last=False)
+            found.update(loaded)
+
+        return [connection for day in days for connection in found[day]]
+
+
+timetable = TimetableIndex()
+
+
+def search_connections(
+    connections,
+    source_id,
+    destination_id,
+    earliest_departure,
+    latest_departure,
+    min_transfer,
+    max_legs,
+):
+    """
+    Return the Pareto-optimal itineraries as {number of legs: Itinerary},
+    fewer legs always arriving later than more legs. The first leg has to
+    leave between earliest_departure and latest_departure.
+    """
+    if source_id == destination_id:
+        return {}
+
+    first = bisect_left([c.departure_time for c in connections], earliest_departure)
+    connections = connections[first:]
+
+    # labels[k][station] = (arrival time, connection used in round k or None)
+    labels = [{source_id: (earliest_departure, None)}]
+    itineraries = {}
+
+    for legs in range(1, max_legs + 1):
+        previous = labels[-1]
+        current = {station: (arrival, None) for station, (arrival, _) in previous.items()}
+        improved = False
+
+        for connection in connections:
+            reached = previous.get(connection.source_id)
+            if reached is None:
+                continue
+
+            ready = reached[0]
+            if connection.source_id == source_id:
+                if connection.departure_time >= latest_departure:
+                    continue
+            else:
+                ready += min_transfer
+            if connection.departure_time < ready:
+                continue
+
+            best = current.get(connection.destination_id)
+            if best is None or connection.arrival_time < best[0]:
+                current[connection.destination_id] = (connection.arrival_time, connection)
+                improved = True
+
+        labels.append(current)
+        if not improved:
+            break
+
+        target = current.get(destination_id)
+        if target is not None and target[1] is not None:
+            itineraries[legs] = build_itinerary(labels, destination_id)
+
+    return itineraries
+
+
+def build_itinerary(labels, destination_id):
+    legs = []
+    station = destination_id
+    for round_labels in reversed(labels[1:]):
+        connection = round_labels[station][1]
+        if connection is None:
+            continue
+        legs.append(connection)
+        station = connection.source_id
+
+    legs.reverse()
+    return Itinerary(legs[0].departure_time, legs[-1].arrival_time, legs)
+
+
+def find_connections(source_id, destination_id, date, min_transfer, max_transfers):
+    """
+    Search itineraries departing on `date`, letting them continue
+    through the following day
+    """
+    start = datetime.combine(date, datetime.min.time())
+    connections = timetable.connections(date, date + timedelta(days=1))
+    itineraries = search_connections(
+        connections,
+        source_id,
+        destination_id,
+        start,
+        start + timedelta(days=1),
+        min_transfer,
+        max_transfers + 1,
+    )
+    if not itineraries:
+        return None, None
+
+    earliest_arrival = itineraries[max(itineraries)]
+    fewest_transfers = itineraries[min(itineraries)]
+    return earliest_arrival, fewest_transfers
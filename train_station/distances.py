@@ -0,0 +1,305 @@
+"""
+Station-to-station distances computed in batches with NumPy.
+
+geodesic_km() is a vectorized Vincenty inverse on the WGS-84 ellipsoid,
+so it agrees with geopy.distance.geodesic to well under a metre while
+handling whole arrays of coordinates per call. DistanceMatrix keeps the
+pairwise distances of all stations in memory. New stations are appended
+as one row and column, computed against all stations in one call and
+written into spare capacity of the matrix, which is only copied into a
+larger one when the spare rows run out, so adding a station costs O(N)
+amortized instead of copying the whole O(N^2) matrix. After
+station coordinates change the whole matrix is rebuilt in a background
+thread, once the transaction that noticed the change commits; until then
+distances are computed directly, so a request never waits for the
+O(N^2) build.
+"""
+import logging
+import math
+import threading
+import time
+
+import geopy.distance
+import numpy as np
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Q
+
+from train_station import geohash
+from train_station.models import Station
+
+logger = logging.getLogger(__name__)
+
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = (1 - WGS84_F) * WGS84_A
+
+COORDINATES_VERSION_KEY = "stations:coordinates:version"
+
+# Rows of the matrix computed per NumPy batch, bounds temporary memory
+ROWS_PER_BATCH = 256
+
+# Rows and columns allocated per station, the spare ones take new stations;
+# growing by a share of the size keeps the copies rare, memory grows by its square
+GROWTH_FACTOR = 1.25
+MIN_CAPACITY = 64
+
+# Seconds before a scheduled rebuild that never started, e.g. because its
+# transaction rolled back, may be scheduled again
+REBUILD_RETRY_SECONDS = 60
+
+
+def geodesic_km(lat1, lon1, lat2, lon2, iterations=200, tolerance=1e-12):
+    """Return the geodesic distances in km between broadcastable coordinate arrays"""
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(
+        *(np.radians(np.asarray(value, dtype=np.float64)) for value in (lat1, lon1, lat2, lon2))
+    )
+    u1 = np.arctan((1 - WGS84_F) * np.tan(lat1))
+    u2 = np.arctan((1 - WGS84_F) * np.tan(lat2))
+    sin_u1, cos_u1 = np.sin(u1), np.cos(u1)
+    sin_u2, cos_u2 = np.sin(u2), np.cos(u2)
+
+    delta_lon = lon2 - lon1
+    lam = delta_lon.copy()
+    converged = np.zeros(lam.shape, dtype=bool)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(iterations):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(
+                cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam
+            )
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            cos_2sigma_m = np.where(
+                cos2_alpha == 0, 0.0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha
+            )
+            c = WGS84_F / 16 * cos2_alpha * (4 + WGS84_F * (4 - 3 * cos2_alpha))
+            previous = lam
+            lam = delta_lon + (1 - c) * WGS84_F * sin_alpha * (
+                sigma + c * sin_sigma * (
+                    cos_2sigma_m + c * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+                )
+            )
+            converged = np.abs(lam - previous) < tolerance
+            if converged.all():
+                break
+
+        u_sq = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+        a = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+        b = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+        delta_sigma = b * sin_sigma * (
+            cos_2sigma_m + b / 4 * (
+                cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+                - b / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+            )
+        )
+        distance = np.array(WGS84_B * a * (sigma - delta_sigma) / 1000)
+
+    # Vincenty does not converge for nearly antipodal points
+    for index in map(tuple, np.argwhere(~converged)):
+        distance[index] = geopy.distance.geodesic(
+            (np.degrees(lat1[index]), np.degrees(lon1[index])),
+            (np.degrees(lat2[index]), np.degrees(lon2[index])),
+        ).km
+
+    return distance
+
+
+def invalidate_distances():
+    try:
+        cache.incr(COORDINATES_VERSION_KEY)
+    except ValueError:
+        coordinates_version()
+
+
+def coordinates_version():
+    version = cache.get(COORDINATES_VERSION_KEY)
+    if version is None:
+        cache.add(COORDINATES_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(COORDINATES_VERSION_KEY)
+    return version
+
+
+def station_coordinates(queryset):
+    stations = list(queryset.order_by("pk").values_list("pk", "latitude", "longitude"))
+    ids = [station[0] for station in stations]
+    coordinates = np.array([station[1:] for station in stations], dtype=np.float64).reshape(-1, 2)
+    return ids, coordinates
+
+
+def matrix_capacity(size):
+    return max(MIN_CAPACITY, int(size * GROWTH_FACTOR))
+
+
+class DistanceMatrix:
+    """
+    Pairwise distances in km between all stations, indexed by station id.
+
+    The matrix may have more rows and columns than there are stations,
+    only the first len(coordinates) of each are filled.
+    """
+
+    def __init__(self):
+        self._version = None
+        self._state = ({}, np.empty((0, 2)), np.empty((0, 0), dtype=np.float32))
+        self._scheduled_at = -math.inf
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def build():
+        ids, coordinates = station_coordinates(Station.objects.all())
+        latitudes, longitudes = coordinates[:, 0], coordinates[:, 1]
+
+        capacity = matrix_capacity(len(ids))
+        matrix = np.empty((capacity, capacity), dtype=np.float32)
+        for start in range(0, len(ids), ROWS_PER_BATCH):
+            rows = slice(start, min(start + ROWS_PER_BATCH, len(ids)))
+            matrix[rows, :len(ids)] = geodesic_km(
+                latitudes[rows, np.newaxis],
+                longitudes[rows, np.newaxis],
+                latitudes[np.newaxis, :],
+                longitudes[np.newaxis, :],
+            )
+
+        positions = {station_id: position for position, station_id in enumerate(ids)}
+        return positions, coordinates, matrix
+
+    def rebuild(self, version):
+        state = self.build()
+        with self._lock:
+            self._state = state
+            self._version = version
+
+    def rebuild_in_background(self, version):
+        def run():
+            try:
+                self.rebuild(version)
+            except Exception:
+                logger.exception("Failed to rebuild the distance matrix")
+            finally:
+                # The thread outlives the request, don't leave its connection open
+                connections.close_all()
+
+        threading.Thread(target=run, name="distance-matrix", daemon=True).start()
+
+    def schedule_rebuild(self, version):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._scheduled_at < REBUILD_RETRY_SECONDS:
+                return
+            self._scheduled_at = now
+
+        # The thread reads with its own connection, so it has to see committed stations
+        transaction.on_commit(lambda: self.rebuild_in_background(version))
+
+    def add_stations(self, station_ids):
+        """Append the rows and columns of stations created after the build"""
+        ids, added = station_coordinates(Station.objects.filter(pk__in=station_ids))
+        if not ids:
+            return
+
+        positions, coordinates, matrix = self._state
+        known = len(coordinates)
+        coordinates = np.concatenate([coordinates, added])
+        size = len(coordinates)
+        rows = geodesic_km(
+            added[:, 0, np.newaxis],
+            added[:, 1, np.newaxis],
+            coordinates[np.newaxis, :, 0],
+            coordinates[np.newaxis, :, 1],
+        )
+
+        if size > len(matrix):
+            capacity = matrix_capacity(size)
+            grown = np.empty((capacity, capacity), dtype=np.float32)
+            grown[:known, :known] = matrix[:known, :known]
+            matrix = grown
+        # Readers of the previous state only look at the first `known` rows and columns
+        matrix[known:size, :size] = rows
+        matrix[:size, known:size] = rows.T
+
+        positions = {**positions, **{station_id: known + index for index, station_id in enumerate(ids)}}
+        self._state = (positions, coordinates, matrix)
+
+    def distance(self, source_id, destination_id):
+        """Return the distance in km, or None for an unknown station or while the matrix is stale"""
+        version = coordinates_version()
+        if version != self._version:
+            self.schedule_rebuild(version)
+            return None
+
+        with self._lock:
+            missing = [
+                station_id for station_id in (source_id, destination_id)
+                if station_id not in self._state[0]
+            ]
+            if missing:
+                self.add_stations(missing)
+            positions, _, matrix = self._state
+
+        source = positions.get(source_id)
+        destination = positions.get(destination_id)
+        if source is None or destination is None:
+            return None
+
+        return float(matrix[source, destination])
+
+
+distance_matrix = DistanceMatrix()
+
+
+def station_distance(source, destination):
+    """Distance between two stations in km, rounded to 100 m"""
+    distance = distance_matrix.distance(source.id, destination.id)
+    if distance is None:
+        distance = geodesic_km(
+            source.latitude, source.longitude, destination.latitude, destination.longitude
+        )
+    return round(float(distance), 1)
+
+
+def stations_within(queryset, latitude, longitude, radius_km):
+    """
+    Return [(station id, km)] of the stations within radius_km, nearest
+    first. Candidates come from geohash prefix lookups, so only the
+    stations in the cells around the point are loaded.
+    """
+    cells = geohash.covering_cells(latitude, longitude, radius_km)
+    if cells is not None:
+        query = Q(pk__in=[])
+        for cell in cells:
+            query |= Q(geohash__startswith=cell)
+        queryset = queryset.filter(query)
+
+    candidates = list(queryset.values_list("pk", "latitude", "longitude"))
+    if not candidates:
+        return []
+
+    ids, latitudes, longitudes = zip(*candidates)
+    distances = geodesic_km(latitude, longitude, np.array(latitudes), np.array(longitudes))
+    order = np.argsort(distances, kind="stable")
+
+    return [
+        (ids[index], float(distances[index]))
+        for index in order
+        if distances[index] <= radius_km
+    ]
+
+
+def nearest_stations(queryset, latitude, longitude, count, max_radius_km=None):
+    """Return [(station id, km)] of the `count` nearest stations, growing the search radius"""
+    radius_km = 10
+    while True:
+        if max_radius_km is not None:
+            radius_km = min(radius_km, max_radius_km)
+        if geohash.covering_cells(latitude, longitude, radius_km) is None:
+            radius_km = max_radius_km if max_radius_km is not None else math.inf
+
+        found = stations_within(queryset, latitude, longitude, radius_km)
+        if len(found) >= count or radius_km in (max_radius_km, math.inf):
+            return found[:count]
+
+        radius_km *= 4
@@ -0,0 +1,173 @@
+"""
+Streaming CSV and NDJSON exports of orders, tickets and journeys.
+
+Rows are read as plain value tuples with a server-side cursor
+(QuerySet.iterator) in chunks of EXPORT_CHUNK_SIZE and written to the
+response as they arrive, so an export holds about one chunk in memory
+however many rows it has. Under ASGI Django would read a sync iterator
+into a list before sending it, so there the chunks are handed out by an
+async iterator that pulls each one in the thread the ORM runs in.
+"""
+import csv
+import json
+from collections import namedtuple
+from datetime import date, datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+
+from train_station.filters import day_range
+from train_station.models import Order, Ticket, Journey
+
+OUTPUTS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+# Bytes of rows collected before they are sent, one write per row is slow
+WRITE_BUFFER_SIZE = 64 * 1024
+
+Export = namedtuple("Export", ["queryset", "date_field", "columns"])
+
+EXPORTS = {
+    "orders": Export(
+        Order.objects.annotate(tickets_count=Count("tickets")),
+        "created_at",
+        (
+            ("id", "id"),
+            ("created_at", "created_at"),
+            ("user", "user__email"),
+            ("tickets", "tickets_count"),
+        ),
+    ),
+    "tickets": Export(
+        Ticket.objects.all(),
+        "order__created_at",
+        (
+            ("id", "id"),
+            ("order", "order_id"),
+            ("ordered_at", "order__created_at"),
+            ("user", "order__user__email"),
+            ("journey", "journey_id"),
+            ("source", "journey__route__source__name"),
+            ("destination", "journey__route__destination__name"),
+            ("departure_time", "journey__departure_time"),
+            ("cargo", "cargo"),
+            ("seat", "seat"),
+        ),
+    ),
+    "journeys": Export(
+        Journey.objects.with_tickets_available(),
+        "departure_time",
+        (
+            ("id", "id"),
+            ("source", "route__source__name"),
+            ("destination", "route__destination__name"),
+            ("train", "train__name"),
+            ("departure_time", "departure_time"),
+            ("arrival_time", "arrival_time"),
+            ("tickets_sold", "tickets_sold"),
+            ("tickets_available", "tickets_available"),
+        ),
+    ),
+}
+
+
+def export_rows(export, params):
+    """Return the value tuples of the export filtered by ?from and ?to dates, both included"""
+    queryset = export.queryset
+    try:
+        if params.get("from"):
+            start, _ = day_range(params["from"])
+            queryset = queryset.filter(**{f"{export.date_field}__gte": start})
+        if params.get("to"):
+            _, end = day_range(params["to"])
+            queryset = queryset.filter(**{f"{export.date_field}__lt": end})
+    except ValueError:
+        raise ValidationError({"detail": "Expected ?from and ?to dates as YYYY-MM-DD"})
+
+    return queryset.order_by("pk").values_list(*(lookup for _, lookup in export.columns))
+
+
+class Echo:
+    """File-like object handing the line csv.writer wrote back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+def csv_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def csv_lines(headers, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow([csv_value(value) for value in row])
+
+
+def ndjson_lines(headers, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder) + "\n"
+
+
+def buffered(lines, size=WRITE_BUFFER_SIZE):
+    buffer = []
+    buffered_size = 0
+    for line in lines:
+        buffer.append(line)
+        buffered_size += len(line)
+        if buffered_size >= size:
+            yield "".join(buffer)
+            buffer = []
+            buffered_size = 0
+
+    if buffer:
+        yield "".join(buffer)
+
+
+async def pull_in_sync_thread(iterator):
+    """Yield the items of a sync iterator that reads the database, one at a time"""
+    done = object()
+    try:
+        while True:
+            item = await sync_to_async(next)(iterator, done)
+            if item is done:
+                return
+            yield item
+    finally:
+        # Close the server-side cursor when the client goes away early
+        await sync_to_async(iterator.close)()
+
+
+def export_response(name, request):
+    """Stream the export as ?output=csv (default) or ?output=ndjson"""
+    params = request.query_params
+    output = params.get("output", "csv")
+    if output not in OUTPUTS:
+        raise ValidationError({"output": f"Expected one of: {', '.join(OUTPUTS)}"})
+
+    export = EXPORTS[name]
+    rows = export_rows(export, params)
+    # Keep reading from the database chosen for the request, the rows are
+    # fetched after the view returned
+    rows = rows.using(rows.db).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+    headers = [header for header, _ in export.columns]
+    lines = csv_lines(headers, rows) if output == "csv" else ndjson_lines(headers, rows)
+
+    chunks = buffered(lines)
+    if isinstance(request._request, ASGIRequest):
+        chunks = pull_in_sync_thread(chunks)
+
+    response = StreamingHttpResponse(chunks, content_type=OUTPUTS[output])
+    response["Content-Disposition"] = f'attachment; filename="{name}.{output}"'
+    return response
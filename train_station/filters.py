@@ -0,0 +1,102 @@
+"""
+Query parameter filters shared by the viewsets and the async views.
+"""
+from datetime import datetime, timedelta
+
+from django.db.models import Case, When, Value, FloatField
+from rest_framework.exceptions import ValidationError
+
+from train_station.distances import stations_within, nearest_stations
+
+NEAR_DEFAULT_RADIUS_KM = 10
+
+
+def day_range(date):
+    """Return the [start, end) datetimes of a YYYY-MM-DD day"""
+    start = datetime.strptime(date, "%Y-%m-%d")
+    return start, start + timedelta(days=1)
+
+
+def filter_stations(queryset, params, by_location=True):
+    """Filter the stations by ?name and, unless disabled, by ?near"""
+    name = params.get("name")
+    near = params.get("near")
+
+    if name:
+        queryset = queryset.filter(name__icontains=name)
+
+    queryset = queryset.distinct()
+
+    if near and by_location:
+        queryset = filter_stations_by_location(queryset, params)
+
+    return queryset
+
+
+def filter_stations_by_location(queryset, params):
+    """Keep the stations around ?near=lat,lon ordered by distance"""
+    near = params.get("near")
+    radius = params.get("radius")
+    nearest = params.get("nearest")
+
+    try:
+        latitude, longitude = (float(value) for value in near.split(","))
+        radius = float(radius) if radius else None
+        nearest = int(nearest) if nearest else None
+    except ValueError:
+        raise ValidationError(
+            {"near": "Expected ?near=lat,lon with numeric radius and nearest"}
+        )
+
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValidationError({"near": "Coordinates are out of range"})
+    if (radius is not None and radius <= 0) or (nearest is not None and not 1 <= nearest <= 100):
+        raise ValidationError({"near": "radius must be positive and nearest within 1..100"})
+
+    if nearest:
+        found = nearest_stations(queryset, latitude, longitude, nearest, radius)
+    else:
+        found = stations_within(queryset, latitude, longitude, radius or NEAR_DEFAULT_RADIUS_KM)
+
+    if not found:
+        return queryset.none()
+
+    return (
+        queryset
+        .filter(pk__in=[station_id for station_id, _ in found])
+        .annotate(
+            distance=Case(
+                *[When(pk=station_id, then=Value(km)) for station_id, km in found],
+                output_field=FloatField(),
+            )
+        )
+        .order_by("distance", "pk")
+    )
+
+
+def filter_journeys(queryset, params):
+    """Filter the journeys by route stations, train and departure or arrival date"""
+    source = params.get("source")
+    destination = params.get("destination")
+    train = params.get("train")
+    departure_date = params.get("departure_date")
+    arrival_date = params.get("arrival_date")
+
+    if source:
+        queryset = queryset.filter(route__source__name__icontains=source)
+
+    if destination:
+        queryset = queryset.filter(route__destination__name__icontains=destination)
+
+    if train:
+        queryset = queryset.filter(train__name__icontains=train)
+
+    if departure_date:
+        start, end = day_range(departure_date)
+        queryset = queryset.filter(departure_time__gte=start, departure_time__lt=end)
+
+    if arrival_date:
+        start, end = day_range(arrival_date)
+        queryset = queryset.filter(arrival_time__gte=start, arrival_time__lt=end)
+
+    return queryset
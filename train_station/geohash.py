@@ -0,0 +1,89 @@
+"""
+Geohash encoding used to index stations by location.
+
+A geohash interleaves longitude and latitude bisections into a base32
+string, so nearby points share a prefix and a radius search becomes a
+few indexed prefix lookups: the cell containing the centre and its
+eight neighbours, at the finest precision whose cells are still
+larger than the radius.
+"""
+import math
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+PRECISION = 12
+EARTH_RADIUS_KM = 6371.0088
+
+
+def encode(latitude, longitude, precision=PRECISION):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(geohash) < precision:
+        value, value_range = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(geohash)
+
+
+def cell_size(precision):
+    """Return the (height, width) of a cell in degrees"""
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 - lon_bits
+    return 180 / 2 ** lat_bits, 360 / 2 ** lon_bits
+
+
+def covering_precision(latitude, radius_km):
+    """Finest precision whose cells are at least as large as the circle's extent"""
+    angle = radius_km / EARTH_RADIUS_KM
+    lat_span = math.degrees(angle)
+    if abs(latitude) + lat_span >= 90:
+        return 0
+
+    # Widest longitude extent of a spherical cap centred at this latitude
+    lon_span = math.degrees(
+        math.asin(min(1.0, math.sin(angle) / math.cos(math.radians(latitude))))
+    )
+    for precision in range(PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        if height >= lat_span and width >= lon_span:
+            return precision
+    return 0
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """
+    Return the geohash prefixes whose cells cover the circle,
+    or None when the circle is too large to be worth indexing
+    """
+    # Spherical and ellipsoidal distances differ by under 0.5%
+    precision = covering_precision(latitude, radius_km * 1.01)
+    if precision == 0:
+        return None
+
+    height, width = cell_size(precision)
+    cells = set()
+    for lat_offset in (-height, 0, height):
+        for lon_offset in (-width, 0, width):
+            cell_latitude = latitude + lat_offset
+            if not -90 <= cell_latitude <= 90:
+                continue
+            cell_longitude = (longitude + lon_offset + 180) % 360 - 180
+            cells.add(encode(cell_latitude, cell_longitude, precision))
+    return cells
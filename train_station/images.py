@@ -0,0 +1,214 @@
+"""
+Train image decoding and thumbnails.
+
+An upload is decoded once with Pillow while it is validated. After the
+transaction commits, the decoded image is handed to a thread pool that
+encodes the thumbnails, so request threads never wait on encoding.
+Every image waiting for a worker stays decoded in memory, so uploads are
+refused with a 503 while THUMBNAIL_QUEUE_SIZE of them are waiting. The
+queue is checked before the upload is decoded, and only uploads being
+saved at that moment can push it over the limit.
+Thumbnails are stored under the SHA-256 of the upload, so identical
+images share their files and an existing thumbnail is never encoded twice.
+"""
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from train_station.cache import invalidate_catalog
+from train_station.models import Train
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = "thumbnails"
+THUMBNAIL_FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+THUMBNAIL_QUALITY = 80
+
+# Seconds a client is asked to wait when the thumbnail queue is full
+RETRY_AFTER = 5
+
+
+class ThumbnailsBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many images are waiting for their thumbnails, try again later."
+    default_code = "thumbnails_busy"
+    wait = RETRY_AFTER
+
+
+class ThumbnailQueue:
+    """Threads encoding thumbnails with a cap on the images waiting for them"""
+
+    def __init__(self, workers, queue_size):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnails")
+        self._limit = workers + queue_size
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def check(self):
+        with self._lock:
+            if self._pending >= self._limit:
+                raise ThumbnailsBusy()
+
+    def submit(self, function, *args):
+        with self._lock:
+            self._pending += 1
+        self._executor.submit(self._run, function, *args)
+
+    def _run(self, function, *args):
+        try:
+            function(*args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = ThumbnailQueue(settings.THUMBNAIL_WORKERS, settings.THUMBNAIL_QUEUE_SIZE)
+    return _queue
+
+
+def check_thumbnail_queue():
+    """Raise ThumbnailsBusy while the thumbnail workers have no room for another image"""
+    if settings.THUMBNAIL_WORKERS:
+        get_queue().check()
+
+
+def file_hash(file):
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+def check_dimensions(size):
+    limit = settings.TRAIN_IMAGE_MAX_DIMENSION
+    if max(size) > limit:
+        raise ImageTooLarge(f"Images can be at most {limit}px wide and high.")
+
+
+def header_dimensions(header):
+    """Return the (width, height) read from the start of an image, or None if not known yet"""
+    try:
+        with Image.open(io.BytesIO(header)) as image:
+            return image.size
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        return None
+
+
+def decode_image(file):
+    """
+    Fully decode the image and return it upright in RGB. Raises ValueError
+    for anything Pillow cannot decode, including decompression bombs,
+    and ImageTooLarge before decoding an image over the dimension limit.
+    """
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            check_dimensions(image.size)
+            image.load()
+            image = ImageOps.exif_transpose(image)
+    except (OSError, SyntaxError, Image.DecompressionBombError) as error:
+        raise ValueError(str(error)) from error
+    finally:
+        file.seek(0)
+
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return image
+
+
+def thumbnail_path(image_hash, size_name, extension):
+    return f"{THUMBNAIL_DIR}/{image_hash[:2]}/{image_hash}/{size_name}.{extension}"
+
+
+def thumbnail_urls(train):
+    """Return {size: {format: url}}, or None while the thumbnails are pending"""
+    if not train.image_hash or not train.thumbnails_ready:
+        return None
+
+    return {
+        size_name: {
+            extension: default_storage.url(thumbnail_path(train.image_hash, size_name, extension))
+            for extension in THUMBNAIL_FORMATS
+        }
+        for size_name in settings.TRAIN_THUMBNAIL_SIZES
+    }
+
+
+def encode_thumbnails(image_hash, image):
+    """Store the missing thumbnails of the image, largest first"""
+    sizes = sorted(
+        settings.TRAIN_THUMBNAIL_SIZES.items(),
+        key=lambda item: item[1][0] * item[1][1],
+        reverse=True,
+    )
+    for size_name, size in sizes:
+        # Each size is scaled down from the previous one, never from the original again
+        image = image.copy()
+        image.thumbnail(size, Image.LANCZOS)
+
+        for extension, image_format in THUMBNAIL_FORMATS.items():
+            path = thumbnail_path(image_hash, size_name, extension)
+            if default_storage.exists(path):
+                continue
+
+            buffer = io.BytesIO()
+            image.save(buffer, image_format, quality=THUMBNAIL_QUALITY)
+            default_storage.save(path, ContentFile(buffer.getvalue()))
+
+
+def build_thumbnails(train_id, image_hash, image):
+    try:
+        encode_thumbnails(image_hash, image)
+        # Only mark them ready if the train still shows this image
+        updated = Train.objects.filter(
+            pk=train_id, image_hash=image_hash
+        ).update(thumbnails_ready=True)
+        if updated:
+            invalidate_catalog()
+    except Exception:
+        logger.exception("Failed to build thumbnails for train %s", train_id)
+
+
+def build_thumbnails_in_worker(train_id, image_hash, image):
+    try:
+        build_thumbnails(train_id, image_hash, image)
+    finally:
+        # Worker threads outlive requests, don't leave their connections open
+        connections.close_all()
+
+
+def schedule_thumbnails(train, image):
+    """Build the train's thumbnails once the current transaction commits"""
+    train_id, image_hash = train.id, train.image_hash
+
+    def submit():
+        if settings.THUMBNAIL_WORKERS:
+            get_queue().submit(build_thumbnails_in_worker, train_id, image_hash, image)
+        else:
+            build_thumbnails(train_id, image_hash, image)
+
+    transaction.on_commit(submit)
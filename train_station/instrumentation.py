@@ -0,0 +1,258 @@
+"""
+Per-request query and timing instrumentation.
+
+InstrumentationMiddleware samples INSTRUMENTATION_SAMPLE_RATE of the
+requests (0, the default, turns it off). For a sampled request every
+query on any database connection is counted and timed through an
+execute wrapper that each connection gets when it is opened; outside
+sampled requests the wrapper only reads a context variable. Queries are
+grouped by their SQL with IN lists collapsed, so an N+1 shows up as one
+fingerprint run many times. Serialization, the view code outside SQL and
+serialization, and the rendering of the response are timed as well.
+Serialization is timed, without the queries it runs, which are counted
+under db, where the views ask for serializer data: viewsets with
+TimedSerializerMixin get serializers whose data is timed in sampled
+requests, and views serializing on their own go through serialized().
+
+The numbers are sent in a Server-Timing header, which browser dev tools
+show next to the request, and logged as one JSON line tagged with the
+view and action that handled the request.
+"""
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from rest_framework.serializers import ListSerializer
+
+logger = logging.getLogger(__name__)
+
+# Fingerprints run more than once that are logged, most frequent first
+MAX_LOGGED_DUPLICATES = 5
+
+# Characters of SQL logged per duplicate fingerprint
+MAX_LOGGED_SQL = 200
+
+IN_LIST = re.compile(r"\((?:%s, )+%s\)")
+
+_metrics = ContextVar("instrumentation_metrics", default=None)
+
+
+def fingerprint(sql):
+    return IN_LIST.sub("(%s, ...)", sql)
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, time.perf_counter() - started)
+
+
+def install_query_recorder(connection):
+    # First in the list, so execute_wrapper() blocks still pop their own wrapper
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+@contextmanager
+def timing_serialization():
+    metrics = _metrics.get()
+    if metrics is None:
+        yield
+        return
+
+    metrics.start_serialize()
+    try:
+        yield
+    finally:
+        metrics.finish_serialize()
+
+
+def serialized(serializer):
+    """The data of the serializer, timed in sampled requests"""
+    with timing_serialization():
+        return serializer.data
+
+
+class TimedData:
+    @property
+    def data(self):
+        with timing_serialization():
+            return super().data
+
+
+@cache
+def timed_serializer_class(serializer_class):
+    """A subclass of the serializer whose data is timed, on its own and in lists"""
+    meta = getattr(serializer_class, "Meta", object)
+    list_serializer_class = timed_list_serializer_class(
+        getattr(meta, "list_serializer_class", ListSerializer)
+    )
+    timed_meta = type("Meta", (meta,), {"list_serializer_class": list_serializer_class})
+    return type(serializer_class.__name__, (TimedData, serializer_class), {"Meta": timed_meta})
+
+
+@cache
+def timed_list_serializer_class(list_serializer_class):
+    return type(list_serializer_class.__name__, (TimedData, list_serializer_class), {})
+
+
+class TimedSerializerMixin:
+    """Time the data of the serializers the viewset gets, in sampled requests"""
+
+    def get_serializer(self, *args, **kwargs):
+        if _metrics.get() is None:
+            return super().get_serializer(*args, **kwargs)
+
+        kwargs.setdefault("context", self.get_serializer_context())
+        return timed_serializer_class(self.get_serializer_class())(*args, **kwargs)
+
+
+def view_name(request):
+    """The viewset and action, or the view function, that handled the request"""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return None
+
+    view = match.func
+    view_class = getattr(view, "cls", None)
+    if view_class is None:
+        return f"{view.__module__}.{view.__name__}"
+
+    action = getattr(view, "actions", {}).get(request.method.lower())
+    return f"{view_class.__name__}.{action}" if action else view_class.__name__
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.fingerprints = Counter()
+        self.render_started = None
+        self.render_time = 0.0
+        self.serialize_depth = 0
+        self.serialize_started = None
+        self.serialize_time = 0.0
+
+    def add_query(self, sql, duration):
+        self.queries += 1
+        self.sql_time += duration
+        self.fingerprints[fingerprint(sql)] += 1
+
+    def start_serialize(self):
+        # Serializers nested through .data are part of the outermost one
+        self.serialize_depth += 1
+        if self.serialize_depth == 1:
+            self.serialize_started = (time.perf_counter(), self.sql_time)
+
+    def finish_serialize(self):
+        self.serialize_depth -= 1
+        if self.serialize_depth == 0:
+            started, sql_time = self.serialize_started
+            elapsed = time.perf_counter() - started
+            self.serialize_time += elapsed - (self.sql_time - sql_time)
+
+    def start_render(self, response):
+        self.render_started = time.perf_counter()
+        response.add_post_render_callback(self.finish_render)
+
+    def finish_render(self, response):
+        self.render_time = time.perf_counter() - self.render_started
+
+    def duplicates(self):
+        return [
+            {"sql": sql[:MAX_LOGGED_SQL], "count": count}
+            for sql, count in self.fingerprints.most_common(MAX_LOGGED_DUPLICATES)
+            if count > 1
+        ]
+
+    def report(self, request, response):
+        total = time.perf_counter() - self.started
+        view = total - self.sql_time - self.serialize_time - self.render_time
+        response["Server-Timing"] = ", ".join([
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.queries} queries"',
+            f"serialize;dur={self.serialize_time * 1000:.1f}",
+            f"view;dur={view * 1000:.1f}",
+            f"render;dur={self.render_time * 1000:.1f}",
+            f"total;dur={total * 1000:.1f}",
+        ])
+
+        logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "view": view_name(request),
+            "queries": self.queries,
+            "sql_ms": round(self.sql_time * 1000, 1),
+            "serialize_ms": round(self.serialize_time * 1000, 1),
+            "view_ms": round(view * 1000, 1),
+            "render_ms": round(self.render_time * 1000, 1),
+            "total_ms": round(total * 1000, 1),
+            "duplicates": self.duplicates(),
+        }))
+
+
+class InstrumentationMiddleware:
+    """Time the queries, view and rendering of a sample of the requests"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not self.sampled():
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _metrics.reset(token)
+        metrics.report(request, response)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _metrics.reset(token)
+        metrics.report(request, response)
+        return response
+
+    def process_template_response(self, request, response):
+        metrics = _metrics.get()
+        if metrics is not None:
+            metrics.start_render(response)
+        return response
+
+    @staticmethod
+    def sampled():
+        rate = settings.INSTRUMENTATION_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
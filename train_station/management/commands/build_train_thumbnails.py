@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from train_station.images import build_thumbnails, decode_image, file_hash
+from train_station.models import Train
+
+
+class Command(BaseCommand):
+    help = "Build the missing thumbnails of train images uploaded before the pipeline"
+
+    def handle(self, *args, **options):
+        built = 0
+        trains = Train.objects.exclude(image="").exclude(image=None).filter(thumbnails_ready=False)
+        for train in trains.iterator():
+            try:
+                with train.image.open("rb") as file:
+                    image = decode_image(file)
+                    image_hash = file_hash(file)
+            except (OSError, ValueError) as error:
+                self.stderr.write(f"Skipped train {train.id}: {error}")
+                continue
+
+            Train.objects.filter(pk=train.pk).update(image_hash=image_hash)
+            build_thumbnails(train.id, image_hash, image)
+            built += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Built thumbnails for {built} train(s)"))
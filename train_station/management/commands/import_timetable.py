@@ -0,0 +1,53 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from train_station.timetable import (
+    BATCH_SIZE, FORMATS, TimetableError, import_timetable, timetable_format
+)
+
+
+class Command(BaseCommand):
+    help = "Import journeys from a CSV or JSON lines timetable"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Timetable file, - reads standard input")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="Timetable format, guessed from the file extension by default",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Journeys inserted per query",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only check the rows without importing them",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        format = options["format"] or timetable_format(path)
+
+        try:
+            if path == "-":
+                result = import_timetable(
+                    sys.stdin.buffer, format, options["batch_size"], options["dry_run"]
+                )
+            else:
+                with open(path, "rb") as file:
+                    result = import_timetable(file, format, options["batch_size"], options["dry_run"])
+        except (OSError, TimetableError) as error:
+            raise CommandError(error)
+
+        for line_number, error in result.errors:
+            self.stderr.write(f"Line {line_number}: {error}")
+
+        action = "Found" if options["dry_run"] else "Imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {result.created} journey(s), {len(result.errors)} row(s) with errors"
+        ))
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from train_station.schedules import materialize_horizon
+
+
+class Command(BaseCommand):
+    help = "Create the journeys of the journey templates for the days ahead, run it daily"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.JOURNEY_TEMPLATE_HORIZON_DAYS,
+            help="Days ahead to create journeys for",
+        )
+
+    def handle(self, *args, **options):
+        created = materialize_horizon(options["days"])
+        self.stdout.write(self.style.SUCCESS(f"Created {created} journey(s) from templates"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from train_station.uploads import purge_expired_partial_uploads
+
+
+class Command(BaseCommand):
+    help = "Delete resumable train image uploads that were not continued in time"
+
+    def handle(self, *args, **options):
+        purged = purge_expired_partial_uploads()
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} expired partial upload(s)"))
@@ -0,0 +1,97 @@
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from train_station.models import Journey, Ticket
+from train_station.seat_map import build_seat_map, seat_map_layout
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized seat counters and seat maps of journeys from their tickets"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report journeys whose counters or seat maps are out of sync",
+        )
+
+    def handle(self, *args, **options):
+        self.rebuild_counters(options["dry_run"])
+        self.rebuild_seat_maps(options["dry_run"])
+
+    def rebuild_counters(self, dry_run):
+        tickets_count = Coalesce(
+            Subquery(
+                Ticket.objects.filter(journey=OuterRef("pk"))
+                .order_by()
+                .values("journey")
+                .annotate(count=Count("pk"))
+                .values("count")
+            ),
+            0,
+        )
+        out_of_sync = (
+            Journey.objects
+            .annotate(tickets_count=tickets_count)
+            .exclude(tickets_sold=F("tickets_count"))
+        )
+
+        for journey_id, tickets_sold, count in out_of_sync.values_list(
+            "id", "tickets_sold", "tickets_count"
+        ):
+            self.stdout.write(f"Journey {journey_id}: tickets_sold {tickets_sold} -> {count}")
+
+        if dry_run:
+            found = out_of_sync.count()
+            self.stdout.write(self.style.SUCCESS(f"Found {found} counter(s) out of sync"))
+            return
+
+        fixed = Journey.objects.filter(
+            pk__in=out_of_sync.values("pk")
+        ).update(tickets_sold=tickets_count)
+        self.stdout.write(self.style.SUCCESS(f"Fixed {fixed} counter(s) out of sync"))
+
+    def rebuild_seat_maps(self, dry_run):
+        journeys = (
+            Journey.objects
+            .order_by("pk")
+            .values_list(
+                "pk", "seat_map", "seat_map_layout", "train__cargo_num", "train__places_in_cargo"
+            )
+            .iterator()
+        )
+        tickets = groupby(
+            Ticket.objects
+            .order_by("journey_id")
+            .values_list("journey_id", "cargo", "seat")
+            .iterator(),
+            key=lambda ticket: ticket[0],
+        )
+        ticket_group = next(tickets, None)
+        fixed = 0
+
+        for journey_id, seat_map, layout, cargo_num, places_in_cargo in journeys:
+            while ticket_group is not None and ticket_group[0] < journey_id:
+                ticket_group = next(tickets, None)
+
+            seats = []
+            if ticket_group is not None and ticket_group[0] == journey_id:
+                seats = [(cargo, seat) for _, cargo, seat in ticket_group[1]]
+
+            expected = build_seat_map(cargo_num, places_in_cargo, seats)
+            expected_layout = seat_map_layout(cargo_num, places_in_cargo)
+            if bytes(seat_map) == expected and layout == expected_layout:
+                continue
+
+            self.stdout.write(f"Journey {journey_id}: seat map out of sync")
+            fixed += 1
+            if not dry_run:
+                Journey.objects.filter(pk=journey_id).update(
+                    seat_map=expected, seat_map_layout=expected_layout
+                )
+
+        action = "Found" if dry_run else "Fixed"
+        self.stdout.write(self.style.SUCCESS(f"{action} {fixed} seat map(s) out of sync"))
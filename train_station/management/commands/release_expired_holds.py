@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from train_station.reservations import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = "Delete seat holds whose time has run out"
+
+    def handle(self, *args, **options):
+        released = release_expired_holds()
+        self.stdout.write(self.style.SUCCESS(f"Released {released} expired seat hold(s)"))
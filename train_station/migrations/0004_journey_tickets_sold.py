@@ -0,0 +1,35 @@
+# Generated by Django 4.2.6 on 2026-10-18 04:44
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_sold_tickets(apps, schema_editor):
+    Journey = apps.get_model("train_station", "Journey")
+    Ticket = apps.get_model("train_station", "Ticket")
+
+    sold = (
+        Ticket.objects.filter(journey=OuterRef("pk"))
+        .order_by()
+        .values("journey")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    Journey.objects.update(tickets_sold=Coalesce(Subquery(sold), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('train_station', '0004_ticket_unique_seats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='journey',
+            name='tickets_sold',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_sold_tickets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.6 on 2026-10-18 04:44
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def delete_duplicate_tickets(apps, schema_editor):
+    """
+    Keep the first ticket sold for each seat of a journey. The model always
+    declared (journey, cargo, seat) unique, but no migration created the
+    constraint, so databases may hold seats sold twice, which would make
+    adding it fail.
+    """
+    Ticket = apps.get_model("train_station", "Ticket")
+
+    duplicates = (
+        Ticket.objects
+        .order_by()
+        .values("journey", "cargo", "seat")
+        .annotate(first_id=Min("id"), count=Count("id"))
+        .filter(count__gt=1)
+    )
+    for seat in duplicates:
+        (
+            Ticket.objects
+            .filter(journey=seat["journey"], cargo=seat["cargo"], seat=seat["seat"])
+            .exclude(id=seat["first_id"])
+            .delete()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('train_station', '0003_journey_crew'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='ticket',
+            options={'ordering': ['cargo', 'seat']},
+        ),
+        migrations.RunPython(delete_duplicate_tickets, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='ticket',
+            unique_together={('journey', 'cargo', 'seat')},
+        ),
+    ]
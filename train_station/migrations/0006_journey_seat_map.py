@@ -0,0 +1,33 @@
+# Generated by Django 4.2.6 on 2026-10-18 04:47
+
+from django.db import migrations, models
+
+
+def build_seat_maps(apps, schema_editor):
+    Journey = apps.get_model("train_station", "Journey")
+    Ticket = apps.get_model("train_station", "Ticket")
+
+    for journey in Journey.objects.select_related("train").iterator():
+        places_in_cargo = journey.train.places_in_cargo
+        seat_map = bytearray((journey.train.cargo_num * places_in_cargo + 7) // 8)
+        for cargo, seat in Ticket.objects.filter(journey=journey).values_list("cargo", "seat"):
+            index = (cargo - 1) * places_in_cargo + (seat - 1)
+            if 1 <= seat <= places_in_cargo and 0 <= index < len(seat_map) * 8:
+                seat_map[index // 8] |= 1 << (index % 8)
+        Journey.objects.filter(pk=journey.pk).update(seat_map=bytes(seat_map))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('train_station', '0005_seathold'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='journey',
+            name='seat_map',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.RunPython(build_seat_maps, migrations.RunPython.noop),
+    ]
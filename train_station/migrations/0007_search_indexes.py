@@ -0,0 +1,25 @@
+# Generated by Django 4.2.6 on 2026-10-18 04:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('train_station', '0006_journey_seat_map'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='journey',
+            index=models.Index(fields=['route', 'departure_time'], name='journey_route_departure_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='journey',
+            index=models.Index(fields=['departure_time'], name='journey_departure_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='journey',
+            index=models.Index(fields=['arrival_time'], name='journey_arrival_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.6 on 2026-10-18 04:52
+
+from django.db import migrations
+
+# (index name, table, column) of every column searched with icontains
+NAME_INDEXES = [
+    ("station_name_trgm_idx", "train_station_station", "name"),
+    ("train_name_trgm_idx", "train_station_train", "name"),
+    ("traintype_name_trgm_idx", "train_station_traintype", "name"),
+]
+
+
+def create_name_indexes(apps, schema_editor):
+    """
+    Create pg_trgm GIN indexes on PostgreSQL over the same
+    UPPER(column::text) expression icontains compiles to. Other databases get plain
+    btree indexes, enough for exact and prefix lookups.
+    """
+    quote = schema_editor.quote_name
+
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for name, table, column in NAME_INDEXES:
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {quote(name)} ON {quote(table)} "
+                f"USING gin ((UPPER({quote(column)}::text)) gin_trgm_ops)"
+            )
+        return
+
+    for name, table, column in NAME_INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {quote(name)} ON {quote(table)} ({quote(column)})"
+        )
+
+
+def drop_name_indexes(apps, schema_editor):
+    for name, _, _ in NAME_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(name)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('train_station', '0007_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_name_indexes, drop_name_indexes),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.6 on 2026-10-18 04:56
+
+from django.db import migrations, models
+
+from train_station import geohash
+
+
+def fill_geohashes(apps, schema_editor):
+    Station = apps.get_model("train_station", "Station")
+
+    stations = list(Station.objects.only("id", "latitude", "longitude"))
+    for station in stations:
+        station.geohash = geohash.encode(station.latitude, station.longitude)
+    Station.objects.bulk_update(stations, ["geohash"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('train_station', '0008_name_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='station',
+            name='geohash',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=12),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_geohashes, migrations.RunPython.noop),
+    ]
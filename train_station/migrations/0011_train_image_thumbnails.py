@@ -0,0 +1,23 @@
+# Generated by Django 4.2.6 on 2026-10-18 05:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('train_station', '0010_order_created_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='train',
+            name='image_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='train',
+            name='thumbnails_ready',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.6 on 2026-10-18 05:21
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('train_station', '0011_train_image_thumbnails'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JourneyTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('departure_time', models.TimeField()),
+                ('duration', models.DurationField()),
+                ('weekdays', models.CharField(default='1234567', help_text='ISO weekdays the journey runs on, e.g. 12345 for Monday to Friday', max_length=7, validators=[django.core.validators.RegexValidator('^[1-7]{1,7}$', 'Use ISO weekday digits, 1 for Monday to 7 for Sunday')])),
+                ('valid_from', models.DateField()),
+                ('valid_until', models.DateField(blank=True, null=True)),
+                ('materialized_until', models.DateField(blank=True, editable=False, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='journeytemplate',
+            name='crew',
+            field=models.ManyToManyField(blank=True, to='train_station.crew'),
+        ),
+        migrations.AddField(
+            model_name='journeytemplate',
+            name='route',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='journey_templates', to='train_station.route'),
+        ),
+        migrations.AddField(
+            model_name='journeytemplate',
+            name='train',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='journey_templates', to='train_station.train'),
+        ),
+        migrations.AddField(
+            model_name='journey',
+            name='template',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='journeys', to='train_station.journeytemplate'),
+        ),
+        migrations.AddConstraint(
+            model_name='journey',
+            constraint=models.UniqueConstraint(fields=('template', 'departure_time'), name='journey_template_departure_unique'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.6 on 2026-10-18 06:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('train_station', '0012_journey_templates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='journey',
+            name='seat_map_layout',
+            field=models.CharField(default='', editable=False, max_length=15),
+        ),
+    ]
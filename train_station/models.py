@@ -2,15 +2,23 @@ import os
 import uuid
 
 from django.conf import settings
+from django.core.validators import RegexValidator
 from django.db import models
 from django.utils.text import slugify
 from rest_framework.exceptions import ValidationError
 
+from train_station import geohash
+
 
 class Station(models.Model):
     name = models.CharField(max_length=63)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    geohash = models.CharField(max_length=geohash.PRECISION, db_index=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        self.geohash = geohash.encode(self.latitude, self.longitude)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.name} ({self.latitude},{self.longitude})"
@@ -53,6 +61,8 @@ class Train(models.Model):
     places_in_cargo = models.IntegerField()
     train_type = models.ForeignKey(to=TrainType, on_delete=models.CASCADE, related_name="trains")
     image = models.ImageField(null=True, upload_to=train_image_file_path)
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
+    thumbnails_ready = models.BooleanField(default=False, editable=False)
 
     @property
     def capacity(self):
@@ -62,16 +72,80 @@ class Train(models.Model):
         return f"{self.name} ({self.train_type})"
 
 
+class JourneyTemplate(models.Model):
+    """A journey repeated on some days of the week between two dates"""
+    route = models.ForeignKey(to=Route, on_delete=models.CASCADE, related_name="journey_templates")
+    train = models.ForeignKey(to=Train, on_delete=models.CASCADE, related_name="journey_templates")
+    crew = models.ManyToManyField(to=Crew, blank=True)
+    departure_time = models.TimeField()
+    duration = models.DurationField()
+    weekdays = models.CharField(
+        max_length=7,
+        default="1234567",
+        validators=[RegexValidator(r"^[1-7]{1,7}$", "Use ISO weekday digits, 1 for Monday to 7 for Sunday")],
+        help_text="ISO weekdays the journey runs on, e.g. 12345 for Monday to Friday",
+    )
+    valid_from = models.DateField()
+    valid_until = models.DateField(null=True, blank=True)
+    materialized_until = models.DateField(null=True, blank=True, editable=False)
+
+    def runs_on(self, day):
+        return (
+            self.valid_from <= day
+            and (self.valid_until is None or day <= self.valid_until)
+            and str(day.isoweekday()) in self.weekdays
+        )
+
+    def __str__(self):
+        return f"{self.route}, {self.train} at {self.departure_time} on {self.weekdays}"
+
+
+class JourneyQuerySet(models.QuerySet):
+    def with_tickets_available(self):
+        return self.annotate(
+            tickets_available=(
+                models.F("train__cargo_num") * models.F("train__places_in_cargo")
+                - models.F("tickets_sold")
+            )
+        )
+
+
 class Journey(models.Model):
     route = models.ForeignKey(to=Route, on_delete=models.CASCADE, related_name="journeys")
     train = models.ForeignKey(to=Train, on_delete=models.CASCADE, related_name="journeys")
     crew = models.ManyToManyField(to=Crew)
     departure_time = models.DateTimeField()
     arrival_time = models.DateTimeField()
+    tickets_sold = models.PositiveIntegerField(default=0, editable=False)
+    seat_map = models.BinaryField(default=b"", editable=False)
+    # "<cargo_num>x<places_in_cargo>" of the train the seat map was built for
+    seat_map_layout = models.CharField(max_length=15, default="", editable=False)
+    template = models.ForeignKey(
+        to=JourneyTemplate,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="journeys",
+    )
+
+    objects = JourneyQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.route}, {self.train} ({self.departure_time} - {self.arrival_time})"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["route", "departure_time"], name="journey_route_departure_idx"),
+            models.Index(fields=["departure_time"], name="journey_departure_idx"),
+            models.Index(fields=["arrival_time"], name="journey_arrival_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["template", "departure_time"], name="journey_template_departure_unique"
+            ),
+        ]
+
 
 class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -82,6 +156,10 @@ class Order(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["user", "created_at"], name="order_user_created_idx"),
+            models.Index(fields=["created_at"], name="order_created_idx"),
+        ]
 
 
 class Ticket(models.Model):
@@ -121,3 +199,18 @@ class Ticket(models.Model):
     class Meta:
         unique_together = ("journey", "cargo", "seat")
         ordering = ["cargo", "seat"]
+
+
+class SeatHold(models.Model):
+    cargo = models.IntegerField()
+    seat = models.IntegerField()
+    journey = models.ForeignKey(to=Journey, on_delete=models.CASCADE, related_name="holds")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="seat_holds")
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"cargo: {self.cargo}, seat: {self.seat} (until {self.expires_at})"
+
+    class Meta:
+        unique_together = ("journey", "cargo", "seat")
+        ordering = ["cargo", "seat"]
@@ -0,0 +1,141 @@
+import json
+from collections import OrderedDict
+
+from django.db import connections
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+
+def approximate_count(queryset):
+    """
+    Estimate the number of rows from the PostgreSQL planner statistics
+    instead of running COUNT(*). Other databases get the exact count.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count()
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class DefaultPagination(PageNumberPagination):
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination keyed on the ordering fields, so every page is
+    an index range scan no matter how deep it is. ?count=approximate
+    adds a planner estimate of the total instead of COUNT(*).
+    """
+
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param) == "approximate":
+            self.count = approximate_count(queryset)
+
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = OrderedDict()
+        if self.count is not None:
+            response["count"] = self.count
+        response["next"] = self.get_next_link()
+        response["previous"] = self.get_previous_link()
+        response["results"] = data
+        return Response(response)
+
+
+class SelectablePagination(BasePagination):
+    """
+    Page number pagination by default, keyset pagination with
+    ?pagination=cursor or when a cursor is given
+    """
+
+    ordering = "-id"
+    pagination_query_param = "pagination"
+
+    def __init__(self):
+        self.paginator = DefaultPagination()
+
+    def get_keyset_paginator(self):
+        paginator = KeysetPagination()
+        paginator.ordering = self.ordering
+        return paginator
+
+    def select_paginator(self, request):
+        keyset = self.get_keyset_paginator()
+        if (
+            request.query_params.get(self.pagination_query_param) == "cursor"
+            or keyset.cursor_query_param in request.query_params
+        ):
+            self.paginator = keyset
+        else:
+            self.paginator = DefaultPagination()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.select_paginator(request)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.paginator.get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        keyset = self.get_keyset_paginator()
+        return [
+            *self.paginator.get_schema_operation_parameters(view),
+            {
+                "name": self.pagination_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Use keyset pagination (ex. ?pagination=cursor)",
+                "schema": {"type": "string", "enum": ["cursor"]},
+            },
+            {
+                "name": keyset.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": str(keyset.cursor_query_description),
+                "schema": {"type": "string"},
+            },
+            {
+                "name": keyset.count_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Add a planner estimate of the total with keyset pagination "
+                               "(ex. ?count=approximate)",
+                "schema": {"type": "string", "enum": ["approximate"]},
+            },
+        ]
+
+    @property
+    def display_page_controls(self):
+        return self.paginator.display_page_controls
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+
+class JourneyPagination(SelectablePagination):
+    ordering = ("departure_time", "id")
+
+
+class OrderPagination(SelectablePagination):
+    ordering = ("-created_at", "id")
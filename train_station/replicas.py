@@ -0,0 +1,193 @@
+"""
+Read replica routing.
+
+Viewsets with ReplicaReadMixin pick one replica per safe-method request
+and ReplicaRouter sends every read of that request to it. Users who just
+wrote something are pinned to the primary for REPLICA_PIN_SECONDS so they
+read their own writes, and everyone is pinned after catalog or timetable
+changes, so the response caches are never refilled from a stale replica.
+Replicas lagging more than REPLICA_MAX_LAG_SECONDS are skipped, and
+without a usable replica reads stay on the primary.
+"""
+import logging
+import math
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+logger = logging.getLogger(__name__)
+
+PIN_KEY = "replicas:pin:{}"
+EVERYONE = "all"
+
+# Seconds a measured replica lag is trusted before measuring it again
+LAG_CHECK_INTERVAL = 5
+
+# Seconds the replica is behind, 0 when it has replayed everything it received
+LAG_SQL = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+_replica = ContextVar("replica", default=None)
+
+
+def pin_to_primary(user_id=None):
+    """Send the reads of the user, or of everyone without a user, to the primary for a while"""
+    if settings.REPLICA_DATABASES:
+        cache.set(PIN_KEY.format(user_id or EVERYONE), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    keys = [PIN_KEY.format(EVERYONE)]
+    if user_id:
+        keys.append(PIN_KEY.format(user_id))
+    return bool(cache.get_many(keys))
+
+
+def measure_lag(alias):
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        return 0.0
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            lag = cursor.fetchone()[0]
+    except DatabaseError:
+        logger.warning("Replica %s is unavailable", alias, exc_info=True)
+        return math.inf
+
+    return float(lag or 0)
+
+
+class ReplicaLag:
+    """Replica lag measured at most every LAG_CHECK_INTERVAL seconds per process"""
+
+    def __init__(self):
+        self._measured = {}
+        self._lock = threading.Lock()
+
+    def lag(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            measured = self._measured.get(alias)
+        if measured is not None and now - measured[0] < LAG_CHECK_INTERVAL:
+            return measured[1]
+
+        lag = measure_lag(alias)
+        with self._lock:
+            self._measured[alias] = (now, lag)
+        return lag
+
+
+replica_lag = ReplicaLag()
+
+
+def choose_replica():
+    """Return a random replica that is not lagging, or None"""
+    replicas = [
+        alias for alias in settings.REPLICA_DATABASES
+        if replica_lag.lag(alias) <= settings.REPLICA_MAX_LAG_SECONDS
+    ]
+    return random.choice(replicas) if replicas else None
+
+
+def select_replica(method, user_id):
+    """Return the replica to serve a request from, or None for the primary"""
+    if settings.REPLICA_DATABASES and method in SAFE_METHODS and not is_pinned(user_id):
+        return choose_replica()
+    return None
+
+
+@contextmanager
+def reading_from(replica):
+    token = _replica.set(replica)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+def read_from_primary():
+    """Send the remaining reads of the current request to the primary"""
+    _replica.set(None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _replica.get()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+class ReplicaReadMixin:
+    """Serve the safe-method requests of a viewset from a replica"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        replica = select_replica(request.method, request.user.id)
+        self._replica_token = _replica.set(replica)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, "_replica_token", None)
+        if token is not None:
+            _replica.reset(token)
+            self._replica_token = None
+
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ReplicaPinMiddleware:
+    """Pin users to the primary after each of their successful writes"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        response = self.get_response(request)
+        if self.wrote(request, response):
+            pin_to_primary(request.user.id)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self.wrote(request, response):
+            await sync_to_async(pin_to_primary)(request.user.id)
+        return response
+
+    @staticmethod
+    def wrote(request, response):
+        user = getattr(request, "user", None)
+        return (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and user is not None
+            and user.is_authenticated
+        )
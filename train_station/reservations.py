@@ -0,0 +1,169 @@
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from train_station.models import Journey, Ticket, SeatHold
+
+
+class SeatUnavailable(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Some of the requested seats are already sold or held."
+    default_code = "seat_unavailable"
+
+
+# SQLSTATE of PostgreSQL's lock_not_available, raised when lock_timeout runs out
+LOCK_NOT_AVAILABLE = "55P03"
+
+
+def lock_not_available(error):
+    cause = error.__cause__
+    return LOCK_NOT_AVAILABLE in (getattr(cause, "pgcode", None), getattr(cause, "sqlstate", None))
+
+
+def lock_journeys(journey_ids):
+    """
+    Lock the journey rows for the rest of the transaction.
+
+    Every seat write on a journey goes through its row lock, so bookings
+    on different journeys never wait for each other and bookings on the
+    same journey take turns, each holding the lock for a few statements.
+    Rows are locked in primary key order to keep concurrent orders
+    deadlock free. On PostgreSQL the wait is bounded by
+    SEAT_LOCK_TIMEOUT_MS, after which SeatUnavailable is raised instead
+    of queueing further behind a stuck booking.
+    """
+    bounded = connection.vendor == "postgresql"
+    if bounded:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('lock_timeout', %s, true)", [f"{settings.SEAT_LOCK_TIMEOUT_MS}ms"]
+            )
+
+    try:
+        locked = list(
+            Journey.objects
+            .select_for_update()
+            .filter(pk__in=journey_ids)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+    except OperationalError as error:
+        if not (bounded and lock_not_available(error)):
+            raise
+        raise SeatUnavailable("Seats of this journey are being booked right now, try again.")
+
+    if bounded:
+        # Only the journey lock is bounded, not the writes of the booking
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL lock_timeout = DEFAULT")
+    return locked
+
+
+def active_holds():
+    return SeatHold.objects.filter(expires_at__gt=timezone.now())
+
+
+def release_expired_holds(journey_ids=None):
+    """Delete expired holds and return how many were removed"""
+    expired = SeatHold.objects.filter(expires_at__lte=timezone.now())
+    if journey_ids is not None:
+        expired = expired.filter(journey_id__in=journey_ids)
+
+    deleted, _ = expired.delete()
+    return deleted
+
+
+def seats_filter(seats):
+    """Build a filter matching any of the given (journey_id, cargo, seat)"""
+    query = Q(pk__in=[])
+    for journey_id, cargo, seat in seats:
+        query |= Q(journey_id=journey_id, cargo=cargo, seat=seat)
+    return query
+
+
+def claim_seats(user_id, seats):
+    """
+    Make sure the (journey_id, cargo, seat) triples can be sold to the user.
+
+    Must run inside a transaction. Raises SeatUnavailable if a seat is
+    sold or held by someone else, otherwise consumes the user's own holds.
+    """
+    seats = set(seats)
+    lock_journeys({journey_id for journey_id, _, _ in seats})
+
+    if Ticket.objects.filter(seats_filter(seats)).exists():
+        raise SeatUnavailable()
+
+    holds = active_holds().filter(seats_filter(seats))
+    if holds.exclude(user_id=user_id).exists():
+        raise SeatUnavailable()
+
+    SeatHold.objects.filter(seats_filter(seats)).delete()
+
+
+def taken_seats(journey):
+    """Return the set of (cargo, seat) sold or actively held on the journey"""
+    taken = set(journey.tickets.values_list("cargo", "seat"))
+    taken.update(
+        active_holds().filter(journey=journey).values_list("cargo", "seat")
+    )
+    return taken
+
+
+def hold_seats(user_id, journey, seats):
+    """
+    Hold the (cargo, seat) pairs on the journey for SEAT_HOLD_TTL.
+
+    Must run inside a transaction. Holds the user already has on these
+    seats are renewed, seats taken by anyone else raise SeatUnavailable.
+    """
+    seats = set(seats)
+    lock_journeys([journey.pk])
+    release_expired_holds([journey.pk])
+
+    keys = {(journey.pk, cargo, seat) for cargo, seat in seats}
+    if Ticket.objects.filter(seats_filter(keys)).exists():
+        raise SeatUnavailable()
+
+    holds = SeatHold.objects.filter(seats_filter(keys))
+    if holds.exclude(user_id=user_id).exists():
+        raise SeatUnavailable()
+    holds.delete()
+
+    expires_at = timezone.now() + settings.SEAT_HOLD_TTL
+    return SeatHold.objects.bulk_create(
+        SeatHold(journey=journey, user_id=user_id, cargo=cargo, seat=seat, expires_at=expires_at)
+        for cargo, seat in sorted(seats)
+    )
+
+
+def find_adjacent_seats(train, taken, count):
+    """Return the first run of `count` free neighbouring seats in one cargo"""
+    for cargo in range(1, train.cargo_num + 1):
+        run = []
+        for seat in range(1, train.places_in_cargo + 1):
+            if (cargo, seat) in taken:
+                run = []
+                continue
+
+            run.append((cargo, seat))
+            if len(run) == count:
+                return run
+
+    return None
+
+
+def hold_adjacent_seats(user_id, journey, count):
+    """Pick and hold `count` neighbouring free seats on the journey"""
+    lock_journeys([journey.pk])
+    release_expired_holds([journey.pk])
+
+    seats = find_adjacent_seats(journey.train, taken_seats(journey), count)
+    if seats is None:
+        raise SeatUnavailable(f"There are no {count} adjacent free seats on this journey.")
+
+    return hold_seats(user_id, journey, seats)
+
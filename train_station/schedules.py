@@ -0,0 +1,193 @@
+"""
+Materialization of recurring journey templates.
+
+A JourneyTemplate stands for one journey on every matching day of its
+validity window. The materialize_journeys command creates the concrete
+journeys of the next JOURNEY_TEMPLATE_HORIZON_DAYS days and records in
+materialized_until how far each template got. Searches for a later day
+call materialize_day, which creates the journeys of that day only, so
+the journeys table holds the near future and the days somebody asked
+about instead of every day of every template. Days more than
+JOURNEY_TEMPLATE_MAX_LOOKAHEAD_DAYS ahead are never materialized by a
+search, so crawling dates can't grow the table without limit, and only
+searches of signed in users, which the user throttle limits, create them;
+anonymous searches read the journeys that exist.
+
+Editing or deleting a template replaces its future journeys nobody has a
+ticket or a seat hold on with ones matching the template as it is now.
+Journeys with sold or held seats are left for the operator, and no
+second journey is created on their day.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from train_station.connections import invalidate_timetable_days
+from train_station.models import Journey, JourneyTemplate
+from train_station.replicas import read_from_primary, reading_from
+from train_station.timetable import bulk_create_journeys
+
+SCHEDULE_VERSION_KEY = "schedules:version"
+
+# Days already checked for templates to materialize, per schedule version
+MATERIALIZED_DAY_KEY = "schedules:{}:{}"
+MATERIALIZED_DAY_TIMEOUT = 24 * 60 * 60
+
+
+def today():
+    return timezone.localdate() if settings.USE_TZ else datetime.now().date()
+
+
+def schedule_version():
+    version = cache.get(SCHEDULE_VERSION_KEY)
+    if version is None:
+        cache.add(SCHEDULE_VERSION_KEY, 0, None)
+        version = cache.get(SCHEDULE_VERSION_KEY)
+    return version
+
+
+def invalidate_schedules():
+    try:
+        cache.incr(SCHEDULE_VERSION_KEY)
+    except ValueError:
+        schedule_version()
+
+
+def template_departures(template, first_day, last_day):
+    day = max(first_day, template.valid_from)
+    if template.valid_until is not None:
+        last_day = min(last_day, template.valid_until)
+
+    while day <= last_day:
+        if template.runs_on(day):
+            departure_time = datetime.combine(day, template.departure_time)
+            if settings.USE_TZ:
+                departure_time = timezone.make_aware(departure_time)
+            yield departure_time
+        day += timedelta(days=1)
+
+
+def create_journeys(template, first_day, last_day):
+    """Create the journeys of the template between two days it does not have yet"""
+    departures = list(template_departures(template, first_day, last_day))
+    if not departures:
+        return []
+
+    # One journey per day, a kept journey of an older version of the template counts
+    existing_days = set(
+        template.journeys
+        .filter(departure_time__date__range=(departures[0].date(), departures[-1].date()))
+        .values_list("departure_time__date", flat=True)
+    )
+    crew_ids = set(template.crew.values_list("id", flat=True))
+
+    return bulk_create_journeys([
+        (
+            Journey(
+                route_id=template.route_id,
+                train_id=template.train_id,
+                departure_time=departure_time,
+                arrival_time=departure_time + template.duration,
+                template=template,
+            ),
+            crew_ids,
+        )
+        for departure_time in departures
+        if departure_time.date() not in existing_days
+    ])
+
+
+def unsold_journeys(template):
+    """Future journeys of the template without tickets or active seat holds"""
+    now = timezone.now()
+    return (
+        Journey.objects
+        .filter(template=template, departure_time__gte=now, tickets=None)
+        .exclude(holds__expires_at__gt=now)
+    )
+
+
+def reconcile_template(template):
+    """Recreate the unsold future journeys of an edited template, return how many were created"""
+    with transaction.atomic():
+        template = JourneyTemplate.objects.select_for_update().get(pk=template.pk)
+        # Journey delete signals drop the cached timetable days they leave
+        unsold_journeys(template).delete()
+
+        journeys = []
+        if template.materialized_until is not None:
+            journeys = create_journeys(template, today(), template.materialized_until)
+
+    invalidate_timetable_days({journey.departure_time.date() for journey in journeys})
+    return len(journeys)
+
+
+def active_templates(first_day, last_day):
+    return (
+        JourneyTemplate.objects
+        .filter(valid_from__lte=last_day)
+        .filter(Q(valid_until=None) | Q(valid_until__gte=first_day))
+        .filter(Q(materialized_until=None) | Q(materialized_until__lt=last_day))
+    )
+
+
+def materialize_horizon(days=None):
+    """Create the journeys of the next days for every template, return their count"""
+    first_day = today()
+    last_day = first_day + timedelta(days=settings.JOURNEY_TEMPLATE_HORIZON_DAYS if days is None else days)
+    journeys = []
+
+    for template_id in active_templates(first_day, last_day).values_list("id", flat=True):
+        with transaction.atomic():
+            template = JourneyTemplate.objects.select_for_update().get(pk=template_id)
+            start = first_day
+            if template.materialized_until is not None:
+                start = max(start, template.materialized_until + timedelta(days=1))
+
+            journeys += create_journeys(template, start, last_day)
+            template.materialized_until = last_day
+            template.save(update_fields=["materialized_until"])
+
+    invalidate_timetable_days({journey.departure_time.date() for journey in journeys})
+    return len(journeys)
+
+
+def materialize_day(day):
+    """Create the journeys templates have on a day the horizon has not reached, return their count"""
+    if not today() <= day <= today() + timedelta(days=settings.JOURNEY_TEMPLATE_MAX_LOOKAHEAD_DAYS):
+        return 0
+
+    key = MATERIALIZED_DAY_KEY.format(schedule_version(), day.isoformat())
+    if cache.get(key):
+        return 0
+
+    journeys = []
+    # Lock and read the templates where they are written
+    with reading_from(None):
+        templates = active_templates(day, day).filter(weekdays__contains=str(day.isoweekday()))
+        for template_id in templates.values_list("id", flat=True):
+            with transaction.atomic():
+                template = JourneyTemplate.objects.select_for_update().get(pk=template_id)
+                journeys += create_journeys(template, day, day)
+
+    if journeys:
+        invalidate_timetable_days({day})
+        # The replica of this request has not seen the new journeys yet
+        read_from_primary()
+
+    cache.set(key, True, MATERIALIZED_DAY_TIMEOUT)
+    return len(journeys)
+
+
+def materialize_searched_day(date):
+    """Materialize the ?departure_date=YYYY-MM-DD of a journey search"""
+    try:
+        day = datetime.strptime(date, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return 0
+
+    return materialize_day(day)
@@ -0,0 +1,123 @@
+"""
+Compact occupancy map of a journey.
+
+Every seat of the train is one bit, cargo after cargo: the bit of
+(cargo, seat) is (cargo - 1) * places_in_cargo + (seat - 1), and a set
+bit means the seat is sold. The map is stored on Journey.seat_map with
+the train layout it was built for and kept in sync with ticket writes,
+so the seat map of a journey is read with a single row instead of
+loading all of its tickets. A map built for another layout is rebuilt
+from the tickets. Tickets deleted with their order are released through
+the order, one update per journey, and tickets deleted on their own one
+by one. Only bulk_create and raw SQL bypass the counters,
+rebuild_journey_seats fixes their journeys.
+"""
+import base64
+from itertools import groupby
+
+from django.db.models import F
+
+from train_station.models import Journey, Ticket
+
+
+def seat_map_size(cargo_num, places_in_cargo):
+    return (cargo_num * places_in_cargo + 7) // 8
+
+
+def seat_map_layout(cargo_num, places_in_cargo):
+    return f"{cargo_num}x{places_in_cargo}"
+
+
+def set_seats(seat_map, places_in_cargo, seats, taken=True):
+    """Return a copy of the map with the (cargo, seat) bits set or cleared"""
+    seat_map = bytearray(seat_map)
+    for cargo, seat in seats:
+        index = (cargo - 1) * places_in_cargo + (seat - 1)
+        if not (1 <= seat <= places_in_cargo and 0 <= index < len(seat_map) * 8):
+            continue
+
+        if taken:
+            seat_map[index // 8] |= 1 << (index % 8)
+        else:
+            seat_map[index // 8] &= ~(1 << (index % 8))
+    return bytes(seat_map)
+
+
+def build_seat_map(cargo_num, places_in_cargo, seats):
+    return set_seats(
+        bytes(seat_map_size(cargo_num, places_in_cargo)), places_in_cargo, seats
+    )
+
+
+def encode_base64(seat_map):
+    return base64.b64encode(seat_map).decode()
+
+
+def encode_runs(seat_map, cargo_num, places_in_cargo):
+    """
+    Run-length encode the map as alternating free/sold run lengths,
+    always starting with a (possibly empty) free run
+    """
+    bits = (
+        bool(seat_map[index // 8] & (1 << (index % 8)))
+        for index in range(cargo_num * places_in_cargo)
+    )
+    runs = []
+    expected = False
+    for taken, group in groupby(bits):
+        if taken != expected:
+            runs.append(0)
+        runs.append(sum(1 for _ in group))
+        expected = not taken
+    return runs
+
+
+def journey_seat_map(journey_id, cargo_num, places_in_cargo, seat_map, layout):
+    """Return the stored map, rebuilding it if it was built for another train layout"""
+    if layout == seat_map_layout(cargo_num, places_in_cargo):
+        return bytes(seat_map)
+
+    seat_map = build_seat_map(
+        cargo_num,
+        places_in_cargo,
+        Ticket.objects.filter(journey_id=journey_id).values_list("cargo", "seat"),
+    )
+    Journey.objects.filter(pk=journey_id).update(
+        seat_map=seat_map, seat_map_layout=seat_map_layout(cargo_num, places_in_cargo)
+    )
+    return seat_map
+
+
+def update_journey_seats(journey_id, seats, taken=True):
+    """
+    Mark the (cargo, seat) pairs of the journey as sold or released
+    and adjust its tickets_sold counter.
+
+    The journey row must already be locked by the current transaction.
+    """
+    journey = (
+        Journey.objects
+        .filter(pk=journey_id)
+        .values("seat_map", "seat_map_layout", "train__cargo_num", "train__places_in_cargo")
+        .first()
+    )
+    if journey is None:
+        return
+
+    cargo_num = journey["train__cargo_num"]
+    places_in_cargo = journey["train__places_in_cargo"]
+    layout = seat_map_layout(cargo_num, places_in_cargo)
+    seat_map = bytes(journey["seat_map"])
+
+    if journey["seat_map_layout"] != layout:
+        seat_map = build_seat_map(
+            cargo_num,
+            places_in_cargo,
+            Ticket.objects.filter(journey_id=journey_id).values_list("cargo", "seat"),
+        )
+    seat_map = set_seats(seat_map, places_in_cargo, seats, taken=taken)
+
+    change = len(seats) if taken else -len(seats)
+    Journey.objects.filter(pk=journey_id).update(
+        seat_map=seat_map, seat_map_layout=layout, tickets_sold=F("tickets_sold") + change
+    )
@@ -1,11 +1,21 @@
-from django.db import transaction
+from collections import defaultdict
+
+from django.db import transaction, IntegrityError
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.validators import UniqueTogetherValidator
 
+from train_station.images import (
+    ImageTooLarge, check_thumbnail_queue, decode_image, file_hash, schedule_thumbnails, thumbnail_urls
+)
 from train_station.models import (
-    Station, Route, Crew, TrainType, Train, Journey, Ticket, Order
+    Station, Route, Crew, TrainType, Train, Journey, JourneyTemplate, Ticket, Order, SeatHold
 )
+from train_station.reservations import SeatUnavailable, claim_seats
+from train_station.seat_map import update_journey_seats
+from train_station.timetable import FORMATS, timetable_format
 
 
 class StationSerializer(serializers.ModelSerializer):
@@ -14,6 +24,14 @@ class StationSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "latitude", "longitude")
 
 
+class StationNearSerializer(StationSerializer):
+    distance = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Station
+        fields = ("id", "name", "latitude", "longitude", "distance")
+
+
 class RouteSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -61,10 +79,58 @@ class TrainTypeSerializer(serializers.ModelSerializer):
         fields = ("name", )
 
 
+class TrainImageField(serializers.ImageField):
+    """Decodes the upload once and keeps the image for the thumbnails"""
+
+    def to_internal_value(self, data):
+        file = serializers.FileField.to_internal_value(self, data)
+        check_thumbnail_queue()
+        try:
+            file.decoded_image = decode_image(file)
+        except ImageTooLarge as error:
+            raise ValidationError(str(error))
+        except ValueError:
+            self.fail("invalid_image")
+
+        file.content_hash = file_hash(file)
+        return file
+
+
 class TrainSerializer(serializers.ModelSerializer):
+    thumbnails = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Train
+        fields = ("id", "name", "cargo_num", "places_in_cargo", "train_type", "image", "thumbnails")
+        read_only_fields = ("image", )
+
+    @extend_schema_field(OpenApiTypes.OBJECT)
+    def get_thumbnails(self, train):
+        urls = thumbnail_urls(train)
+        request = self.context.get("request")
+        if urls is None or request is None:
+            return urls
+
+        return {
+            size: {extension: request.build_absolute_uri(url) for extension, url in formats.items()}
+            for size, formats in urls.items()
+        }
+
+
+class TrainImageSerializer(TrainSerializer):
+    image = TrainImageField()
+
     class Meta:
         model = Train
-        fields = ("id", "name", "cargo_num", "places_in_cargo", "train_type", "image")
+        fields = ("id", "image", "thumbnails")
+
+    def update(self, instance, validated_data):
+        image = validated_data["image"]
+        validated_data["image_hash"] = image.content_hash
+        validated_data["thumbnails_ready"] = False
+        train = super().update(instance, validated_data)
+        schedule_thumbnails(train, image.decoded_image)
+        return train
 
 
 class TrainDetailSerializer(TrainSerializer):
@@ -80,7 +146,7 @@ class TrainListSerializer(TrainSerializer):
 
     class Meta:
         model = Train
-        fields = ("id", "name", "train_type")
+        fields = ("id", "name", "train_type", "thumbnails")
 
 
 class JourneySerializer(serializers.ModelSerializer):
@@ -89,9 +155,100 @@ class JourneySerializer(serializers.ModelSerializer):
         fields = ("id", "route", "train", "crew", "departure_time", "arrival_time")
 
 
+class JourneyTemplateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = JourneyTemplate
+        fields = (
+            "id",
+            "route",
+            "train",
+            "crew",
+            "departure_time",
+            "duration",
+            "weekdays",
+            "valid_from",
+            "valid_until",
+            "materialized_until",
+        )
+
+    def validate_weekdays(self, weekdays):
+        return "".join(sorted(set(weekdays)))
+
+    def validate(self, attrs):
+        valid_from = attrs.get("valid_from", getattr(self.instance, "valid_from", None))
+        valid_until = attrs.get("valid_until", getattr(self.instance, "valid_until", None))
+        if valid_until is not None and valid_from is not None and valid_until < valid_from:
+            raise ValidationError({"valid_until": "valid_until must not be before valid_from"})
+        duration = attrs.get("duration")
+        if duration is not None and duration.total_seconds() <= 0:
+            raise ValidationError({"duration": "duration must be positive"})
+        return attrs
+
+
+class PrefetchedJourneyField(serializers.PrimaryKeyRelatedField):
+    """Resolve journeys from the batch loaded by TicketBatchSerializer"""
+
+    def to_internal_value(self, data):
+        journeys = getattr(self.parent.parent, "journeys", None)
+        if journeys is not None and not isinstance(data, bool):
+            try:
+                return journeys[int(data)]
+            except (KeyError, TypeError, ValueError):
+                pass
+
+        return super().to_internal_value(data)
+
+
+class TicketBatchSerializer(serializers.ListSerializer):
+    """
+    Validate a list of tickets with one query for their journeys
+    and one query for the seats already taken on them
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.prefetch(data)
+
+        return super().to_internal_value(data)
+
+    def prefetch(self, data):
+        keys = set()
+        for item in data:
+            try:
+                keys.add((int(item["journey"]), int(item["cargo"]), int(item["seat"])))
+            except (KeyError, TypeError, ValueError):
+                continue
+
+        journey_ids = {journey_id for journey_id, _, _ in keys}
+        self.journeys = (
+            Journey.objects.select_related("train").defer("seat_map").in_bulk(journey_ids)
+        )
+
+        taken = Ticket.objects.filter(
+            journey_id__in=journey_ids,
+            cargo__in={cargo for _, cargo, _ in keys},
+            seat__in={seat for _, _, seat in keys},
+        ).values_list("journey_id", "cargo", "seat")
+        self.taken_seats = set(taken) & keys
+
+    def take_seat(self, journey, cargo, seat):
+        """Return False if the seat is sold or already requested in this batch"""
+        key = (journey.pk, cargo, seat)
+        if key in self.taken_seats:
+            return False
+
+        self.taken_seats.add(key)
+        return True
+
+
 class TicketSerializer(serializers.ModelSerializer):
+    journey = PrefetchedJourneyField(
+        queryset=Journey.objects.select_related("train").defer("seat_map")
+    )
+
     def validate(self, attrs):
         data = super(TicketSerializer, self).validate(attrs=attrs)
+        self.validate_seat_is_free(attrs)
         Ticket.validate_ticket(
             attrs["cargo"],
             attrs["seat"],
@@ -100,9 +257,27 @@ class TicketSerializer(serializers.ModelSerializer):
         )
         return data
 
+    def validate_seat_is_free(self, attrs):
+        journey, cargo, seat = attrs["journey"], attrs["cargo"], attrs["seat"]
+
+        if isinstance(self.parent, TicketBatchSerializer):
+            is_free = self.parent.take_seat(journey, cargo, seat)
+        else:
+            is_free = not Ticket.objects.filter(
+                journey=journey, cargo=cargo, seat=seat
+            ).exists()
+
+        if not is_free:
+            raise ValidationError(
+                UniqueTogetherValidator.message.format(field_names="journey, cargo, seat"),
+                code="unique",
+            )
+
     class Meta:
         model = Ticket
         fields = ("id", "cargo", "seat", "journey")
+        list_serializer_class = TicketBatchSerializer
+        validators = []
 
 
 class TicketSeatsSerializer(TicketSerializer):
@@ -148,13 +323,93 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = ("id", "tickets", "created_at")
 
     def create(self, validated_data):
-        with transaction.atomic():
-            tickets_data = validated_data.pop("tickets")
-            order = Order.objects.create(**validated_data)
-            for ticket_data in tickets_data:
-                Ticket.objects.create(order=order, **ticket_data)
-            return order
+        tickets_data = validated_data.pop("tickets")
+        try:
+            with transaction.atomic():
+                claim_seats(
+                    validated_data["user_id"],
+                    [
+                        (ticket_data["journey"].pk, ticket_data["cargo"], ticket_data["seat"])
+                        for ticket_data in tickets_data
+                    ]
+                )
+                order = Order.objects.create(**validated_data)
+                Ticket.objects.bulk_create(
+                    Ticket(order=order, **ticket_data) for ticket_data in tickets_data
+                )
+
+                sold = defaultdict(list)
+                for ticket_data in tickets_data:
+                    sold[ticket_data["journey"].pk].append(
+                        (ticket_data["cargo"], ticket_data["seat"])
+                    )
+                for journey_id, seats in sold.items():
+                    update_journey_seats(journey_id, seats)
+                return order
+        except IntegrityError:
+            raise SeatUnavailable()
 
 
 class OrderListSerializer(OrderSerializer):
     tickets = TicketListSerializer(many=True, read_only=True)
+
+
+class SeatSerializer(serializers.Serializer):
+    cargo = serializers.IntegerField(min_value=1)
+    seat = serializers.IntegerField(min_value=1)
+
+
+class SeatHoldSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SeatHold
+        fields = ("id", "journey", "cargo", "seat", "expires_at")
+
+
+class SeatHoldCreateSerializer(serializers.Serializer):
+    journey = serializers.PrimaryKeyRelatedField(
+        queryset=Journey.objects.select_related("train")
+    )
+    seats = SeatSerializer(many=True, allow_empty=False)
+
+    def validate(self, attrs):
+        for seat in attrs["seats"]:
+            Ticket.validate_ticket(
+                seat["cargo"],
+                seat["seat"],
+                attrs["journey"].train,
+                ValidationError
+            )
+        return attrs
+
+
+class SeatAutoAssignSerializer(serializers.Serializer):
+    journey = serializers.PrimaryKeyRelatedField(
+        queryset=Journey.objects.select_related("train")
+    )
+    count = serializers.IntegerField(min_value=1)
+
+    def validate(self, attrs):
+        places_in_cargo = attrs["journey"].train.places_in_cargo
+        if attrs["count"] > places_in_cargo:
+            raise ValidationError(
+                {"count": f"count must not exceed places in one cargo: {places_in_cargo}"}
+            )
+        return attrs
+
+
+class ConnectionSearchSerializer(serializers.Serializer):
+    source = serializers.PrimaryKeyRelatedField(queryset=Station.objects.all())
+    destination = serializers.PrimaryKeyRelatedField(queryset=Station.objects.all())
+    date = serializers.DateField()
+    min_transfer = serializers.IntegerField(min_value=0, required=False)
+    max_transfers = serializers.IntegerField(min_value=0, max_value=5, default=3)
+
+
+class TimetableImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=FORMATS, required=False)
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        attrs.setdefault("format", timetable_format(attrs["file"].name))
+        return attrs
@@ -0,0 +1,129 @@
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from train_station.cache import invalidate_catalog
+from train_station.connections import invalidate_timetable_days
+from train_station.distances import invalidate_distances
+from train_station.instrumentation import install_query_recorder
+from train_station.models import (
+    Station,
+    Route,
+    TrainType,
+    Train,
+    Journey,
+    JourneyTemplate,
+    Order,
+    Ticket,
+)
+from train_station.reservations import lock_journeys
+from train_station.schedules import invalidate_schedules
+from train_station.seat_map import update_journey_seats
+
+
+@receiver(post_save, sender=Ticket)
+def count_sold_seat(sender, instance, created, **kwargs):
+    """Keep the journey seat map and tickets_sold in sync with tickets saved one by one"""
+    if created:
+        lock_journeys([instance.journey_id])
+        update_journey_seats(instance.journey_id, [(instance.cargo, instance.seat)])
+
+
+# Orders being deleted, whose tickets were released together before the cascade
+_released_orders = ContextVar("released_orders", default=frozenset())
+
+
+@receiver(pre_delete, sender=Order)
+def release_order_seats(sender, instance, **kwargs):
+    """Release the seats of the order's tickets, one seat map update per journey"""
+    seats = defaultdict(list)
+    for journey_id, cargo, seat in instance.tickets.values_list("journey_id", "cargo", "seat"):
+        seats[journey_id].append((cargo, seat))
+
+    lock_journeys(seats)
+    for journey_id, journey_seats in seats.items():
+        update_journey_seats(journey_id, journey_seats, taken=False)
+    _released_orders.set(_released_orders.get() | {instance.pk})
+
+
+@receiver(post_delete, sender=Ticket)
+def release_seat(sender, instance, **kwargs):
+    """Release the seat of a ticket deleted on its own"""
+    if instance.order_id in _released_orders.get():
+        return
+
+    lock_journeys([instance.journey_id])
+    update_journey_seats(instance.journey_id, [(instance.cargo, instance.seat)], taken=False)
+
+
+@receiver(post_delete, sender=Order)
+def forget_released_order(sender, instance, **kwargs):
+    # Ticket post_delete signals of the cascade are sent before the order's
+    _released_orders.set(_released_orders.get() - {instance.pk})
+
+
+@receiver(post_save, sender=Station)
+@receiver(post_save, sender=Route)
+@receiver(post_save, sender=TrainType)
+@receiver(post_save, sender=Train)
+@receiver(post_delete, sender=Station)
+@receiver(post_delete, sender=Route)
+@receiver(post_delete, sender=TrainType)
+@receiver(post_delete, sender=Train)
+def catalog_changed(sender, **kwargs):
+    """Drop cached catalog responses when a station, route or train changes"""
+    invalidate_catalog()
+
+
+@receiver(pre_save, sender=Journey)
+def remember_departure_day(sender, instance, **kwargs):
+    instance._previous_departure_time = (
+        Journey.objects.filter(pk=instance.pk).values_list("departure_time", flat=True).first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=Journey)
+@receiver(post_delete, sender=Journey)
+def timetable_changed(sender, instance, **kwargs):
+    """Reload the timetable days a journey left or joined"""
+    departure_times = {
+        instance.departure_time,
+        getattr(instance, "_previous_departure_time", None),
+    }
+    invalidate_timetable_days(
+        {departure_time.date() for departure_time in departure_times if departure_time}
+    )
+
+
+@receiver(post_save, sender=JourneyTemplate)
+@receiver(post_delete, sender=JourneyTemplate)
+def schedule_changed(sender, **kwargs):
+    """Check the days searched beyond the horizon for journeys to materialize again"""
+    invalidate_schedules()
+
+
+@receiver(pre_save, sender=Station)
+def remember_coordinates(sender, instance, **kwargs):
+    instance._previous_coordinates = (
+        Station.objects.filter(pk=instance.pk).values_list("latitude", "longitude").first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=Station)
+def station_saved(sender, instance, **kwargs):
+    """Rebuild the distance matrix when a station moves, new stations are appended to it"""
+    previous = getattr(instance, "_previous_coordinates", None)
+    if previous is not None and previous != (instance.latitude, instance.longitude):
+        invalidate_distances()
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    install_query_recorder(connection)
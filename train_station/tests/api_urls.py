@@ -7,3 +7,5 @@ TRAIN_TYPE_URL = reverse("train_station:traintype-list")
 TRAIN_URL = reverse("train_station:train-list")
 JOURNEY_URL = reverse("train_station:journey-list")
 ORDER_URL = reverse("train_station:order-list")
+HOLD_URL = reverse("train_station:seathold-list")
+HOLD_AUTO_ASSIGN_URL = reverse("train_station:seathold-auto-assign")
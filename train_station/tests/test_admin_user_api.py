@@ -48,3 +48,12 @@ class AdminMovieTests(TestCase):
         res = self.client.post(JOURNEY_URL, payload)
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_route_calculates_distance(self):
+        lviv = sample_station(name="Lviv", latitude=49.8397, longitude=24.0297)
+        kyiv = sample_station(name="Kyiv", latitude=50.4501, longitude=30.5234)
+
+        res = self.client.post(ROUTE_URL, {"source": lviv.id, "destination": kyiv.id})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Route.objects.get(id=res.data["id"]).distance, 469)
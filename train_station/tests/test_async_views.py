@@ -0,0 +1,100 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from .api_urls import *
+from .api_samples import *
+
+ASYNC_STATION_URL = reverse("train_station:async-station-list")
+ASYNC_JOURNEY_URL = reverse("train_station:async-journey-list")
+
+
+def async_journey_detail_url(journey_id):
+    return reverse("train_station:async-journey-detail", args=[journey_id])
+
+
+def journey_detail_url(journey_id):
+    return reverse("train_station:journey-detail", args=[journey_id])
+
+
+class AsyncReadApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com",
+            "test_password"
+        )
+        self.client.force_authenticate(self.user)
+
+        lviv = sample_station(name="Lviv")
+        kyiv = sample_station(name="Kyiv")
+        self.journeys = [
+            sample_journey(
+                route=sample_route(source=lviv, destination=kyiv),
+                departure_time=datetime.datetime(2023, 11, 1, hour),
+                arrival_time=datetime.datetime(2023, 11, 1, hour + 5),
+            )
+            for hour in range(6, 18)
+        ]
+        journey = self.journeys[0]
+        journey.crew.add(sample_crew())
+
+        self.token_client = APIClient()
+        token = self.client.post(
+            reverse("user:token_obtain_pair"),
+            {"email": "test@test.com", "password": "test_password"},
+        ).data["access"]
+        self.token_client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_journey_list_matches_sync_endpoint(self):
+        params = {"source": "Lviv", "page": 2, "page_size": 5}
+
+        expected = self.token_client.get(JOURNEY_URL, params).json()
+        res = self.token_client.get(ASYNC_JOURNEY_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()["results"], expected["results"])
+        self.assertEqual(res.json()["count"], 12)
+        self.assertIn("page=3", res.json()["next"])
+
+    def test_journey_detail_matches_sync_endpoint(self):
+        journey = self.journeys[0]
+
+        expected = self.token_client.get(journey_detail_url(journey.id)).json()
+        res = self.token_client.get(async_journey_detail_url(journey.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), expected)
+
+    def test_station_list_is_cached(self):
+        res = self.client.get(ASYNC_STATION_URL, {"name": "Lviv"})
+        self.assertEqual(res.json()["count"], 1)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(ASYNC_STATION_URL, {"name": "Lviv"})
+
+        self.assertEqual(cached.json(), res.json())
+
+    def test_missing_journey(self):
+        res = self.token_client.get(async_journey_detail_url(0))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_token_is_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer invalid")
+
+        res = self.client.get(ASYNC_JOURNEY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_only_reads_are_allowed(self):
+        res = self.token_client.post(ASYNC_JOURNEY_URL, {})
+
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
@@ -117,3 +117,50 @@ class AuthenticatedTrainStationApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
+
+    def test_filtering_by_departure_date(self):
+        journey1 = sample_journey(
+            departure_time=datetime.datetime(2023, 10, 22, 23, 59),
+            arrival_time=datetime.datetime(2023, 10, 23, 6, 0),
+        )
+        journey2 = sample_journey(
+            departure_time=datetime.datetime(2023, 10, 23, 0, 0),
+            arrival_time=datetime.datetime(2023, 10, 23, 6, 0),
+        )
+
+        res = self.client.get(JOURNEY_URL, {"departure_date": "2023-10-22"})
+        ids = [journey["id"] for journey in res.data["results"]]
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn(journey1.id, ids)
+        self.assertNotIn(journey2.id, ids)
+
+        res = self.client.get(JOURNEY_URL, {"arrival_date": "2023-10-23"})
+        self.assertEqual(len(res.data["results"]), 2)
+
+    def test_keyset_pagination(self):
+        train = sample_train()
+        route = sample_route()
+        start = datetime.datetime(2023, 10, 22, 8, 0)
+        journeys = [
+            sample_journey(
+                route=route,
+                train=train,
+                departure_time=start + datetime.timedelta(hours=hour % 3),
+                arrival_time=start + datetime.timedelta(hours=5),
+            )
+            for hour in range(5)
+        ]
+
+        res = self.client.get(JOURNEY_URL, {"pagination": "cursor", "page_size": 2})
+        ids = [journey["id"] for journey in res.data["results"]]
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            ids += [journey["id"] for journey in res.data["results"]]
+
+        expected = sorted(journeys, key=lambda journey: (journey.departure_time, journey.id))
+        self.assertEqual(ids, [journey.id for journey in expected])
+        self.assertNotIn("count", res.data)
+
+        res = self.client.get(JOURNEY_URL, {"pagination": "cursor", "count": "approximate"})
+        self.assertEqual(res.data["count"], 5)
@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from .api_urls import *
+from .api_samples import *
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com",
+            "test_password"
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_list_is_served_from_cache(self):
+        sample_station()
+        self.client.get(STATION_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(STATION_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["count"], 1)
+
+    def test_query_params_are_part_of_the_key(self):
+        sample_station(name="Lviv")
+        sample_station(name="Kyiv")
+        self.client.get(STATION_URL)
+
+        res = self.client.get(STATION_URL, {"name": "Lviv"})
+
+        self.assertEqual(res.data["count"], 1)
+
+    def test_station_change_invalidates_cache(self):
+        station = sample_station(name="Lviv")
+        sample_route(source=station)
+        self.client.get(STATION_URL)
+        self.client.get(ROUTE_URL)
+
+        station.name = "Kyiv"
+        station.save()
+
+        self.assertEqual(self.client.get(STATION_URL).data["results"][0]["name"], "Kyiv")
+        self.assertEqual(self.client.get(ROUTE_URL).data["results"][0]["source"], "Kyiv")
@@ -0,0 +1,93 @@
+import datetime
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from train_station.connections import TimetableIndex, day_version_key
+from .api_urls import *
+from .api_samples import *
+
+CONNECTION_URL = reverse("train_station:journey-connections")
+
+
+def at(hour, minute=0):
+    return datetime.datetime(2023, 10, 22, hour, minute)
+
+
+class ConnectionSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.lviv = sample_station(name="Lviv")
+        self.kyiv = sample_station(name="Kyiv")
+        self.odesa = sample_station(name="Odesa")
+        self.train = sample_train()
+
+    def journey(self, source, destination, departure, arrival):
+        return sample_journey(
+            route=sample_route(source=source, destination=destination),
+            train=self.train,
+            departure_time=departure,
+            arrival_time=arrival,
+        )
+
+    def search(self, **params):
+        params = {
+            "source": self.lviv.id,
+            "destination": self.odesa.id,
+            "date": "2023-10-22",
+            **params,
+        }
+        return self.client.get(CONNECTION_URL, params)
+
+    def test_earliest_arrival_and_fewest_transfers(self):
+        direct = self.journey(self.lviv, self.odesa, at(8), at(20))
+        first_leg = self.journey(self.lviv, self.kyiv, at(6), at(10))
+        second_leg = self.journey(self.kyiv, self.odesa, at(10, 30), at(15))
+
+        res = self.search()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        earliest = res.data["earliest_arrival"]
+        self.assertEqual(earliest["transfers"], 1)
+        self.assertEqual(
+            [leg["id"] for leg in earliest["legs"]], [first_leg.id, second_leg.id]
+        )
+        fewest = res.data["fewest_transfers"]
+        self.assertEqual(fewest["transfers"], 0)
+        self.assertEqual(fewest["legs"][0]["id"], direct.id)
+
+    def test_minimum_transfer_time(self):
+        self.journey(self.lviv, self.kyiv, at(6), at(10))
+        self.journey(self.kyiv, self.odesa, at(10, 30), at(15))
+
+        res = self.search(min_transfer=45)
+
+        self.assertIsNone(res.data["earliest_arrival"])
+
+    def test_new_journey_is_found_after_index_is_loaded(self):
+        self.assertIsNone(self.search().data["earliest_arrival"])
+
+        journey = self.journey(self.lviv, self.odesa, at(8), at(20))
+
+        res = self.search()
+        self.assertEqual(res.data["earliest_arrival"]["legs"][0]["id"], journey.id)
+
+    def test_index_keeps_recent_days(self):
+        index = TimetableIndex()
+        day = at(0).date()
+
+        with mock.patch("train_station.connections.MAX_CACHED_DAYS", 2):
+            index.connections(day, day + datetime.timedelta(days=2))
+
+        self.assertEqual(list(index._days), [day + datetime.timedelta(days=offset) for offset in (1, 2)])
+        self.assertIsNotNone(cache._expire_info[cache.make_key(day_version_key(day))])
+
+    def test_invalid_station(self):
+        res = self.search(source=0)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,111 @@
+import csv
+import datetime
+import io
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+
+from train_station.models import Order, Ticket
+from .api_samples import *
+
+ORDER_EXPORT_URL = reverse("train_station:export-orders")
+TICKET_EXPORT_URL = reverse("train_station:export-tickets")
+JOURNEY_EXPORT_URL = reverse("train_station:export-journeys")
+
+
+def content(response):
+    return b"".join(response.streaming_content).decode()
+
+
+class ExportApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "admin@admin.com",
+            "admin_password",
+            is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        self.access_token = str(AccessToken.for_user(self.user))
+
+        self.journeys = [
+            sample_journey(
+                departure_time=datetime.datetime(2023, 11, day, 8),
+                arrival_time=datetime.datetime(2023, 11, day, 13),
+            )
+            for day in (1, 2, 3)
+        ]
+        self.orders = []
+        for day, journey in zip((1, 2, 3), self.journeys):
+            order = Order.objects.create(user=self.user)
+            Order.objects.filter(pk=order.pk).update(created_at=datetime.datetime(2023, 10, day, 12))
+            Ticket.objects.create(order=order, journey=journey, cargo=1, seat=day)
+            self.orders.append(order)
+
+    def test_orders_csv(self):
+        res = self.client.get(ORDER_EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "text/csv")
+        self.assertIn('filename="orders.csv"', res["Content-Disposition"])
+        rows = list(csv.DictReader(io.StringIO(content(res))))
+        self.assertEqual([int(row["id"]) for row in rows], [order.id for order in self.orders])
+        self.assertEqual(rows[0]["created_at"], "2023-10-01T12:00:00")
+        self.assertEqual(rows[0]["user"], "admin@admin.com")
+        self.assertEqual(rows[0]["tickets"], "1")
+
+    def test_tickets_ndjson_in_date_range(self):
+        res = self.client.get(
+            TICKET_EXPORT_URL, {"output": "ndjson", "from": "2023-10-02", "to": "2023-10-03"}
+        )
+
+        self.assertEqual(res["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in content(res).splitlines()]
+        self.assertEqual([row["seat"] for row in rows], [2, 3])
+        self.assertEqual(rows[0]["journey"], self.journeys[1].id)
+        self.assertEqual(rows[0]["departure_time"], "2023-11-02T08:00:00")
+
+    def test_journeys_by_departure_date(self):
+        res = self.client.get(JOURNEY_EXPORT_URL, {"from": "2023-11-03"})
+
+        rows = list(csv.DictReader(io.StringIO(content(res))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(int(rows[0]["id"]), self.journeys[2].id)
+        self.assertEqual(rows[0]["train"], "sample-train")
+        self.assertEqual(rows[0]["tickets_available"], "399")
+
+    async def test_export_streams_asynchronously_under_asgi(self):
+        res = await self.async_client.get(
+            JOURNEY_EXPORT_URL,
+            headers={"authorization": f"Bearer {self.access_token}"},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.is_async)
+        lines = [chunk async for chunk in res.streaming_content]
+        rows = list(csv.DictReader(io.StringIO(b"".join(lines).decode())))
+        self.assertEqual(len(rows), 3)
+
+    def test_export_reads_rows_with_one_cursor(self):
+        with self.settings(EXPORT_CHUNK_SIZE=1), self.assertNumQueries(1):
+            content(self.client.get(JOURNEY_EXPORT_URL))
+
+    def test_invalid_parameters(self):
+        for params in ({"from": "01.10.2023"}, {"output": "xml"}):
+            res = self.client.get(ORDER_EXPORT_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_exports_are_admin_only(self):
+        self.client.force_authenticate(
+            get_user_model().objects.create_user("test@test.com", "test_password")
+        )
+
+        res = self.client.get(ORDER_EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
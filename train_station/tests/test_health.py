@@ -0,0 +1,31 @@
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+
+HEALTH_URL = reverse("health")
+READY_URL = reverse("ready")
+
+
+class HealthCheckTests(TestCase):
+    def test_health(self):
+        res = self.client.get(HEALTH_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), {"status": "ok"})
+
+    def test_ready(self):
+        res = self.client.get(READY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()["checks"], {"database": "ok", "cache": "ok"})
+
+    def test_not_ready_without_database(self):
+        with mock.patch("train_service.health.check_database", side_effect=OSError), \
+                self.assertLogs("train_service.health", "ERROR"):
+            res = self.client.get(READY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res.json()["checks"]["database"], "unavailable")
@@ -0,0 +1,122 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import serializers, status
+
+from train_station.instrumentation import RequestMetrics, _metrics, serialized, timed_serializer_class
+from train_station.serializers import TicketBatchSerializer, TicketSerializer
+from .api_urls import *
+from .api_samples import *
+
+ASYNC_STATION_URL = reverse("train_station:async-station-list")
+
+
+class RequestMetricsTests(TestCase):
+    def test_duplicates_are_grouped_by_fingerprint(self):
+        metrics = RequestMetrics()
+        for ids in ("%s", "%s, %s", "%s, %s, %s"):
+            metrics.add_query(f'SELECT * FROM "ticket" WHERE "order_id" IN ({ids})', 0.001)
+        metrics.add_query('SELECT * FROM "order"', 0.001)
+
+        self.assertEqual(metrics.queries, 4)
+        self.assertEqual(
+            metrics.duplicates(),
+            [{"sql": 'SELECT * FROM "ticket" WHERE "order_id" IN (%s, ...)', "count": 2}],
+        )
+
+
+class SlowSerializer(serializers.Serializer):
+    def to_representation(self, instance):
+        time.sleep(0.01)
+        if instance:
+            return {"nested": serialized(SlowSerializer(instance - 1))}
+        return {}
+
+
+class SerializerTimerTests(TestCase):
+    def timed(self, serialize):
+        metrics = RequestMetrics()
+        token = _metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            data = serialize()
+        finally:
+            elapsed = time.perf_counter() - started
+            _metrics.reset(token)
+        return data, metrics.serialize_time, elapsed
+
+    def test_outermost_serializer_is_timed(self):
+        data, serialize_time, elapsed = self.timed(lambda: serialized(SlowSerializer(1)))
+
+        # The nested serializer's time is not added a second time
+        self.assertEqual(data, {"nested": {}})
+        self.assertGreaterEqual(serialize_time, 0.02)
+        self.assertLessEqual(serialize_time, elapsed)
+
+    def test_not_timed_outside_sampled_requests(self):
+        self.assertEqual(serialized(SlowSerializer(1)), {"nested": {}})
+
+    def test_viewset_serializer_lists_are_timed(self):
+        serializer_class = timed_serializer_class(SlowSerializer)
+        data, serialize_time, elapsed = self.timed(
+            lambda: serializer_class([0, 0], many=True).data
+        )
+
+        self.assertEqual(data, [{}, {}])
+        self.assertGreaterEqual(serialize_time, 0.02)
+
+    def test_timed_serializers_keep_their_list_serializer(self):
+        serializer = timed_serializer_class(TicketSerializer)(many=True)
+
+        self.assertIsInstance(serializer, TicketBatchSerializer)
+        self.assertIsInstance(serializer.child, TicketSerializer)
+
+
+class InstrumentationMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com",
+            "test_password"
+        )
+        self.client.force_authenticate(self.user)
+        sample_journey()
+
+    def logged_request(self, url):
+        with self.assertLogs("train_station.instrumentation", "INFO") as logs:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(logs.records), 1)
+        return res, json.loads(logs.records[0].getMessage())
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=1)
+    def test_sampled_request(self):
+        res, record = self.logged_request(JOURNEY_URL)
+
+        self.assertEqual(record["view"], "JourneyViewSet.list")
+        self.assertEqual(record["status"], 200)
+        self.assertGreater(record["queries"], 0)
+        self.assertIn(f'desc="{record["queries"]} queries"', res["Server-Timing"])
+        for metric in ("db", "serialize", "view", "render", "total"):
+            self.assertIn(f"{metric};dur=", res["Server-Timing"])
+        self.assertGreaterEqual(record["serialize_ms"], 0)
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=1)
+    def test_async_view(self):
+        res, record = self.logged_request(ASYNC_STATION_URL)
+
+        self.assertEqual(record["view"], "train_station.async_views.station_list")
+        self.assertGreater(record["queries"], 0)
+
+    def test_off_by_default(self):
+        with self.assertNoLogs("train_station.instrumentation", "INFO"):
+            res = self.client.get(JOURNEY_URL)
+
+        self.assertNotIn("Server-Timing", res)
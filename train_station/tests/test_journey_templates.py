@@ -0,0 +1,245 @@
+import datetime
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from train_station.models import Journey, JourneyTemplate, Order, Ticket
+from train_station.schedules import materialize_horizon, today
+from .api_urls import *
+from .api_samples import *
+
+JOURNEY_TEMPLATE_URL = reverse("train_station:journeytemplate-list")
+
+
+def sample_journey_template(**params):
+    defaults = {
+        "route": sample_route(),
+        "train": sample_train(),
+        "departure_time": datetime.time(8, 30),
+        "duration": datetime.timedelta(hours=5),
+        "valid_from": today(),
+    }
+    defaults.update(params)
+
+    return JourneyTemplate.objects.create(**defaults)
+
+
+@override_settings(JOURNEY_TEMPLATE_HORIZON_DAYS=14)
+class JourneyTemplateMaterializationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.template = sample_journey_template(weekdays="135")
+        self.crew = sample_crew()
+        self.template.crew.add(self.crew)
+
+    def test_horizon_is_materialized_once(self):
+        created = materialize_horizon()
+
+        departures = list(Journey.objects.values_list("departure_time", flat=True))
+        expected_days = [
+            today() + datetime.timedelta(days=offset)
+            for offset in range(15)
+            if (today() + datetime.timedelta(days=offset)).isoweekday() in (1, 3, 5)
+        ]
+        self.assertEqual(created, len(expected_days))
+        self.assertEqual(sorted(departure.date() for departure in departures), expected_days)
+        self.assertTrue(all(departure.time() == datetime.time(8, 30) for departure in departures))
+
+        journey = Journey.objects.first()
+        self.assertEqual(journey.arrival_time - journey.departure_time, datetime.timedelta(hours=5))
+        self.assertEqual(list(journey.crew.all()), [self.crew])
+
+        self.template.refresh_from_db()
+        self.assertEqual(self.template.materialized_until, today() + datetime.timedelta(days=14))
+        self.assertEqual(materialize_horizon(), 0)
+
+    def test_validity_window_is_respected(self):
+        self.template.weekdays = "1234567"
+        self.template.valid_until = today() + datetime.timedelta(days=2)
+        self.template.save()
+
+        self.assertEqual(materialize_horizon(), 3)
+
+    def test_command(self):
+        stdout = io.StringIO()
+
+        call_command("materialize_journeys", "--days", "6", stdout=stdout)
+
+        self.assertIn("Created 3 journey(s) from templates", stdout.getvalue())
+
+
+@override_settings(JOURNEY_TEMPLATE_HORIZON_DAYS=14)
+class JourneyTemplateSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com",
+            "test_password"
+        )
+        self.client.force_authenticate(self.user)
+        self.day = today() + datetime.timedelta(days=100)
+
+    def search(self, day):
+        return self.client.get(JOURNEY_URL, {"departure_date": day.isoformat()})
+
+    def test_search_beyond_horizon_materializes_the_day(self):
+        template = sample_journey_template()
+        materialize_horizon()
+
+        res = self.search(self.day)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 1)
+        journey = Journey.objects.get(id=res.data["results"][0]["id"])
+        self.assertEqual(journey.template, template)
+        self.assertEqual(journey.departure_time.date(), self.day)
+
+        self.assertEqual(len(self.search(self.day).data["results"]), 1)
+        self.assertEqual(Journey.objects.filter(departure_time__date=self.day).count(), 1)
+
+    def test_past_days_are_not_materialized(self):
+        sample_journey_template(valid_from=today() - datetime.timedelta(days=30))
+
+        res = self.search(today() - datetime.timedelta(days=1))
+
+        self.assertEqual(res.data["results"], [])
+
+    @override_settings(JOURNEY_TEMPLATE_MAX_LOOKAHEAD_DAYS=99)
+    def test_days_beyond_lookahead_are_not_materialized(self):
+        sample_journey_template()
+
+        res = self.search(self.day)
+
+        self.assertEqual(res.data["results"], [])
+        self.assertFalse(Journey.objects.exists())
+
+    def test_anonymous_search_does_not_materialize(self):
+        sample_journey_template()
+        self.client.force_authenticate(None)
+
+        res = self.search(self.day)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["results"], [])
+        self.assertFalse(Journey.objects.exists())
+
+    def test_anonymous_async_search_does_not_materialize(self):
+        sample_journey_template()
+
+        res = APIClient().get(
+            reverse("train_station:async-journey-list"),
+            {"departure_date": self.day.isoformat()},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()["results"], [])
+        self.assertFalse(Journey.objects.exists())
+
+    def test_new_template_is_found_on_a_searched_day(self):
+        self.assertEqual(self.search(self.day).data["results"], [])
+
+        sample_journey_template()
+
+        self.assertEqual(len(self.search(self.day).data["results"]), 1)
+
+
+class JourneyTemplateApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "admin@admin.com",
+            "admin_password",
+            is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+
+    def template_detail_url(self, template):
+        return reverse("train_station:journeytemplate-detail", args=[template.id])
+
+    def materialized_template(self):
+        template = sample_journey_template(valid_from=today() + datetime.timedelta(days=1))
+        with self.settings(JOURNEY_TEMPLATE_HORIZON_DAYS=6):
+            materialize_horizon()
+        sold = template.journeys.order_by("departure_time")[2]
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(order=order, journey=sold, cargo=1, seat=1)
+        return template, sold
+
+    def test_edit_template_recreates_unsold_journeys(self):
+        template, sold = self.materialized_template()
+        crew = sample_crew()
+
+        res = self.client.patch(
+            self.template_detail_url(template),
+            {"departure_time": "10:00", "crew": [crew.id]},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        journeys = template.journeys.order_by("departure_time")
+        self.assertEqual(journeys.count(), 6)
+        for journey in journeys:
+            if journey.id == sold.id:
+                self.assertEqual(journey.departure_time.time(), datetime.time(8, 30))
+                self.assertEqual(list(journey.crew.all()), [])
+            else:
+                self.assertEqual(journey.departure_time.time(), datetime.time(10, 0))
+                self.assertEqual(list(journey.crew.all()), [crew])
+
+    def test_delete_template_removes_unsold_journeys(self):
+        template, sold = self.materialized_template()
+
+        res = self.client.delete(self.template_detail_url(template))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(list(Journey.objects.values_list("id", flat=True)), [sold.id])
+
+    def test_create_template(self):
+        payload = {
+            "route": sample_route().id,
+            "train": sample_train().id,
+            "crew": [sample_crew().id],
+            "departure_time": "06:15",
+            "duration": "04:30:00",
+            "weekdays": "5151",
+            "valid_from": "2023-11-01",
+            "valid_until": "2024-03-31",
+        }
+
+        res = self.client.post(JOURNEY_TEMPLATE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["weekdays"], "15")
+        self.assertIsNone(res.data["materialized_until"])
+
+    def test_invalid_template(self):
+        payload = {
+            "route": sample_route().id,
+            "train": sample_train().id,
+            "departure_time": "06:15",
+            "duration": "04:30:00",
+            "weekdays": "189",
+            "valid_from": "2023-11-01",
+            "valid_until": "2023-10-01",
+        }
+
+        res = self.client.post(JOURNEY_TEMPLATE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("weekdays", res.data)
+
+    def test_templates_are_admin_only(self):
+        self.client.force_authenticate(
+            get_user_model().objects.create_user("test@test.com", "test_password")
+        )
+
+        res = self.client.get(JOURNEY_TEMPLATE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
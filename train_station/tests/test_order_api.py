@@ -0,0 +1,306 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from train_station.models import Order, SeatHold, Ticket
+from .api_urls import *
+from .api_samples import *
+
+
+def order_detail_url(order_id):
+    return reverse("train_station:order-detail", args=[order_id])
+
+
+class OrderApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com",
+            "test_password"
+        )
+        self.client.force_authenticate(self.user)
+        self.journey = sample_journey()
+
+    def create_order(self, *seats):
+        payload = {
+            "tickets": [
+                {"cargo": cargo, "seat": seat, "journey": self.journey.id}
+                for cargo, seat in seats
+            ]
+        }
+        return self.client.post(ORDER_URL, payload, format="json")
+
+    def test_create_order_updates_tickets_sold(self):
+        res = self.create_order((1, 1), (1, 2))
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.journey.refresh_from_db()
+        self.assertEqual(self.journey.tickets_sold, 2)
+
+        res = self.client.get(JOURNEY_URL)
+        self.assertEqual(
+            res.data["results"][0]["tickets_available"],
+            self.journey.train.capacity - 2
+        )
+
+    def test_delete_order_releases_tickets_sold(self):
+        res = self.create_order((1, 1), (1, 2))
+
+        res = self.client.delete(order_detail_url(res.data["id"]))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.journey.refresh_from_db()
+        self.assertEqual(self.journey.tickets_sold, 0)
+
+    def test_tickets_saved_outside_orders_are_counted(self):
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(order=order, journey=self.journey, cargo=1, seat=1)
+        self.journey.refresh_from_db()
+        self.assertEqual(self.journey.tickets_sold, 1)
+
+        self.user.delete()
+
+        self.journey.refresh_from_db()
+        self.assertEqual(self.journey.tickets_sold, 0)
+        self.assertFalse(Ticket.objects.exists())
+
+    def test_delete_single_ticket_releases_seat(self):
+        self.create_order((1, 1), (1, 2))
+        ticket = Ticket.objects.get(seat=1)
+
+        ticket.delete()
+
+        self.journey.refresh_from_db()
+        self.assertEqual(self.journey.tickets_sold, 1)
+        self.assertEqual(bytes(self.journey.seat_map)[0], 0b10)
+
+        self.create_order((1, 1))
+        self.journey.refresh_from_db()
+        self.assertEqual(self.journey.tickets_sold, 2)
+
+    def test_delete_order_query_count_does_not_depend_on_tickets(self):
+        small = self.create_order((1, 1)).data["id"]
+        large = self.create_order(*[(2, seat) for seat in range(1, 41)]).data["id"]
+
+        with CaptureQueriesContext(connection) as small_queries:
+            self.client.delete(order_detail_url(small))
+        with CaptureQueriesContext(connection) as large_queries:
+            self.client.delete(order_detail_url(large))
+
+        self.assertEqual(len(large_queries), len(small_queries))
+        self.journey.refresh_from_db()
+        self.assertEqual(self.journey.tickets_sold, 0)
+
+    def test_rebuild_journey_seats_fixes_drift(self):
+        self.create_order((1, 1), (1, 2))
+        Journey.objects.filter(pk=self.journey.pk).update(tickets_sold=10)
+
+        call_command("rebuild_journey_seats", stdout=StringIO())
+
+        self.journey.refresh_from_db()
+        self.assertEqual(self.journey.tickets_sold, 2)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_create_order_with_sold_seat(self):
+        self.create_order((1, 1))
+
+        res = self.create_order((1, 2), (1, 1))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data["tickets"][0], {})
+        self.assertEqual(
+            res.data["tickets"][1]["non_field_errors"][0].code, "unique"
+        )
+
+    def test_create_order_with_duplicate_seats(self):
+        res = self.create_order((1, 1), (1, 1))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("non_field_errors", res.data["tickets"][1])
+        self.assertFalse(Order.objects.exists())
+
+    def test_create_order_with_seat_out_of_range(self):
+        res = self.create_order((1, self.journey.train.places_in_cargo + 1))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("seat", res.data["tickets"][0])
+
+    def test_create_order_query_count_does_not_depend_on_tickets(self):
+        self.create_order((1, 1))
+
+        with self.assertNumQueries(13):
+            self.create_order((1, 2))
+        with self.assertNumQueries(13):
+            self.create_order(*[(2, seat) for seat in range(1, 21)])
+
+
+class JourneySeatMapApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com",
+            "test_password"
+        )
+        self.client.force_authenticate(self.user)
+        self.journey = sample_journey(train=sample_train(cargo_num=2, places_in_cargo=6))
+        self.url = reverse("train_station:journey-seat-map", args=[self.journey.id])
+
+    def test_seat_map_tracks_sold_seats(self):
+        payload = {
+            "tickets": [
+                {"cargo": 1, "seat": 2, "journey": self.journey.id},
+                {"cargo": 2, "seat": 1, "journey": self.journey.id},
+            ]
+        }
+        order = self.client.post(ORDER_URL, payload, format="json")
+
+        res = self.client.get(self.url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["seats"], "QgA=")
+
+        res = self.client.get(self.url, {"encoding": "rle"})
+        self.assertEqual(res.data["seats"], [1, 1, 4, 1, 5])
+
+        self.client.delete(order_detail_url(order.data["id"]))
+        res = self.client.get(self.url, {"encoding": "rle"})
+        self.assertEqual(res.data["seats"], [12])
+
+    def test_train_layout_change_rebuilds_map(self):
+        payload = {"tickets": [{"cargo": 2, "seat": 1, "journey": self.journey.id}]}
+        self.client.post(ORDER_URL, payload, format="json")
+        self.assertEqual(self.client.get(self.url, {"encoding": "rle"}).data["seats"], [6, 1, 5])
+
+        Train.objects.filter(pk=self.journey.train_id).update(cargo_num=3, places_in_cargo=4)
+
+        res = self.client.get(self.url, {"encoding": "rle"})
+        self.assertEqual(res.data["seats"], [4, 1, 7])
+
+
+class SeatHoldApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com",
+            "test_password"
+        )
+        self.other_user = get_user_model().objects.create_user(
+            "other@test.com",
+            "test_password"
+        )
+        self.client.force_authenticate(self.user)
+        self.journey = sample_journey(train=sample_train(cargo_num=2, places_in_cargo=4))
+
+    def hold(self, *seats):
+        payload = {
+            "journey": self.journey.id,
+            "seats": [{"cargo": cargo, "seat": seat} for cargo, seat in seats]
+        }
+        return self.client.post(HOLD_URL, payload, format="json")
+
+    def order(self, *seats):
+        payload = {
+            "tickets": [
+                {"cargo": cargo, "seat": seat, "journey": self.journey.id}
+                for cargo, seat in seats
+            ]
+        }
+        return self.client.post(ORDER_URL, payload, format="json")
+
+    def test_hold_seats(self):
+        res = self.hold((1, 1), (1, 2))
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 2)
+        self.assertEqual(len(self.client.get(HOLD_URL).data["results"]), 2)
+
+    @staticmethod
+    def database_error(message, pgcode):
+        cause = Exception(message)
+        cause.pgcode = pgcode
+        error = OperationalError(message)
+        error.__cause__ = cause
+        return error
+
+    def lock_fails(self, error):
+        postgresql = mock.patch("train_station.reservations.connection", vendor="postgresql")
+        locked = mock.patch(
+            "train_station.reservations.Journey.objects.select_for_update", side_effect=error
+        )
+        return postgresql, locked
+
+    def test_journey_lock_timeout_conflicts(self):
+        postgresql, locked = self.lock_fails(
+            self.database_error("canceling statement due to lock timeout", "55P03")
+        )
+
+        with postgresql, locked:
+            self.assertEqual(self.hold((1, 1)).status_code, status.HTTP_409_CONFLICT)
+            self.assertEqual(self.order((1, 1)).status_code, status.HTTP_409_CONFLICT)
+
+        self.assertEqual(self.order((1, 1)).status_code, status.HTTP_201_CREATED)
+
+    def test_other_database_errors_are_not_conflicts(self):
+        postgresql, locked = self.lock_fails(
+            self.database_error("server closed the connection unexpectedly", "08006")
+        )
+
+        with postgresql, locked, self.assertRaises(OperationalError):
+            self.order((1, 1))
+
+    def test_seat_held_by_other_user_conflicts(self):
+        self.hold((1, 1))
+        self.client.force_authenticate(self.other_user)
+
+        self.assertEqual(self.hold((1, 1)).status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.order((1, 1)).status_code, status.HTTP_409_CONFLICT)
+
+    def test_order_consumes_own_holds(self):
+        self.hold((1, 1))
+
+        res = self.order((1, 1))
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(SeatHold.objects.exists())
+
+    def test_expired_hold_does_not_block_seat(self):
+        self.hold((1, 1))
+        SeatHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.client.force_authenticate(self.other_user)
+
+        self.assertEqual(self.hold((1, 1)).status_code, status.HTTP_201_CREATED)
+
+    def test_auto_assign_adjacent_seats(self):
+        self.hold((1, 2))
+
+        res = self.client.post(
+            HOLD_AUTO_ASSIGN_URL, {"journey": self.journey.id, "count": 3}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [(hold["cargo"], hold["seat"]) for hold in res.data],
+            [(2, 1), (2, 2), (2, 3)]
+        )
+
+    def test_auto_assign_without_free_seats(self):
+        self.hold((1, 2), (2, 3))
+
+        res = self.client.post(
+            HOLD_AUTO_ASSIGN_URL, {"journey": self.journey.id, "count": 3}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
@@ -0,0 +1,107 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from train_station.models import Order, Ticket
+from .api_urls import *
+from .api_samples import *
+
+PAGE_SIZES = (1, 5, 20)
+
+
+def detail_url(basename, pk):
+    return reverse(f"train_station:{basename}-detail", args=[pk])
+
+
+class QueryCountTests(TestCase):
+    """
+    Pin the number of queries of every list and retrieve endpoint,
+    so a serializer touching an unloaded relation fails loudly
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_superuser(
+            "admin@test.com",
+            "test_password"
+        )
+        self.client.force_authenticate(self.user)
+
+        self.journeys = []
+        for index in range(20):
+            journey = sample_journey(
+                route=sample_route(
+                    source=sample_station(name=f"source-{index}"),
+                    destination=sample_station(name=f"destination-{index}"),
+                ),
+                train=sample_train(
+                    name=f"train-{index}",
+                    train_type=sample_train_type(name=f"type-{index}"),
+                ),
+                departure_time=datetime.datetime(2023, 11, 1, 8) + datetime.timedelta(hours=index),
+                arrival_time=datetime.datetime(2023, 11, 1, 12) + datetime.timedelta(hours=index),
+            )
+            journey.crew.add(sample_crew(first_name=f"first-{index}"))
+            self.journeys.append(journey)
+
+        for index, journey in enumerate(self.journeys):
+            order = Order.objects.create(user=self.user)
+            for seat in range(1, 4):
+                Ticket.objects.create(order=order, journey=journey, cargo=1, seat=seat)
+                Ticket.objects.create(
+                    order=order, journey=self.journeys[-index - 1], cargo=2, seat=seat
+                )
+
+        self.order = order
+
+    def assertListQueries(self, url, expected, **params):
+        for page_size in PAGE_SIZES:
+            cache.clear()
+            with self.subTest(page_size=page_size, **params), self.assertNumQueries(expected):
+                res = self.client.get(url, {"page_size": page_size, **params})
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def assertRetrieveQueries(self, url, expected):
+        cache.clear()
+        with self.assertNumQueries(expected):
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_station_queries(self):
+        self.assertListQueries(STATION_URL, 2)
+        self.assertRetrieveQueries(detail_url("station", self.journeys[0].route.source_id), 1)
+
+    def test_route_queries(self):
+        self.assertListQueries(ROUTE_URL, 2)
+        self.assertRetrieveQueries(detail_url("route", self.journeys[0].route_id), 1)
+
+    def test_crew_queries(self):
+        self.assertListQueries(WORKER_URL, 2)
+        self.assertRetrieveQueries(detail_url("crew", self.journeys[0].crew.get().pk), 1)
+
+    def test_train_type_queries(self):
+        self.assertListQueries(TRAIN_TYPE_URL, 2)
+        self.assertRetrieveQueries(
+            detail_url("traintype", self.journeys[0].train.train_type_id), 1
+        )
+
+    def test_train_queries(self):
+        self.assertListQueries(TRAIN_URL, 2)
+        self.assertRetrieveQueries(detail_url("train", self.journeys[0].train_id), 1)
+
+    def test_journey_queries(self):
+        self.assertListQueries(JOURNEY_URL, 2)
+        self.assertListQueries(JOURNEY_URL, 1, pagination="cursor")
+        self.assertRetrieveQueries(detail_url("journey", self.journeys[0].pk), 3)
+
+    def test_order_queries(self):
+        self.assertListQueries(ORDER_URL, 4)
+        self.assertListQueries(ORDER_URL, 3, pagination="cursor")
+        self.assertRetrieveQueries(detail_url("order", self.order.pk), 2)
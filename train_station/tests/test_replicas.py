@@ -0,0 +1,81 @@
+import math
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, SimpleTestCase, override_settings
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from train_station import replicas
+from .api_urls import *
+from .api_samples import *
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = replicas.ReplicaRouter()
+
+    def test_reads_go_to_default_outside_replica_requests(self):
+        self.assertIsNone(self.router.db_for_read(Station))
+        self.assertEqual(self.router.db_for_write(Station), "default")
+
+    def test_migrations_only_run_on_default(self):
+        self.assertTrue(self.router.allow_migrate("default", "train_station"))
+        self.assertFalse(self.router.allow_migrate("replica_0", "train_station"))
+
+    @override_settings(REPLICA_DATABASES=["replica_0", "replica_1"], REPLICA_MAX_LAG_SECONDS=5)
+    def test_lagging_replicas_are_skipped(self):
+        lags = {"replica_0": 30.0, "replica_1": 0.5}
+        with mock.patch.object(replicas, "replica_lag", replicas.ReplicaLag()), \
+                mock.patch.object(replicas, "measure_lag", side_effect=lags.get):
+            self.assertEqual(replicas.choose_replica(), "replica_1")
+
+    @override_settings(REPLICA_DATABASES=["replica_0"], REPLICA_MAX_LAG_SECONDS=5)
+    def test_primary_is_used_when_all_replicas_lag(self):
+        with mock.patch.object(replicas, "replica_lag", replicas.ReplicaLag()), \
+                mock.patch.object(replicas, "measure_lag", return_value=math.inf):
+            self.assertIsNone(replicas.choose_replica())
+
+
+@override_settings(REPLICA_DATABASES=["default"])
+class ReplicaRoutingApiTests(TestCase):
+    """The primary stands in for the replica, the tests check which requests use it"""
+
+    def setUp(self):
+        self.journey = sample_journey()
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com",
+            "test_password"
+        )
+        self.client.force_authenticate(self.user)
+
+        patcher = mock.patch.object(replicas, "choose_replica", return_value="default")
+        self.choose_replica = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_use_replica(self):
+        res = self.client.get(JOURNEY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.choose_replica.assert_called_once()
+        self.assertIsNone(replicas._replica.get())
+
+    def test_user_is_pinned_after_order(self):
+        payload = {"tickets": [{"cargo": 1, "seat": 1, "journey": self.journey.id}]}
+        res = self.client.post(ORDER_URL, payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        self.client.get(JOURNEY_URL)
+
+        self.choose_replica.assert_not_called()
+
+    def test_catalog_change_pins_everyone(self):
+        sample_station(name="Lviv")
+
+        self.client.get(STATION_URL)
+
+        self.choose_replica.assert_not_called()
@@ -0,0 +1,104 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from train_station.distances import DistanceMatrix, coordinates_version, geodesic_km
+from .api_urls import *
+from .api_samples import *
+
+
+class StationLocationSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.central = sample_station(name="Lviv Central", latitude=49.8397, longitude=24.0297)
+        self.suburb = sample_station(name="Lviv Suburb", latitude=49.8010, longitude=24.0300)
+        self.kyiv = sample_station(name="Kyiv", latitude=50.4501, longitude=30.5234)
+
+    def test_station_geohash_is_set(self):
+        self.assertTrue(self.central.geohash.startswith("u8c"))
+
+    def test_stations_within_radius(self):
+        res = self.client.get(STATION_URL, {"near": "49.84,24.03", "radius": 10})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        names = [station["name"] for station in res.data["results"]]
+        self.assertEqual(names, ["Lviv Central", "Lviv Suburb"])
+        self.assertLess(res.data["results"][0]["distance"], 1)
+
+    def test_nearest_stations(self):
+        res = self.client.get(STATION_URL, {"near": "50.0,30.0", "nearest": 2})
+
+        names = [station["name"] for station in res.data["results"]]
+        self.assertEqual(names, ["Kyiv", "Lviv Central"])
+
+    def test_invalid_near(self):
+        res = self.client.get(STATION_URL, {"near": "north"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class DistanceMatrixTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.lviv = sample_station(name="Lviv", latitude=49.8397, longitude=24.0297)
+        self.kyiv = sample_station(name="Kyiv", latitude=50.4501, longitude=30.5234)
+        self.matrix = DistanceMatrix()
+        self.matrix.rebuild(coordinates_version())
+
+    def test_new_station_is_appended(self):
+        odesa = sample_station(name="Odesa", latitude=46.4825, longitude=30.7233)
+
+        with self.assertNumQueries(1):
+            distance = self.matrix.distance(odesa.id, self.lviv.id)
+
+        expected = geodesic_km(46.4825, 30.7233, 49.8397, 24.0297)
+        self.assertAlmostEqual(distance, float(expected), places=2)
+        self.assertAlmostEqual(self.matrix.distance(self.kyiv.id, odesa.id), 441.1, places=0)
+        self.assertEqual(self.matrix._version, coordinates_version())
+
+    def test_new_stations_fill_spare_capacity(self):
+        matrix = self.matrix._state[2]
+        odesa = sample_station(name="Odesa", latitude=46.4825, longitude=30.7233)
+
+        self.matrix.distance(odesa.id, self.lviv.id)
+
+        self.assertIs(self.matrix._state[2], matrix)
+
+    @mock.patch("train_station.distances.MIN_CAPACITY", 2)
+    def test_matrix_grows_when_full(self):
+        self.matrix.rebuild(coordinates_version())
+        stations = [
+            sample_station(name=f"Station {index}", latitude=48 + index / 10, longitude=25 + index / 10)
+            for index in range(5)
+        ]
+
+        for station in stations:
+            self.assertAlmostEqual(
+                self.matrix.distance(station.id, self.kyiv.id),
+                float(geodesic_km(station.latitude, station.longitude, 50.4501, 30.5234)),
+                places=2,
+            )
+
+        self.assertGreaterEqual(len(self.matrix._state[2]), 7)
+        self.assertAlmostEqual(
+            self.matrix.distance(stations[0].id, stations[4].id),
+            float(geodesic_km(48, 25, 48.4, 25.4)),
+            places=2,
+        )
+
+    def test_moved_station_is_computed_directly_until_rebuilt(self):
+        self.kyiv.latitude = 46.4825
+        self.kyiv.save()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertIsNone(self.matrix.distance(self.lviv.id, self.kyiv.id))
+        self.assertEqual(len(callbacks), 1)
+
+        self.matrix.rebuild(coordinates_version())
+        expected = geodesic_km(49.8397, 24.0297, 46.4825, 30.5234)
+        self.assertAlmostEqual(self.matrix.distance(self.lviv.id, self.kyiv.id), float(expected), places=2)
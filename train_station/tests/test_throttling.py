@@ -0,0 +1,110 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory
+
+from rest_framework.test import APIClient
+from rest_framework import status
+from rest_framework.throttling import SimpleRateThrottle
+
+from train_station.throttling import ScopedRateThrottle, UserRateThrottle
+from .api_urls import *
+from .api_samples import *
+
+RATES = {"anon": "3/minute", "user": "3/minute", "catalog": "5/minute", "booking": "2/minute"}
+
+
+class ScopedView:
+    throttle_scope = "catalog"
+
+
+def throttle_rates(rates=RATES):
+    return mock.patch.object(SimpleRateThrottle, "THROTTLE_RATES", rates)
+
+
+class SlidingWindowTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get("/")
+        self.request.user = AnonymousUser()
+
+    def allow(self, at):
+        with throttle_rates():
+            throttle = ScopedRateThrottle()
+            throttle.timer = lambda: at
+            allowed = throttle.allow_request(self.request, ScopedView())
+        return allowed, throttle
+
+    def test_previous_window_is_weighted(self):
+        self.assertTrue(all(self.allow(59)[0] for _ in range(5)))
+        self.assertFalse(self.allow(59)[0])
+
+        # Halfway through the next window half of the previous one still counts
+        allowed = [self.allow(90)[0] for _ in range(4)]
+        self.assertEqual(allowed, [True, True, False, False])
+
+        self.assertTrue(self.allow(120)[0])
+
+    def test_retry_after(self):
+        for _ in range(5):
+            self.allow(30)
+        allowed, throttle = self.allow(30)
+
+        self.assertFalse(allowed)
+        self.assertEqual(throttle.wait(), 42)
+        self.assertTrue(self.allow(30 + throttle.wait())[0])
+        self.assertFalse(self.allow(30 + throttle.wait())[0])
+
+    def test_counters_are_constant_per_client(self):
+        for at in range(0, 60, 10):
+            self.allow(at)
+
+        keys = [key for key in cache._cache if "throttle_catalog" in key]
+        self.assertEqual(len(keys), 1)
+        self.assertEqual(cache.get(f"throttle_catalog_{self.request.META['REMOTE_ADDR']}:0"), 5)
+
+    def test_unscoped_views_are_skipped(self):
+        with throttle_rates():
+            throttle = ScopedRateThrottle()
+            self.assertTrue(all(throttle.allow_request(self.request, object()) for _ in range(10)))
+
+            throttle = UserRateThrottle()
+            self.assertTrue(all(throttle.allow_request(self.request, ScopedView()) for _ in range(10)))
+
+
+class ThrottledApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com",
+            "test_password"
+        )
+        self.client.force_authenticate(self.user)
+        self.journey = sample_journey()
+
+        patcher = throttle_rates()
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def hold(self, seat):
+        payload = {"journey": self.journey.id, "seats": [{"cargo": 1, "seat": seat}]}
+        return self.client.post(HOLD_URL, payload, format="json")
+
+    def test_catalog_scope(self):
+        statuses = [self.client.get(STATION_URL).status_code for _ in range(6)]
+
+        self.assertEqual(statuses, [status.HTTP_200_OK] * 5 + [status.HTTP_429_TOO_MANY_REQUESTS])
+        self.assertEqual(self.client.get(JOURNEY_URL).status_code, status.HTTP_200_OK)
+
+    def test_booking_scope(self):
+        self.assertEqual(self.hold(1).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.hold(2).status_code, status.HTTP_201_CREATED)
+
+        res = self.hold(3)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreaterEqual(int(res["Retry-After"]), 1)
+        self.assertEqual(self.client.get(HOLD_URL).status_code, status.HTTP_200_OK)
@@ -0,0 +1,179 @@
+import datetime
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from train_station.connections import day_version_key
+from train_station.models import Journey
+from train_station.timetable import import_timetable
+from .api_samples import *
+
+IMPORT_URL = reverse("train_station:journey-import-timetable")
+
+CSV_TIMETABLE = """route,source,destination,train,crew,departure_time,arrival_time
+{route},,,{train},{crew_ids},2023-11-01T06:00,2023-11-01T11:00
+,Lviv,Kyiv,Intercity,John Smith,2023-11-02T06:00,2023-11-02T11:00
+,Lviv,Odesa,Intercity,,2023-11-02T06:00,2023-11-02T11:00
+{route},,,{train},,2023-11-03T06:00,2023-11-03T05:00
+{route},,,unknown,,2023-11-03T06:00,2023-11-03T11:00
+"""
+
+
+class TimetableSamplesMixin:
+    def setUp(self):
+        cache.clear()
+        self.route = sample_route(
+            source=sample_station(name="Lviv"),
+            destination=sample_station(name="Kyiv"),
+        )
+        self.train = sample_train(name="Intercity")
+        self.crew = [
+            sample_crew(first_name="John", last_name="Smith"),
+            sample_crew(first_name="Jane", last_name="Doe"),
+        ]
+
+    def csv_file(self):
+        timetable = CSV_TIMETABLE.format(
+            route=self.route.id,
+            train=self.train.id,
+            crew_ids=";".join(str(crew.id) for crew in self.crew),
+        )
+        return io.BytesIO(timetable.encode())
+
+
+class TimetableImportTests(TimetableSamplesMixin, TestCase):
+    def test_csv_rows_are_resolved_and_errors_reported(self):
+        result = import_timetable(self.csv_file(), "csv", batch_size=1)
+
+        self.assertEqual(result.created, 2)
+        self.assertEqual([line_number for line_number, _ in result.errors], [4, 5, 6])
+        self.assertIn("Unknown route", result.errors[0][1])
+        self.assertIn("arrival_time", result.errors[1][1])
+        self.assertIn("Unknown train", result.errors[2][1])
+
+        first, second = Journey.objects.order_by("departure_time")
+        self.assertEqual(first.route, self.route)
+        self.assertEqual(first.train, self.train)
+        self.assertEqual(set(first.crew.all()), set(self.crew))
+        self.assertEqual(list(second.crew.all()), [self.crew[0]])
+
+    def test_jsonl_rows(self):
+        lines = [
+            json.dumps({
+                "route": self.route.id,
+                "train": "Intercity",
+                "crew": [self.crew[1].id],
+                "departure_time": "2023-11-01T06:00:00",
+                "arrival_time": "2023-11-01T11:00:00",
+            }),
+            "",
+            "not json",
+        ]
+
+        result = import_timetable(io.BytesIO("\n".join(lines).encode()), "jsonl")
+
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors, [(3, "Unreadable row.")])
+        self.assertEqual(list(Journey.objects.get().crew.all()), [self.crew[1]])
+
+    def test_dry_run_creates_nothing(self):
+        result = import_timetable(self.csv_file(), "csv", dry_run=True)
+
+        self.assertEqual(result.created, 2)
+        self.assertFalse(Journey.objects.exists())
+
+    def test_import_invalidates_timetable_days(self):
+        days = [datetime.date(2023, 11, day) for day in (1, 2, 3)]
+        for day in days:
+            cache.set(day_version_key(day), 1)
+
+        import_timetable(self.csv_file(), "csv")
+
+        self.assertEqual([cache.get(day_version_key(day)) for day in days], [2, 2, 1])
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as file:
+            file.write(self.csv_file().getvalue())
+        self.addCleanup(os.remove, file.name)
+        stdout, stderr = io.StringIO(), io.StringIO()
+
+        call_command("import_timetable", file.name, stdout=stdout, stderr=stderr)
+
+        self.assertIn("Imported 2 journey(s), 3 row(s) with errors", stdout.getvalue())
+        self.assertIn("Line 6: Unknown train: 'unknown'.", stderr.getvalue())
+        self.assertEqual(Journey.objects.count(), 2)
+
+    def test_command_missing_file(self):
+        with self.assertRaises(CommandError):
+            call_command("import_timetable", "/nonexistent/timetable.csv")
+
+
+class TimetableImportApiTests(TimetableSamplesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "admin@admin.com",
+            "admin_password",
+            is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+
+    def upload(self, content, name="timetable.csv"):
+        return self.client.post(
+            IMPORT_URL,
+            {"file": SimpleUploadedFile(name, content)},
+            format="multipart",
+        )
+
+    def test_import_endpoint(self):
+        res = self.upload(self.csv_file().getvalue())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["created"], 2)
+        self.assertEqual(res.data["error_count"], 3)
+        self.assertEqual(res.data["errors"][0]["line"], 4)
+        self.assertEqual(Journey.objects.count(), 2)
+
+    @override_settings(TIMETABLE_IMPORT_MAX_ROWS=4)
+    def test_import_endpoint_rejects_too_many_rows(self):
+        res = self.upload(self.csv_file().getvalue())
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("import_timetable", res.data["file"][0])
+        self.assertFalse(Journey.objects.exists())
+
+    @override_settings(TIMETABLE_IMPORT_MAX_ROWS=5)
+    def test_import_endpoint_accepts_rows_up_to_limit(self):
+        res = self.upload(self.csv_file().getvalue())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["created"], 2)
+
+    def test_import_endpoint_rejects_undecodable_file(self):
+        res = self.upload(b"route\n\xff\xfe\n")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("file", res.data)
+
+    def test_import_endpoint_is_admin_only(self):
+        self.client.force_authenticate(
+            get_user_model().objects.create_user("test@test.com", "test_password")
+        )
+
+        res = self.upload(self.csv_file().getvalue())
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Journey.objects.exists())
@@ -0,0 +1,253 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from train_station.images import ThumbnailQueue, thumbnail_path
+from .api_urls import *
+from .api_samples import *
+
+MEDIA_ROOT = tempfile.mkdtemp()
+PARTIAL_DIR = tempfile.mkdtemp()
+
+
+def train_detail_url(train_id):
+    return reverse("train_station:train-detail", args=[train_id])
+
+
+def image_upload_url(train_id):
+    return reverse("train_station:train-upload-image", args=[train_id])
+
+
+def image_bytes(color="red", size=(800, 600)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def image_file(color="red", size=(800, 600), name="train.png"):
+    buffer = io.BytesIO(image_bytes(color, size))
+    buffer.name = name
+    return buffer
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, TRAIN_IMAGE_PARTIAL_DIR=PARTIAL_DIR, THUMBNAIL_WORKERS=0)
+class TrainImageTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(PARTIAL_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(PARTIAL_DIR, ignore_errors=True)
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_superuser(
+            "admin@test.com",
+            "test_password"
+        )
+        self.client.force_authenticate(self.user)
+        self.train_type = sample_train_type()
+
+    def upload_image(self, image, train=None):
+        train = train or sample_train(train_type=self.train_type)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(image_upload_url(train.id), {"image": image}, format="multipart")
+
+    def upload_chunk(self, train, data, content_range, **headers):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.put(
+                image_upload_url(train.id),
+                data,
+                content_type="application/octet-stream",
+                HTTP_CONTENT_RANGE=content_range,
+                **headers,
+            )
+
+    def test_upload_builds_thumbnails(self):
+        res = self.upload_image(image_file())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        detail = self.client.get(train_detail_url(res.data["id"])).data
+        self.assertEqual(set(detail["thumbnails"]), {"small", "medium"})
+        self.assertTrue(detail["thumbnails"]["small"]["webp"].endswith("small.webp"))
+
+        train = Train.objects.get(pk=res.data["id"])
+        with default_storage.open(thumbnail_path(train.image_hash, "medium", "jpeg")) as file:
+            self.assertEqual(Image.open(file).size, (480, 360))
+
+    def test_thumbnails_are_listed(self):
+        self.upload_image(image_file())
+
+        res = self.client.get(TRAIN_URL)
+
+        self.assertIn("medium", res.data["results"][0]["thumbnails"])
+        self.assertNotIn("image", res.data["results"][0])
+
+    def test_identical_images_share_thumbnails(self):
+        first = self.upload_image(image_file(), train=sample_train(name="first"))
+        second = self.upload_image(image_file(), train=sample_train(name="second"))
+
+        first, second = Train.objects.filter(pk__in=[first.data["id"], second.data["id"]])
+        self.assertEqual(first.image_hash, second.image_hash)
+        self.assertNotEqual(first.image.name, second.image.name)
+
+    def test_thumbnails_pending_until_commit(self):
+        train = sample_train()
+
+        res = self.client.post(
+            image_upload_url(train.id), {"image": image_file(color="blue")}, format="multipart"
+        )
+
+        self.assertIsNone(res.data["thumbnails"])
+
+    def test_invalid_image_is_rejected(self):
+        file = io.BytesIO(b"not an image")
+        file.name = "train.png"
+
+        res = self.upload_image(file)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("image", res.data)
+
+    def test_train_write_ignores_image(self):
+        payload = {
+            "name": "Intercity",
+            "cargo_num": 5,
+            "places_in_cargo": 40,
+            "train_type": self.train_type.id,
+            "image": image_file(),
+        }
+
+        res = self.client.post(TRAIN_URL, payload, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertIsNone(res.data["image"])
+
+    @override_settings(TRAIN_IMAGE_MAX_SIZE=1024)
+    def test_upload_over_size_limit_is_rejected(self):
+        res = self.upload_image(image_file(size=(2000, 2000)))
+
+        self.assertEqual(res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    @override_settings(TRAIN_IMAGE_MAX_DIMENSION=500)
+    def test_upload_over_dimension_limit_is_rejected(self):
+        res = self.upload_image(image_file(size=(800, 600)))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("image", res.data)
+
+    @override_settings(THUMBNAIL_WORKERS=1, THUMBNAIL_QUEUE_SIZE=0)
+    def test_upload_refused_while_thumbnail_queue_is_full(self):
+        queue = ThumbnailQueue(workers=1, queue_size=0)
+        encoding = threading.Event()
+        queue.submit(encoding.wait)
+        train = sample_train(train_type=self.train_type)
+
+        try:
+            with mock.patch("train_station.images.get_queue", return_value=queue):
+                res = self.upload_image(image_file(), train)
+        finally:
+            encoding.set()
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res["Retry-After"], "5")
+        train.refresh_from_db()
+        self.assertFalse(train.image)
+
+    def test_finished_thumbnails_make_room_in_the_queue(self):
+        queue = ThumbnailQueue(workers=1, queue_size=0)
+        queue.submit(time.sleep, 0)
+
+        queue._executor.shutdown(wait=True)
+
+        queue.check()
+
+    def test_resumable_upload(self):
+        train = sample_train()
+        data = image_bytes()
+        total = len(data)
+        middle = total // 2
+
+        res = self.upload_chunk(train, data[:middle], f"bytes 0-{middle - 1}/{total}")
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res["Range"], f"bytes=0-{middle - 1}")
+
+        res = self.upload_chunk(train, b"", f"bytes */{total}")
+        self.assertEqual(res.data["offset"], middle)
+
+        res = self.upload_chunk(
+            train,
+            data[middle:],
+            f"bytes {middle}-{total - 1}/{total}",
+            HTTP_CONTENT_DISPOSITION='attachment; filename="train.png"',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        train.refresh_from_db()
+        self.assertTrue(train.image.name.endswith(".png"))
+        self.assertTrue(train.thumbnails_ready)
+
+    def test_resumable_upload_rejects_gaps(self):
+        train = sample_train()
+        data = image_bytes()
+        total = len(data)
+        self.upload_chunk(train, data[:100], f"bytes 0-99/{total}")
+
+        res = self.upload_chunk(train, data[200:300], f"bytes 200-299/{total}")
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+
+    def expire_partial_uploads(self):
+        expired = time.time() - 25 * 60 * 60
+        for name in os.listdir(PARTIAL_DIR):
+            os.utime(os.path.join(PARTIAL_DIR, name), (expired, expired))
+
+    def test_partial_upload_is_not_public(self):
+        train = sample_train()
+        data = image_bytes()
+        self.upload_chunk(train, data[:100], f"bytes 0-99/{len(data)}")
+
+        self.assertEqual(len(os.listdir(PARTIAL_DIR)), 1)
+        for _, _, files in os.walk(MEDIA_ROOT):
+            self.assertFalse(any(name.endswith(".part") for name in files))
+
+    def test_expired_partial_upload_restarts(self):
+        train = sample_train()
+        data = image_bytes()
+        total = len(data)
+        self.upload_chunk(train, data[:100], f"bytes 0-99/{total}")
+        self.expire_partial_uploads()
+
+        res = self.upload_chunk(train, data[100:200], f"bytes 100-199/{total}")
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.upload_chunk(train, b"", f"bytes */{total}").data["offset"], 0)
+
+    def test_purge_partial_uploads_command(self):
+        data = image_bytes()
+        expired, current = sample_train(), sample_train()
+        self.upload_chunk(expired, data[:100], f"bytes 0-99/{len(data)}")
+        self.expire_partial_uploads()
+        self.upload_chunk(current, data[:100], f"bytes 0-99/{len(data)}")
+        out = io.StringIO()
+
+        call_command("purge_partial_uploads", stdout=out)
+
+        self.assertIn("Purged 1", out.getvalue())
+        self.assertEqual(os.listdir(PARTIAL_DIR), [f"train-{current.id}-user-{self.user.id}.part"])
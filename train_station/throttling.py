@@ -0,0 +1,116 @@
+"""
+Sliding window throttles over a shared cache.
+
+DRF's throttles keep a list of request timestamps per client and rewrite
+it on every request, in whatever cache the process has. These count the
+requests of the current and the previous fixed window with atomic cache
+increments and weight the previous count by how much of it still
+overlaps the sliding window, so a check costs three cache operations
+whatever the rate. With a cache shared by the workers (Redis, Memcached)
+the limits hold across processes.
+
+Views pick a scope with `throttle_scope`, or per action with
+`throttle_scopes`; a scoped request is limited by the scope's rate
+instead of the anon and user rates.
+"""
+import math
+
+from django.core.cache import cache
+from rest_framework import throttling
+
+
+def get_scope(view):
+    """Return the throttle scope of the view and its current action, or None"""
+    scopes = getattr(view, "throttle_scopes", None)
+    if scopes:
+        scope = scopes.get(getattr(view, "action", None))
+        if scope:
+            return scope
+    return getattr(view, "throttle_scope", None)
+
+
+class SlidingWindowRateThrottle(throttling.SimpleRateThrottle):
+    cache = cache
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        self.elapsed = self.now - window * self.duration
+        current_key = f"{self.key}:{window}"
+
+        self.current = self.increment(current_key)
+        self.previous = self.cache.get(f"{self.key}:{window - 1}", 0)
+        if self.estimate(self.current) > self.num_requests:
+            # Denied requests do not count against the client
+            self.cache.decr(current_key)
+            self.current -= 1
+            return self.throttle_failure()
+
+        return self.throttle_success()
+
+    def increment(self, key):
+        # Keep the window for the next one to weight it
+        timeout = 2 * self.duration + 1
+        for _ in range(2):
+            self.cache.add(key, 0, timeout)
+            try:
+                return self.cache.incr(key)
+            except ValueError:
+                # Expired between add and incr
+                continue
+        return 1
+
+    def estimate(self, current):
+        overlap = 1 - self.elapsed / self.duration
+        return self.previous * overlap + current
+
+    def throttle_success(self):
+        return True
+
+    def wait(self):
+        """Seconds until one more request fits in the window"""
+        allowed = self.num_requests - 1
+        if self.previous and self.current <= allowed:
+            # The previous window slides out far enough in this one
+            overlap = (allowed - self.current) / self.previous
+            wait = self.duration * (1 - overlap) - self.elapsed
+        else:
+            # The current window has to slide out in the next one
+            wait = self.duration - self.elapsed
+            if self.current:
+                wait += self.duration * max(0.0, 1 - allowed / self.current)
+        return max(1, math.ceil(wait))
+
+
+class AnonRateThrottle(throttling.AnonRateThrottle, SlidingWindowRateThrottle):
+    def get_cache_key(self, request, view):
+        if get_scope(view):
+            return None
+        return super().get_cache_key(request, view)
+
+
+class UserRateThrottle(throttling.UserRateThrottle, SlidingWindowRateThrottle):
+    def get_cache_key(self, request, view):
+        if get_scope(view):
+            return None
+        return super().get_cache_key(request, view)
+
+
+class ScopedRateThrottle(throttling.ScopedRateThrottle, SlidingWindowRateThrottle):
+    """Limit each user, or address without a user, per view scope"""
+
+    def allow_request(self, request, view):
+        self.scope = get_scope(view)
+        if not self.scope:
+            return True
+
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return SlidingWindowRateThrottle.allow_request(self, request, view)
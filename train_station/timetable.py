@@ -0,0 +1,269 @@
+"""
+Bulk timetable import.
+
+Rows come from a CSV file with a header or from JSON lines, and each row
+describes one journey:
+
+    route            route id, or source and destination station names
+    source           (instead of route) name of the departure station
+    destination      (instead of route) name of the arrival station
+    train            train id or name
+    crew             crew ids or "first last" names, ";"-separated in CSV
+    departure_time   ISO 8601 date and time
+    arrival_time     ISO 8601 date and time
+
+Routes, trains and crew are loaded once into lookup maps, valid rows are
+inserted in batches with bulk_create together with their crew links, and
+invalid rows are reported by line without stopping the import.
+
+Uploads to the import endpoint are answered within the request, so they
+may hold at most TIMETABLE_IMPORT_MAX_ROWS rows. They are counted before
+anything is inserted, and larger timetables are loaded with
+"manage.py import_timetable", which has no limit.
+"""
+import csv
+import io
+import json
+import os
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from train_station.connections import invalidate_timetable_days
+from train_station.models import Route, Train, Crew, Journey
+
+FORMATS = ("csv", "jsonl")
+
+BATCH_SIZE = 1000
+
+# Row errors returned by the import endpoint, the command prints them all
+MAX_REPORTED_ERRORS = 100
+
+# Marks a name shared by several objects, which can then only be given by id
+AMBIGUOUS = object()
+
+
+def timetable_format(filename, default="csv"):
+    """Guess the timetable format from the file extension"""
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if extension == ".csv":
+        return "csv"
+    return default
+
+
+class TimetableError(ValueError):
+    """The file can not be read as a timetable, rows imported before stay"""
+
+
+def read_rows(file, format="csv"):
+    """Yield (line number, row) from a binary file, row is None for unreadable lines"""
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        yield from parse_lines(text, format)
+    except (UnicodeDecodeError, csv.Error) as error:
+        raise TimetableError(f"The file is not a UTF-8 {format} timetable: {error}")
+    finally:
+        # Leave the underlying file open for its owner
+        text.detach()
+
+
+def parse_lines(text, format):
+    if format == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def bulk_create_journeys(batch):
+    """Insert (unsaved journey, crew ids) pairs and the crew links, return the journeys"""
+    journeys = Journey.objects.bulk_create([journey for journey, _ in batch])
+    Journey.crew.through.objects.bulk_create([
+        Journey.crew.through(journey_id=journey.id, crew_id=crew_id)
+        for journey, (_, crew_ids) in zip(journeys, batch)
+        for crew_id in crew_ids
+    ])
+    return journeys
+
+
+def lookup_map(pairs):
+    lookup = {}
+    for key, pk in pairs:
+        lookup[key] = AMBIGUOUS if key in lookup else pk
+    return lookup
+
+
+class RowError(ValueError):
+    pass
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    errors: list = field(default_factory=list)
+    days: set = field(default_factory=set)
+
+
+class TimetableImporter:
+    """Resolve timetable rows into journeys and insert them in batches"""
+
+    def __init__(self, batch_size=BATCH_SIZE, dry_run=False):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.result = ImportResult()
+        self.batch = []
+
+        self.route_ids = set(Route.objects.values_list("id", flat=True))
+        self.routes_by_stations = lookup_map(
+            ((source, destination), pk)
+            for pk, source, destination in Route.objects.values_list(
+                "id", "source__name", "destination__name"
+            )
+        )
+        self.train_ids = set(Train.objects.values_list("id", flat=True))
+        self.trains_by_name = lookup_map(Train.objects.values_list("name", "id"))
+        self.crew_ids = set(Crew.objects.values_list("id", flat=True))
+        self.crew_by_name = lookup_map(
+            (f"{first_name} {last_name}", pk)
+            for pk, first_name, last_name in Crew.objects.values_list(
+                "id", "first_name", "last_name"
+            )
+        )
+
+    def import_rows(self, rows):
+        """Import (line number, row) pairs and return the ImportResult"""
+        try:
+            for line_number, row in rows:
+                try:
+                    self.batch.append(self.parse_row(row))
+                except RowError as error:
+                    self.result.errors.append((line_number, str(error)))
+                    continue
+
+                if len(self.batch) >= self.batch_size:
+                    self.flush()
+
+            self.flush()
+        finally:
+            # bulk_create sends no signals, drop the cached days here
+            if self.result.days:
+                invalidate_timetable_days(self.result.days)
+
+        return self.result
+
+    def flush(self):
+        batch, self.batch = self.batch, []
+        if not batch or self.dry_run:
+            self.result.created += len(batch)
+            return
+
+        with transaction.atomic():
+            journeys = bulk_create_journeys(batch)
+
+        self.result.created += len(journeys)
+        self.result.days.update(journey.departure_time.date() for journey in journeys)
+
+    def parse_row(self, row):
+        if row is None:
+            raise RowError("Unreadable row.")
+
+        departure_time = self.parse_time(row, "departure_time")
+        arrival_time = self.parse_time(row, "arrival_time")
+        if arrival_time <= departure_time:
+            raise RowError("arrival_time must be after departure_time.")
+
+        journey = Journey(
+            route_id=self.resolve_route(row),
+            train_id=self.resolve(row.get("train"), self.train_ids, self.trains_by_name, "train"),
+            departure_time=departure_time,
+            arrival_time=arrival_time,
+        )
+        crew_ids = {
+            self.resolve(crew, self.crew_ids, self.crew_by_name, "crew")
+            for crew in self.split(row.get("crew"))
+        }
+        return journey, crew_ids
+
+    def resolve_route(self, row):
+        if row.get("route") not in (None, ""):
+            return self.resolve(row["route"], self.route_ids, {}, "route")
+
+        key = (str(row.get("source") or "").strip(), str(row.get("destination") or "").strip())
+        pk = self.routes_by_stations.get(key)
+        if pk is None:
+            raise RowError(f"Unknown route: {key[0]!r} - {key[1]!r}.")
+        if pk is AMBIGUOUS:
+            raise RowError(f"Several routes go {key[0]!r} - {key[1]!r}, give the route id.")
+        return pk
+
+    @staticmethod
+    def resolve(value, ids, by_name, name):
+        """Return the id of the object given by its id or name"""
+        value = str(value if value is not None else "").strip()
+        if not value:
+            raise RowError(f"{name} is required.")
+
+        if value.isdigit() and int(value) in ids:
+            return int(value)
+
+        pk = by_name.get(value)
+        if pk is None:
+            raise RowError(f"Unknown {name}: {value!r}.")
+        if pk is AMBIGUOUS:
+            raise RowError(f"Several objects are called {value!r}, give the {name} id.")
+        return pk
+
+    @staticmethod
+    def split(value):
+        if value in (None, ""):
+            return []
+        if isinstance(value, list):
+            return value
+        return [item for item in str(value).split(";") if item.strip()]
+
+    @staticmethod
+    def parse_time(row, name):
+        value = row.get(name)
+        try:
+            time = parse_datetime(str(value).strip()) if value else None
+        except ValueError:
+            time = None
+        if time is None:
+            raise RowError(f"{name} must be an ISO 8601 date and time.")
+
+        if settings.USE_TZ and timezone.is_naive(time):
+            time = timezone.make_aware(time)
+        return time
+
+
+def check_row_count(file, format, max_rows):
+    """Raise TimetableError if a seekable file has more than max_rows rows"""
+    count = 0
+    for count, _ in enumerate(read_rows(file, format), start=1):
+        if count > max_rows:
+            raise TimetableError(
+                f"The file has more than {max_rows} rows, "
+                "import it with \"python manage.py import_timetable\"."
+            )
+    file.seek(0)
+
+
+def import_timetable(file, format="csv", batch_size=BATCH_SIZE, dry_run=False, max_rows=None):
+    """Import the journeys of a CSV or JSON lines timetable file"""
+    if max_rows is not None:
+        check_row_count(file, format, max_rows)
+    return TimetableImporter(batch_size, dry_run).import_rows(read_rows(file, format))
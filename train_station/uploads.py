@@ -0,0 +1,194 @@
+"""
+Streaming train image uploads.
+
+TrainImageUploadHandler writes a multipart upload to a temporary file
+chunk by chunk and stops it as soon as it goes over the size limit or
+its header shows dimensions over the limit, before the rest is read.
+PartialUpload appends resumable chunks sent with a Content-Range header
+to a file in TRAIN_IMAGE_PARTIAL_DIR, so an interrupted upload continues
+from the last stored byte. The directory is kept out of MEDIA_ROOT, which
+is served publicly. An upload not continued within
+TRAIN_IMAGE_PARTIAL_UPLOAD_HOURS is dropped when it is next accessed or
+by "manage.py purge_partial_uploads".
+"""
+import os
+import re
+import time
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from train_station.images import ImageTooLarge, check_dimensions, header_dimensions
+
+# Bytes of an upload searched for the image dimensions before giving up
+HEADER_LIMIT = 256 * 1024
+
+# Room for the multipart boundaries and part headers around the image
+MULTIPART_OVERHEAD = 16 * 1024
+
+READ_CHUNK_SIZE = 64 * 1024
+
+CONTENT_RANGE = re.compile(r"^bytes (?:(?P<start>\d+)-(?P<end>\d+)|\*)/(?P<total>\d+)$")
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "The image is larger than the upload limit."
+    default_code = "upload_too_large"
+
+
+class UploadOffsetMismatch(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The chunk does not start where the stored upload ends."
+    default_code = "upload_offset_mismatch"
+
+
+def check_upload_size(size):
+    if size > settings.TRAIN_IMAGE_MAX_SIZE:
+        raise UploadTooLarge()
+
+
+class HeaderCheck:
+    """Checks the dimensions as soon as the start of the image holds them"""
+
+    def __init__(self):
+        self.header = b""
+        self.done = False
+
+    def feed(self, data):
+        if self.done:
+            return
+
+        self.header += data
+        size = header_dimensions(self.header)
+        if size is not None:
+            self.done = True
+            try:
+                check_dimensions(size)
+            except ImageTooLarge as error:
+                raise ValidationError({"image": [str(error)]})
+        elif len(self.header) >= HEADER_LIMIT:
+            # Not an image Pillow knows, full validation will reject it
+            self.done = True
+
+
+class TrainImageUploadHandler(TemporaryFileUploadHandler):
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        check_upload_size(content_length - MULTIPART_OVERHEAD)
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.header_check = HeaderCheck()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        check_upload_size(self.received)
+        self.header_check.feed(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+
+def parse_content_range(value):
+    """Return (start, end, total) of a Content-Range header, start and end are None for bytes */total"""
+    match = CONTENT_RANGE.match(value or "")
+    if match is None:
+        raise ValidationError({"Content-Range": ["Expected bytes start-end/total or bytes */total."]})
+
+    total = int(match["total"])
+    if total == 0:
+        raise ValidationError({"Content-Range": ["The image can't be empty."]})
+    if match["start"] is None:
+        return None, None, total
+
+    start, end = int(match["start"]), int(match["end"])
+    if start > end or end >= total:
+        raise ValidationError({"Content-Range": ["The range does not fit in the total size."]})
+    return start, end, total
+
+
+def partial_upload_expired(path):
+    """Whether a partial upload was last written more than TRAIN_IMAGE_PARTIAL_UPLOAD_HOURS ago"""
+    age = time.time() - os.path.getmtime(path)
+    return age > settings.TRAIN_IMAGE_PARTIAL_UPLOAD_HOURS * 60 * 60
+
+
+def purge_expired_partial_uploads():
+    """Delete the expired partial uploads and return how many there were"""
+    try:
+        names = os.listdir(settings.TRAIN_IMAGE_PARTIAL_DIR)
+    except FileNotFoundError:
+        return 0
+
+    purged = 0
+    for name in names:
+        path = os.path.join(settings.TRAIN_IMAGE_PARTIAL_DIR, name)
+        try:
+            if name.endswith(".part") and partial_upload_expired(path):
+                os.remove(path)
+                purged += 1
+        except FileNotFoundError:
+            # Completed or purged by a request meanwhile
+            continue
+    return purged
+
+
+class PartialUpload:
+    """A resumable upload of one user's image for one train"""
+
+    def __init__(self, train_id, user_id):
+        self.path = os.path.join(
+            settings.TRAIN_IMAGE_PARTIAL_DIR, f"train-{train_id}-user-{user_id}.part"
+        )
+
+    @property
+    def offset(self):
+        try:
+            if partial_upload_expired(self.path):
+                self.delete()
+                return 0
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def append(self, stream, start, end):
+        """Append the body of the request, a chunk at start restarts the upload"""
+        if start != 0 and start != self.offset:
+            raise UploadOffsetMismatch()
+
+        length = end - start + 1
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "r+b" if start else "wb") as file:
+            file.seek(start)
+            file.truncate()
+            header_check = HeaderCheck() if start == 0 else None
+            remaining = length
+            while remaining:
+                data = stream.read(min(READ_CHUNK_SIZE, remaining)) if stream else b""
+                if not data:
+                    break
+                if header_check is not None:
+                    try:
+                        header_check.feed(data)
+                    except ValidationError:
+                        file.truncate(0)
+                        raise
+                file.write(data)
+                remaining -= len(data)
+
+        if remaining:
+            # Keep only the complete prefix, the client resends the rest
+            with open(self.path, "r+b") as file:
+                file.truncate(start)
+            raise ValidationError({"Content-Range": ["The body is shorter than the range."]})
+
+    def open(self, name):
+        return File(open(self.path, "rb"), name=name)
+
+    def delete(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
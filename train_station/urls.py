@@ -1,9 +1,11 @@
 from django.urls import path, include
 from rest_framework import routers
 
+from train_station import async_views
 from train_station.views import (
     StationViewSet,
-    RouteViewSet, CrewViewSet, TrainTypeViewSet, TrainViewSet, JourneyViewSet, OrderViewSet
+    RouteViewSet, CrewViewSet, TrainTypeViewSet, TrainViewSet, JourneyViewSet, OrderViewSet,
+    SeatHoldViewSet, JourneyTemplateViewSet, ExportViewSet
 )
 
 router = routers.DefaultRouter()
@@ -13,8 +15,16 @@ router.register("workers", CrewViewSet)
 router.register("train_types", TrainTypeViewSet)
 router.register("trains", TrainViewSet)
 router.register("journeys", JourneyViewSet)
+router.register("journey_templates", JourneyTemplateViewSet)
 router.register("orders", OrderViewSet)
+router.register("holds", SeatHoldViewSet)
+router.register("exports", ExportViewSet, basename="export")
 
-urlpatterns = [path("", include(router.urls))]
+urlpatterns = [
+    path("async/stations/", async_views.station_list, name="async-station-list"),
+    path("async/journeys/", async_views.journey_list, name="async-journey-list"),
+    path("async/journeys/<int:pk>/", async_views.journey_detail, name="async-journey-detail"),
+    path("", include(router.urls)),
+]
 
 app_name = "train_station"
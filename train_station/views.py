@@ -1,16 +1,41 @@
-from datetime import datetime
-
-import geopy.distance
-from django.db.models import F, Count
+import os
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils.http import parse_header_parameters
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter
-from rest_framework.pagination import PageNumberPagination
+from rest_framework import mixins, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from rest_framework.viewsets import ModelViewSet
-
-from train_station.models import Station, Route, Crew, TrainType, Train, Journey, Order
+from rest_framework.response import Response
+from rest_framework.viewsets import ModelViewSet, GenericViewSet
+
+from train_station.cache import CachedListMixin
+from train_station.connections import find_connections
+from train_station.distances import station_distance
+from train_station.exports import OUTPUTS, export_response
+from train_station.filters import NEAR_DEFAULT_RADIUS_KM, day_range, filter_stations, filter_journeys
+from train_station.instrumentation import TimedSerializerMixin, serialized
+from train_station.models import (
+    Station, Route, Crew, TrainType, Train, Journey, JourneyTemplate, Order, SeatHold
+)
+from train_station.pagination import DefaultPagination, JourneyPagination, OrderPagination
 from train_station.permissions import IsAdminOrIfAuthenticatedReadOnly, IsAnonymous
+from train_station.replicas import ReplicaReadMixin
+from train_station.reservations import active_holds, hold_seats, hold_adjacent_seats
+from train_station.schedules import (
+    materialize_day, materialize_searched_day, reconcile_template, unsold_journeys
+)
+from train_station.seat_map import journey_seat_map, encode_base64, encode_runs
 from train_station.serializers import (
     StationSerializer,
+    StationNearSerializer,
     RouteSerializer,
     RouteListSerializer,
     RouteDetailSerializer,
@@ -19,25 +44,31 @@ from train_station.serializers import (
     TrainSerializer,
     TrainListSerializer,
     TrainDetailSerializer,
+    TrainImageSerializer,
     JourneySerializer,
     JourneyListSerializer,
     JourneyDetailSerializer,
+    JourneyTemplateSerializer,
     OrderSerializer,
-    OrderListSerializer
+    OrderListSerializer,
+    SeatHoldSerializer,
+    SeatHoldCreateSerializer,
+    SeatAutoAssignSerializer,
+    ConnectionSearchSerializer,
+    TimetableImportSerializer,
+)
+from train_station.timetable import MAX_REPORTED_ERRORS, TimetableError, import_timetable
+from train_station.uploads import (
+    TrainImageUploadHandler, PartialUpload, check_upload_size, parse_content_range
 )
 
 
-class DefaultPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = "page_size"
-    max_page_size = 100
-
-
-class StationViewSet(ModelViewSet):
+class StationViewSet(TimedSerializerMixin, ReplicaReadMixin, CachedListMixin, ModelViewSet):
     queryset = Station.objects.all()
     serializer_class = StationSerializer
     pagination_class = DefaultPagination
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    throttle_scope = "catalog"
 
     def get_permissions(self):
         if self.request.user.is_anonymous:
@@ -52,15 +83,14 @@ class StationViewSet(ModelViewSet):
         return super(StationViewSet, self).get_permissions()
 
     def get_queryset(self):
-        """Retrieve the stations by their name"""
-        name = self.request.query_params.get("name")
+        """Retrieve the stations by their name or location"""
+        return filter_stations(self.queryset, self.request.query_params, self.action == "list")
 
-        queryset = self.queryset
-
-        if name:
-            queryset = queryset.filter(name__icontains=name)
+    def get_serializer_class(self):
+        if self.action == "list" and self.request.query_params.get("near"):
+            return StationNearSerializer
 
-        return queryset.distinct()
+        return self.serializer_class
 
     @extend_schema(
         parameters=[
@@ -69,25 +99,38 @@ class StationViewSet(ModelViewSet):
                 type=str,
                 description="Filter by station name (ex. ?name=Lvivskyi Prymis'kyi Vokzal)",
                 required=False,
-            )
+            ),
+            OpenApiParameter(
+                "near",
+                type=str,
+                description="Stations around a point, nearest first (ex. ?near=49.84,24.03)",
+                required=False,
+            ),
+            OpenApiParameter(
+                "radius",
+                type=float,
+                description=f"Search radius in km around ?near, {NEAR_DEFAULT_RADIUS_KM} by default "
+                            f"(ex. ?radius=25)",
+                required=False,
+            ),
+            OpenApiParameter(
+                "nearest",
+                type=int,
+                description="Return the k stations nearest to ?near (ex. ?nearest=5)",
+                required=False,
+            ),
         ]
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
 
-def haversine_distance(source: Station, destination: Station):
-    coords_1 = (source.latitude, source.longitude)
-    coords_2 = (destination.latitude, destination.longitude)
-
-    return round(geopy.distance.geodesic(coords_1, coords_2).km, 1)
-
-
-class RouteViewSet(ModelViewSet):
+class RouteViewSet(TimedSerializerMixin, ReplicaReadMixin, CachedListMixin, ModelViewSet):
     queryset = Route.objects.select_related("source", "destination")
     serializer_class = RouteSerializer
     pagination_class = DefaultPagination
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    throttle_scope = "catalog"
 
     def get_permissions(self):
         if self.request.user.is_anonymous:
@@ -117,9 +160,10 @@ class RouteViewSet(ModelViewSet):
         return queryset.distinct()
 
     def perform_create(self, serializer):
-        source = Station.objects.get(id=self.request.data["source"])
-        destination = Station.objects.get(id=self.request.data["destination"])
-        distance = haversine_distance(source, destination)
+        distance = station_distance(
+            serializer.validated_data["source"],
+            serializer.validated_data["destination"],
+        )
         serializer.save(distance=distance)
 
     def get_serializer_class(self):
@@ -151,21 +195,21 @@ class RouteViewSet(ModelViewSet):
         return super().list(request, *args, **kwargs)
 
 
-class CrewViewSet(ModelViewSet):
+class CrewViewSet(TimedSerializerMixin, ModelViewSet):
     queryset = Crew.objects.all()
     serializer_class = CrewSerializer
     pagination_class = DefaultPagination
     permission_classes = (IsAdminUser,)
 
 
-class TrainTypeViewSet(ModelViewSet):
+class TrainTypeViewSet(TimedSerializerMixin, ModelViewSet):
     queryset = TrainType.objects.all()
     serializer_class = TrainTypeSerializer
     pagination_class = DefaultPagination
     permission_classes = (IsAdminUser,)
 
 
-class TrainViewSet(ModelViewSet):
+class TrainViewSet(TimedSerializerMixin, CachedListMixin, ModelViewSet):
     queryset = Train.objects.select_related("train_type")
     serializer_class = TrainSerializer
     pagination_class = DefaultPagination
@@ -186,6 +230,13 @@ class TrainViewSet(ModelViewSet):
 
         return queryset.distinct()
 
+    def initialize_request(self, request, *args, **kwargs):
+        if self.action_map.get(request.method.lower()) == "upload_image":
+            # Stream the image to disk and stop it at the limits
+            request.upload_handlers = [TrainImageUploadHandler(request)]
+
+        return super().initialize_request(request, *args, **kwargs)
+
     def get_serializer_class(self):
         if self.action == "list":
             return TrainListSerializer
@@ -193,8 +244,69 @@ class TrainViewSet(ModelViewSet):
         if self.action == "retrieve":
             return TrainDetailSerializer
 
+        if self.action == "upload_image":
+            return TrainImageSerializer
+
         return self.serializer_class
 
+    def save_image(self, train, data):
+        serializer = self.get_serializer(train, data=data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def upload_image_chunk(self, request, train):
+        start, end, total = parse_content_range(request.headers.get("Content-Range"))
+        check_upload_size(total)
+
+        upload = PartialUpload(train.id, request.user.id)
+        if start is not None:
+            upload.append(request.stream, start, end)
+
+        offset = upload.offset
+        if offset > total:
+            upload.delete()
+            raise ValidationError({"Content-Range": ["The stored upload is larger than the total size."]})
+
+        if offset < total:
+            headers = {"Range": f"bytes=0-{offset - 1}"} if offset else {}
+            return Response({"offset": offset}, status=status.HTTP_202_ACCEPTED, headers=headers)
+
+        _, params = parse_header_parameters(request.headers.get("Content-Disposition", ""))
+        name = os.path.basename(params.get("filename", "")) or "image"
+        try:
+            with upload.open(name) as image:
+                return self.save_image(train, {"image": image})
+        finally:
+            upload.delete()
+
+    @extend_schema(
+        request={"multipart/form-data": TrainImageSerializer},
+        parameters=[
+            OpenApiParameter(
+                "Content-Range",
+                type=str,
+                location=OpenApiParameter.HEADER,
+                description="Resumable PUT of raw image bytes, answers 202 with the stored offset "
+                            "until complete (ex. bytes 0-1048575/5242880, bytes */5242880)",
+                required=False,
+            )
+        ],
+    )
+    @action(
+        methods=["POST", "PUT"],
+        detail=True,
+        url_path="upload-image",
+        parser_classes=(MultiPartParser,),
+    )
+    def upload_image(self, request, pk=None):
+        """Upload an image to the train as multipart form data or in Content-Range chunks"""
+        train = self.get_object()
+        if request.method == "PUT":
+            return self.upload_image_chunk(request, train)
+
+        return self.save_image(train, request.data)
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -215,18 +327,13 @@ class TrainViewSet(ModelViewSet):
         return super().list(request, *args, **kwargs)
 
 
-class JourneyViewSet(ModelViewSet):
+class JourneyViewSet(TimedSerializerMixin, ReplicaReadMixin, ModelViewSet):
     queryset = (Journey.objects
-                .select_related("train", "route")
-                .prefetch_related("crew")
-                .annotate(
-                    tickets_available=(
-                            F("train__cargo_num") * F("train__places_in_cargo")
-                            - Count("tickets")
-                    )
-                ))
+                .select_related("train__train_type", "route__source", "route__destination")
+                .defer("seat_map")
+                .with_tickets_available())
     serializer_class = JourneySerializer
-    pagination_class = DefaultPagination
+    pagination_class = JourneyPagination
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
 
     def get_permissions(self):
@@ -243,32 +350,12 @@ class JourneyViewSet(ModelViewSet):
 
     def get_queryset(self):
         """Retrieve the journeys with filters"""
-        source = self.request.query_params.get("source")
-        destination = self.request.query_params.get("destination")
-        train = self.request.query_params.get("train")
-        departure_date = self.request.query_params.get("departure_date")
-        arrival_date = self.request.query_params.get("arrival_date")
-
-        queryset = self.queryset
-
-        if source:
-            queryset = queryset.filter(route__source__name__icontains=source)
-
-        if destination:
-            queryset = queryset.filter(route__destination__name__icontains=destination)
-
-        if train:
-            queryset = queryset.filter(train__name__icontains=train)
+        queryset = filter_journeys(self.queryset, self.request.query_params)
 
-        if departure_date:
-            departure_time = datetime.strptime(departure_date, "%Y-%m-%d").date()
-            queryset = queryset.filter(departure_time__date=departure_time)
-
-        if arrival_date:
-            arrival_time = datetime.strptime(arrival_date, "%Y-%m-%d").date()
-            queryset = queryset.filter(arrival_time__date=arrival_time)
+        if self.action == "retrieve":
+            queryset = queryset.prefetch_related("crew", "tickets")
 
-        return queryset.distinct()
+        return queryset
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -277,8 +364,173 @@ class JourneyViewSet(ModelViewSet):
         if self.action == "retrieve":
             return JourneyDetailSerializer
 
+        if self.action == "import_timetable":
+            return TimetableImportSerializer
+
         return self.serializer_class
 
+    def serialize_itinerary(self, itinerary, journeys):
+        if itinerary is None:
+            return None
+
+        return {
+            "departure_time": itinerary.departure_time,
+            "arrival_time": itinerary.arrival_time,
+            "transfers": len(itinerary.legs) - 1,
+            "legs": [
+                serialized(JourneyListSerializer(journeys[leg.journey_id]))
+                for leg in itinerary.legs
+            ],
+        }
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "source",
+                type=int,
+                description="Id of the departure station (ex. ?source=1)",
+                required=True,
+            ),
+            OpenApiParameter(
+                "destination",
+                type=int,
+                description="Id of the arrival station (ex. ?destination=2)",
+                required=True,
+            ),
+            OpenApiParameter(
+                "date",
+                type=datetime,
+                description="Departure date (ex. ?date=2023-10-22)",
+                required=True,
+            ),
+            OpenApiParameter(
+                "min_transfer",
+                type=int,
+                description="Minimum minutes between two legs (ex. ?min_transfer=15)",
+                required=False,
+            ),
+            OpenApiParameter(
+                "max_transfers",
+                type=int,
+                description="Maximum number of transfers, up to 5 (ex. ?max_transfers=3)",
+                required=False,
+            ),
+        ]
+    )
+    @action(detail=False, methods=["get"])
+    def connections(self, request):
+        """Find the earliest-arrival and fewest-transfer itineraries between two stations"""
+        serializer = ConnectionSearchSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        if request.user.is_authenticated:
+            # Itineraries may continue through the following day
+            for day in (data["date"], data["date"] + timedelta(days=1)):
+                materialize_day(day)
+
+        min_transfer = settings.CONNECTION_MIN_TRANSFER
+        if "min_transfer" in data:
+            min_transfer = timedelta(minutes=data["min_transfer"])
+
+        earliest_arrival, fewest_transfers = find_connections(
+            data["source"].id,
+            data["destination"].id,
+            data["date"],
+            min_transfer,
+            data["max_transfers"],
+        )
+
+        journey_ids = {
+            leg.journey_id
+            for itinerary in (earliest_arrival, fewest_transfers) if itinerary
+            for leg in itinerary.legs
+        }
+        journeys = self.queryset.in_bulk(journey_ids)
+
+        return Response(
+            {
+                "earliest_arrival": self.serialize_itinerary(earliest_arrival, journeys),
+                "fewest_transfers": self.serialize_itinerary(fewest_transfers, journeys),
+            }
+        )
+
+    @extend_schema(request={"multipart/form-data": TimetableImportSerializer})
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        parser_classes=(MultiPartParser,),
+    )
+    def import_timetable(self, request):
+        """Create journeys in bulk from a CSV or JSON lines timetable file"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        try:
+            result = import_timetable(
+                data["file"],
+                data["format"],
+                dry_run=data["dry_run"],
+                max_rows=settings.TIMETABLE_IMPORT_MAX_ROWS,
+            )
+        except TimetableError as error:
+            raise ValidationError({"file": [str(error)]})
+
+        return Response(
+            {
+                "created": result.created,
+                "error_count": len(result.errors),
+                "errors": [
+                    {"line": line_number, "error": error}
+                    for line_number, error in result.errors[:MAX_REPORTED_ERRORS]
+                ],
+            }
+        )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "encoding",
+                type=str,
+                enum=["base64", "rle"],
+                description="Encoding of the seat map (ex. ?encoding=rle)",
+                required=False,
+            )
+        ]
+    )
+    @action(detail=True, methods=["get"], url_path="seat-map")
+    def seat_map(self, request, pk=None):
+        """Return sold seats as a bitmap, one bit per seat, cargo after cargo"""
+        journey = get_object_or_404(
+            Journey.objects.values(
+                "id", "seat_map", "seat_map_layout", "train__cargo_num", "train__places_in_cargo"
+            ),
+            pk=pk,
+        )
+        cargo_num = journey["train__cargo_num"]
+        places_in_cargo = journey["train__places_in_cargo"]
+        seat_map = journey_seat_map(
+            journey["id"], cargo_num, places_in_cargo, journey["seat_map"], journey["seat_map_layout"]
+        )
+
+        encoding = request.query_params.get("encoding", "base64")
+        if encoding == "rle":
+            seats = encode_runs(seat_map, cargo_num, places_in_cargo)
+        else:
+            encoding = "base64"
+            seats = encode_base64(seat_map)
+
+        return Response(
+            {
+                "cargo_num": cargo_num,
+                "places_in_cargo": places_in_cargo,
+                "encoding": encoding,
+                "seats": seats,
+            }
+        )
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -314,25 +566,55 @@ class JourneyViewSet(ModelViewSet):
         ]
     )
     def list(self, request, *args, **kwargs):
+        # Templates have journeys on every day, signed in users' searches
+        # create those of days not materialized yet
+        if request.user.is_authenticated:
+            materialize_searched_day(request.query_params.get("departure_date"))
         return super().list(request, *args, **kwargs)
 
 
-class OrderViewSet(ModelViewSet):
-    queryset = Order.objects.prefetch_related(
-        "tickets__journey__route", "tickets__journey__train"
-    )
-    serializer_class = OrderSerializer
+class JourneyTemplateViewSet(TimedSerializerMixin, ModelViewSet):
+    queryset = JourneyTemplate.objects.select_related("route", "train").prefetch_related("crew")
+    serializer_class = JourneyTemplateSerializer
     pagination_class = DefaultPagination
+    permission_classes = (IsAdminUser,)
+
+    def perform_update(self, serializer):
+        reconcile_template(serializer.save())
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        unsold_journeys(instance).delete()
+        instance.delete()
+
+
+class OrderViewSet(TimedSerializerMixin, ModelViewSet):
+    queryset = Order.objects.prefetch_related("tickets")
+    serializer_class = OrderSerializer
+    pagination_class = OrderPagination
     permission_classes = (IsAuthenticated,)
+    throttle_scopes = {"create": "booking"}
 
     def get_queryset(self):
         creation_date = self.request.query_params.get("creation_date")
         if not self.request.user.is_staff:
-            self.queryset = self.queryset.filter(user=self.request.user)
+            self.queryset = self.queryset.filter(user_id=self.request.user.id)
 
         if creation_date:
-            creation_date = datetime.strptime(creation_date, "%Y-%m-%d").date()
-            self.queryset = self.queryset.filter(created_at__date=creation_date)
+            start, end = day_range(creation_date)
+            self.queryset = self.queryset.filter(created_at__gte=start, created_at__lt=end)
+
+        if self.action == "list":
+            # The list nests each ticket's journey with its route stations and train
+            self.queryset = self.queryset.prefetch_related(
+                Prefetch(
+                    "tickets__journey",
+                    queryset=(Journey.objects
+                              .select_related("train", "route__source", "route__destination")
+                              .defer("seat_map")
+                              .with_tickets_available()),
+                )
+            )
 
         return self.queryset
 
@@ -343,7 +625,7 @@ class OrderViewSet(ModelViewSet):
         return OrderSerializer
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        serializer.save(user_id=self.request.user.id)
 
     @extend_schema(
         parameters=[
@@ -357,3 +639,102 @@ class OrderViewSet(ModelViewSet):
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
+
+
+class SeatHoldViewSet(
+    TimedSerializerMixin,
+    mixins.ListModelMixin,
+    mixins.DestroyModelMixin,
+    GenericViewSet,
+):
+    queryset = SeatHold.objects.all()
+    serializer_class = SeatHoldSerializer
+    pagination_class = DefaultPagination
+    permission_classes = (IsAuthenticated,)
+    throttle_scopes = {"create": "booking", "auto_assign": "booking"}
+
+    def get_queryset(self):
+        """Retrieve the active holds of the current user"""
+        return active_holds().filter(user_id=self.request.user.id)
+
+    def get_serializer_class(self):
+        if self.action == "create":
+            return SeatHoldCreateSerializer
+
+        if self.action == "auto_assign":
+            return SeatAutoAssignSerializer
+
+        return self.serializer_class
+
+    def create(self, request, *args, **kwargs):
+        """Hold the given seats of a journey for a short time"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            holds = hold_seats(
+                request.user.id,
+                serializer.validated_data["journey"],
+                [(seat["cargo"], seat["seat"]) for seat in serializer.validated_data["seats"]],
+            )
+
+        return Response(serialized(SeatHoldSerializer(holds, many=True)), status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["post"], url_path="auto-assign")
+    def auto_assign(self, request):
+        """Pick and hold the requested number of adjacent free seats"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            holds = hold_adjacent_seats(
+                request.user.id,
+                serializer.validated_data["journey"],
+                serializer.validated_data["count"],
+            )
+
+        return Response(serialized(SeatHoldSerializer(holds, many=True)), status=status.HTTP_201_CREATED)
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter(
+            "from",
+            type=datetime,
+            description="First day to export (ex. ?from=2023-10-01)",
+            required=False,
+        ),
+        OpenApiParameter(
+            "to",
+            type=datetime,
+            description="Last day to export (ex. ?to=2023-10-31)",
+            required=False,
+        ),
+        OpenApiParameter(
+            "output",
+            type=str,
+            enum=list(OUTPUTS),
+            description="Export format, csv by default (ex. ?output=ndjson)",
+            required=False,
+        ),
+    ],
+    responses={(200, media_type): OpenApiTypes.STR for media_type in OUTPUTS.values()},
+)
+class ExportViewSet(ReplicaReadMixin, GenericViewSet):
+    """Stream every order, ticket or journey of a date range for accounting"""
+    permission_classes = (IsAdminUser,)
+
+    @action(detail=False, methods=["get"])
+    def orders(self, request):
+        """Orders by creation date"""
+        return export_response("orders", request)
+
+    @action(detail=False, methods=["get"])
+    def tickets(self, request):
+        """Tickets by the creation date of their order"""
+        return export_response("tickets", request)
+
+    @action(detail=False, methods=["get"])
+    def journeys(self, request):
+        """Journeys by departure date"""
+        return export_response("journeys", request)
@@ -0,0 +1,107 @@
+"""
+Stateless JWT authentication.
+
+Tokens carry the is_staff and is_active flags of the user and the user's
+token_version, so a request is authenticated from its token without
+loading the user row. Saving a user with a changed password, is_active,
+is_staff or is_superuser bumps token_version, which turns every token
+issued before into a revoked one. The current versions are kept in a
+small per-process cache for TOKEN_VERSION_CACHE_SECONDS, so a revoked
+token stops working at the latest that long after the change. Single
+tokens revoked on logout or refresh are checked in user.revocation.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from user.revocation import is_revoked
+
+VERSION_CLAIM = "token_version"
+
+# Version of users that are inactive or deleted, no token matches it
+REVOKED = -1
+
+# Entries kept before the cache is emptied, bounds its memory
+TOKEN_VERSION_CACHE_SIZE = 10000
+
+
+def token_claims(user):
+    return {
+        "is_staff": user.is_staff,
+        "is_active": user.is_active,
+        VERSION_CLAIM: user.token_version,
+    }
+
+
+def load_token_version(user_id):
+    version = (
+        get_user_model().objects
+        .filter(pk=user_id, is_active=True)
+        .values_list("token_version", flat=True)
+        .first()
+    )
+    return REVOKED if version is None else version
+
+
+class TokenVersions:
+    """Current token versions of users, each trusted for TOKEN_VERSION_CACHE_SECONDS"""
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            cached = self._versions.get(user_id)
+        if cached is not None and now - cached[0] < settings.TOKEN_VERSION_CACHE_SECONDS:
+            return cached[1]
+
+        version = load_token_version(user_id)
+        with self._lock:
+            if len(self._versions) >= TOKEN_VERSION_CACHE_SIZE:
+                self._versions.clear()
+            self._versions[user_id] = (now, version)
+        return version
+
+    def forget(self, user_id):
+        with self._lock:
+            self._versions.pop(user_id, None)
+
+
+token_versions = TokenVersions()
+
+
+def check_token_version(token):
+    """Raise AuthenticationFailed if the user changed since the token was issued"""
+    user_id = token[api_settings.USER_ID_CLAIM]
+    if token.get(VERSION_CLAIM) != token_versions.get(user_id):
+        raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """Build request.user from the token claims instead of the users table"""
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if is_revoked(validated_token):
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+        return validated_token
+
+    def get_user(self, validated_token):
+        if VERSION_CLAIM not in validated_token:
+            # Issued before the claims were added
+            return super().get_user(validated_token)
+
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        check_token_version(validated_token)
+        return TokenUser(validated_token)
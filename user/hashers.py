@@ -0,0 +1,162 @@
+"""
+Password hashing.
+
+Passwords are hashed with scrypt, or Argon2 when PASSWORD_HASHER=argon2
+and argon2-cffi is installed, with the cost parameters from the settings.
+Hashes of another algorithm or of older parameters are upgraded the next
+time the user logs in.
+
+Hashing and checking passwords of users runs in a small thread pool of
+PASSWORD_HASHING_WORKERS threads, so however many logins arrive at once
+they use at most that many cores and leave the rest to the other
+endpoints. Up to PASSWORD_HASHING_QUEUE_SIZE more wait for a free
+thread, further ones are answered with 429 and Retry-After.
+
+The pool only bounds one process, so across all of them at most
+PASSWORD_HASHING_MAX_CONCURRENT hashing calls run or wait at once. Each
+takes one of that many slot keys in the shared cache with cache.add(),
+which only one caller can win, and deletes it when done; a slot left by a
+killed worker expires after HASHING_SLOT_TIMEOUT seconds.
+
+Only the API views with LimitedHashingMixin, which turn HashingBusy into
+a 429, are limited. The admin, management commands like createsuperuser
+and changepassword, and any other caller hash in their own thread.
+"""
+import random
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import Throttled
+
+# Seconds a client turned away by a full pool is asked to wait
+RETRY_AFTER = 1
+
+# Seconds a slot of the shared limit is held at most, far above one hash
+HASHING_SLOT_TIMEOUT = 30
+
+SLOT_KEY = "password_hashing:slot:{}"
+
+_limited = ContextVar("password_hashing_limited", default=False)
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    def __init__(self):
+        self.work_factor = settings.PASSWORD_SCRYPT_WORK_FACTOR
+        self.block_size = settings.PASSWORD_SCRYPT_BLOCK_SIZE
+        self.parallelism = settings.PASSWORD_SCRYPT_PARALLELISM
+        # OpenSSL refuses more than 32 MB by default, scrypt needs 128 * n * r * p bytes
+        self.maxmem = 2 * 128 * self.work_factor * self.block_size * self.parallelism
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    def __init__(self):
+        self.time_cost = settings.PASSWORD_ARGON2_TIME_COST
+        self.memory_cost = settings.PASSWORD_ARGON2_MEMORY_COST
+        self.parallelism = settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class HashingBusy(Throttled):
+    default_detail = _("Too many logins in progress.")
+    default_code = "hashing_busy"
+
+
+class HashingPool:
+    """Threads for password hashing with a cap on the calls waiting for them"""
+
+    def __init__(self, workers, queue_size):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hashing")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def run(self, function, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy(wait=RETRY_AFTER)
+        try:
+            return self._executor.submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = HashingPool(
+                settings.PASSWORD_HASHING_WORKERS, settings.PASSWORD_HASHING_QUEUE_SIZE
+            )
+    return _pool
+
+
+@contextmanager
+def hashing_slot():
+    """Hold one of the PASSWORD_HASHING_MAX_CONCURRENT slots shared by all processes"""
+    slots = settings.PASSWORD_HASHING_MAX_CONCURRENT
+    if not slots:
+        yield
+        return
+
+    # Start at a random slot, so concurrent callers don't all try the same keys first
+    first = random.randrange(slots)
+    for offset in range(slots):
+        key = SLOT_KEY.format((first + offset) % slots)
+        if cache.add(key, 1, HASHING_SLOT_TIMEOUT):
+            break
+    else:
+        raise HashingBusy(wait=RETRY_AFTER)
+
+    try:
+        yield
+    finally:
+        cache.delete(key)
+
+
+@contextmanager
+def limited_hashing():
+    """Hash in the pool and under the shared limit, raising HashingBusy when they are full"""
+    token = _limited.set(True)
+    try:
+        yield
+    finally:
+        _limited.reset(token)
+
+
+class LimitedHashingMixin:
+    """Limit the password hashing of the view's requests, answering 429 when busy"""
+
+    def dispatch(self, request, *args, **kwargs):
+        with limited_hashing():
+            return super().dispatch(request, *args, **kwargs)
+
+
+def run_hashing(function, *args):
+    if not _limited.get():
+        return function(*args)
+
+    with hashing_slot():
+        if settings.PASSWORD_HASHING_WORKERS:
+            return get_pool().run(function, *args)
+        return function(*args)
+
+
+def make_password(password):
+    return run_hashing(hashers.make_password, password)
+
+
+def check_and_upgrade(password, encoded):
+    upgrades = []
+    is_correct = hashers.check_password(password, encoded, upgrades.append)
+    return is_correct, hashers.make_password(password) if upgrades else None
+
+
+def verify_password(password, encoded):
+    """Check the password in the pool, return whether it is correct and its upgraded hash or None"""
+    return run_hashing(check_and_upgrade, password, encoded)
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from user.models import RevokedToken
+
+
+class Command(BaseCommand):
+    help = "Delete revoked tokens that have expired anyway"
+
+    def handle(self, *args, **options):
+        purged, _ = RevokedToken.objects.filter(expires_at__lte=aware_utcnow()).delete()
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} expired revoked token(s)"))
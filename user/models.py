@@ -2,6 +2,8 @@ from django.db import models
 from django.utils.translation import gettext as _
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 
+from user.hashers import make_password, verify_password
+
 
 class UserManager(BaseUserManager):
     """Define a model manager for User model with no username field."""
@@ -42,8 +44,33 @@ class User(AbstractUser):
 
     username = None
     email = models.EmailField(_("email address"), unique=True)
+    token_version = models.PositiveIntegerField(default=0, editable=False)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
     objects = UserManager()
+
+    def set_password(self, raw_password):
+        self.password = make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """Check the password in the hashing pool, upgrade an outdated hash"""
+        is_correct, upgraded = verify_password(raw_password, self.password)
+        if upgraded:
+            # Not a password change, tokens of the user stay valid
+            self.password = upgraded
+            self.save(update_fields=["password"])
+        return is_correct
+
+
+class RevokedToken(models.Model):
+    """A JWT that must not be accepted again before it expires"""
+
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.jti} (until {self.expires_at})"
@@ -0,0 +1,161 @@
+"""
+Revoked JWT list.
+
+Revoked token ids (JTIs) are stored in the database until the token
+expires. Every process keeps a bloom filter of them, synced with the rows
+created since shortly before the last sync at most every
+REVOCATION_SYNC_SECONDS and rebuilt from the unexpired rows every
+REBUILD_SECONDS, so expired entries drop out. Ids are not used to find
+new rows, since a row can commit after one with a higher id was already
+synced; each sync reads SYNC_OVERLAP back instead and skips the JTIs
+already in the filter. A token missing from the filter is not revoked, which
+is the answer for nearly every request and takes a few microseconds.
+Only filter hits, the revoked tokens and rare false positives, are
+looked up in the exact set of confirmed revoked tokens and then in the
+database.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import aware_utcnow, datetime_from_epoch
+
+from user.models import RevokedToken
+
+# False positive rate of the filter at its capacity
+ERROR_RATE = 0.001
+
+# Seconds between rebuilds of the filter without the expired tokens
+REBUILD_SECONDS = 60 * 60
+
+# Rows created this long before the last sync are read again at the next
+# one, longer than a revoking transaction takes to commit plus the clock
+# difference between the app servers
+SYNC_OVERLAP = timedelta(minutes=1)
+
+
+class BloomFilter:
+    """Set membership with false positives but no false negatives"""
+
+    def __init__(self, capacity, error_rate=ERROR_RATE):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for position in self.positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(key))
+
+
+class RevocationList:
+    """The bloom filter of revoked JTIs of this process and its sync with the database"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filter = None
+        self._count = 0
+        self._confirmed = set()
+        self._last_synced_at = None
+        self._synced_at = -math.inf
+        self._rebuilt_at = -math.inf
+
+    def sync(self):
+        now = time.monotonic()
+        if now - self._synced_at < settings.REVOCATION_SYNC_SECONDS:
+            return
+
+        with self._lock:
+            if now - self._synced_at < settings.REVOCATION_SYNC_SECONDS:
+                return
+
+            synced_at = aware_utcnow()
+            if (
+                self._filter is None
+                or now - self._rebuilt_at >= REBUILD_SECONDS
+                or self._count > self._filter.capacity
+            ):
+                self._rebuild()
+                self._rebuilt_at = now
+            else:
+                self._add_rows(RevokedToken.objects.filter(
+                    created_at__gte=self._last_synced_at - SYNC_OVERLAP
+                ))
+            self._last_synced_at = synced_at
+            self._synced_at = now
+
+    def _rebuild(self):
+        rows = list(self._unexpired(RevokedToken.objects.all()))
+        self._filter = BloomFilter(max(settings.REVOCATION_BLOOM_CAPACITY, 2 * len(rows)))
+        self._count = 0
+        self._confirmed = set()
+        self._add(rows)
+
+    def _add_rows(self, queryset):
+        self._add(self._unexpired(queryset))
+
+    def _add(self, jtis):
+        for jti in jtis:
+            # Rows of the overlap were added by the previous sync
+            if jti not in self._filter:
+                self._filter.add(jti)
+                self._count += 1
+
+    @staticmethod
+    def _unexpired(queryset):
+        return queryset.filter(expires_at__gt=aware_utcnow()).values_list("jti", flat=True)
+
+    def add(self, jti):
+        """Know about a token this process revoked before the next sync"""
+        self.sync()
+        with self._lock:
+            self._filter.add(jti)
+            self._confirmed.add(jti)
+
+    def __contains__(self, jti):
+        self.sync()
+        if jti not in self._filter:
+            return False
+        if jti in self._confirmed:
+            return True
+
+        revoked = RevokedToken.objects.filter(jti=jti, expires_at__gt=aware_utcnow()).exists()
+        if revoked:
+            with self._lock:
+                self._confirmed.add(jti)
+        return revoked
+
+
+revocation_list = RevocationList()
+
+
+def is_revoked(token):
+    jti = token.get(api_settings.JTI_CLAIM)
+    return jti is not None and jti in revocation_list
+
+
+def revoke(token):
+    """Revoke the token until it expires, return False if it was revoked already"""
+    jti = token[api_settings.JTI_CLAIM]
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(jti=jti, expires_at=datetime_from_epoch(token["exp"]))
+    except IntegrityError:
+        return False
+
+    revocation_list.add(jti)
+    return True
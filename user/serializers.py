@@ -1,6 +1,13 @@
 from django.contrib.auth import get_user_model, authenticate
 from rest_framework import serializers
 from django.utils.translation import gettext as _
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_api_settings
+from rest_framework_simplejwt.tokens import RefreshToken, UntypedToken
+
+from user.authentication import VERSION_CLAIM, check_token_version, token_claims
+from user.revocation import is_revoked, revoke
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -53,3 +60,60 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs["user"] = user
         return attrs
+
+
+class TokenObtainPairSerializer(jwt_serializers.TokenObtainPairSerializer):
+    """Issue tokens carrying the claims StatelessJWTAuthentication needs"""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for claim, value in token_claims(user).items():
+            token[claim] = value
+        return token
+
+
+def check_refresh_token(refresh):
+    if is_revoked(refresh):
+        raise InvalidToken(_("Token has been revoked"))
+
+    if VERSION_CLAIM in refresh:
+        try:
+            check_token_version(refresh)
+        except AuthenticationFailed as error:
+            raise InvalidToken(error.detail)
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        check_refresh_token(refresh)
+
+        # A rotated token is used once, the insert fails for a concurrent reuse
+        if jwt_api_settings.ROTATE_REFRESH_TOKENS and not revoke(refresh):
+            raise InvalidToken(_("Token has been revoked"))
+
+        return super().validate(attrs)
+
+
+class TokenVerifySerializer(jwt_serializers.TokenVerifySerializer):
+    def validate(self, attrs):
+        if is_revoked(UntypedToken(attrs["token"])):
+            raise serializers.ValidationError(_("Token has been revoked"))
+
+        return super().validate(attrs)
+
+
+class TokenRevokeSerializer(serializers.Serializer):
+    refresh = serializers.CharField(write_only=True)
+
+    def validate(self, attrs):
+        try:
+            attrs["refresh"] = RefreshToken(attrs["refresh"])
+        except TokenError as error:
+            raise InvalidToken(error.args[0])
+
+        return attrs
+
+    def save(self, **kwargs):
+        revoke(self.validated_data["refresh"])
@@ -0,0 +1,49 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from user.authentication import token_versions
+
+# Token claims, a change revokes the tokens issued before
+CLAIM_FIELDS = ("is_active", "is_staff", "is_superuser")
+
+
+def password_changed(instance, previous):
+    # set_password() keeps the raw password until the save, a hash upgrade
+    # on login stores a new hash of the same password and clears it
+    return previous["password"] != instance.password and instance._password is not None
+
+
+@receiver(pre_save, sender=get_user_model())
+def bump_token_version(sender, instance, **kwargs):
+    """Revoke the user's tokens when their claims or password change"""
+    instance._token_version_bumped = False
+    if not instance.pk:
+        return
+
+    previous = sender.objects.filter(pk=instance.pk).values("password", *CLAIM_FIELDS).first()
+    if previous is None:
+        return
+
+    if password_changed(instance, previous) or any(
+        previous[field] != getattr(instance, field) for field in CLAIM_FIELDS
+    ):
+        instance.token_version += 1
+        instance._token_version_bumped = True
+
+
+@receiver(post_save, sender=get_user_model())
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    if (
+        instance._token_version_bumped
+        and update_fields is not None
+        and "token_version" not in update_fields
+    ):
+        sender.objects.filter(pk=instance.pk).update(token_version=instance.token_version)
+
+    token_versions.forget(instance.pk)
+
+
+@receiver(post_delete, sender=get_user_model())
+def user_deleted(sender, instance, **kwargs):
+    token_versions.forget(instance.pk)
@@ -0,0 +1,120 @@
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from user.hashers import SLOT_KEY, HashingBusy, HashingPool
+from train_station.tests.api_urls import *
+
+TOKEN_URL = reverse("user:token_obtain_pair")
+
+
+class HashingPoolTests(TestCase):
+    def test_runs_in_pool_threads(self):
+        pool = HashingPool(1, 0)
+
+        self.assertTrue(pool.run(lambda: threading.current_thread().name).startswith("hashing"))
+
+    def test_full_pool_turns_calls_away(self):
+        pool = HashingPool(1, 0)
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait()
+
+        blocked = threading.Thread(target=pool.run, args=(block,))
+        blocked.start()
+        started.wait()
+        try:
+            with self.assertRaises(HashingBusy):
+                pool.run(str)
+        finally:
+            release.set()
+            blocked.join()
+
+        self.assertEqual(pool.run(str), "")
+
+
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com",
+            "test_password"
+        )
+
+    def login(self):
+        return self.client.post(TOKEN_URL, {"email": "test@test.com", "password": "test_password"})
+
+    def test_new_passwords_use_scrypt(self):
+        self.assertEqual(identify_hasher(self.user.password).algorithm, "scrypt")
+        self.assertTrue(self.user.check_password("test_password"))
+        self.assertFalse(self.user.check_password("wrong_password"))
+
+    def test_login_upgrades_hash(self):
+        tokens = self.login().data
+        self.user.password = make_password("test_password", hasher="pbkdf2_sha256")
+        self.user.save()
+
+        res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(identify_hasher(self.user.password).algorithm, "scrypt")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        self.assertEqual(self.client.get(STATION_URL).status_code, status.HTTP_200_OK)
+
+    def test_login_storm_gets_retry_after(self):
+        pool = HashingPool(1, 0)
+        pool._slots.acquire()
+
+        with mock.patch("user.hashers._pool", pool):
+            res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res["Retry-After"], "1")
+
+    @override_settings(PASSWORD_HASHING_MAX_CONCURRENT=1)
+    def test_logins_share_a_limit_across_processes(self):
+        cache.add(SLOT_KEY.format(0), 1)
+
+        res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res["Retry-After"], "1")
+
+        cache.delete(SLOT_KEY.format(0))
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.assertIsNone(cache.get(SLOT_KEY.format(0)))
+
+    @override_settings(PASSWORD_HASHING_MAX_CONCURRENT=1)
+    def test_hashing_outside_the_api_is_not_limited(self):
+        pool = HashingPool(1, 0)
+        pool._slots.acquire()
+        cache.add(SLOT_KEY.format(0), 1)
+
+        with mock.patch("user.hashers._pool", pool):
+            self.user.set_password("new_password")
+            self.assertTrue(self.user.check_password("new_password"))
+
+    def test_admin_login_is_not_limited(self):
+        get_user_model().objects.create_superuser("admin@test.com", "admin_password")
+        pool = HashingPool(1, 0)
+        pool._slots.acquire()
+
+        with mock.patch("user.hashers._pool", pool):
+            res = self.client.post(
+                reverse("admin:login"),
+                {"username": "admin@test.com", "password": "admin_password"},
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_302_FOUND)
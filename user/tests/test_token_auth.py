@@ -0,0 +1,99 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from train_station.tests.api_urls import *
+
+TOKEN_URL = reverse("user:token_obtain_pair")
+TOKEN_REFRESH_URL = reverse("user:token_refresh")
+ME_URL = reverse("user:manage")
+
+
+class StatelessTokenAuthTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com",
+            "test_password"
+        )
+        self.tokens = self.obtain_tokens()
+        self.authorize(self.tokens["access"])
+
+    def obtain_tokens(self):
+        return self.client.post(
+            TOKEN_URL, {"email": "test@test.com", "password": "test_password"}
+        ).data
+
+    def authorize(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    def user_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [query["sql"] for query in queries if '"user_user"' in query["sql"]]
+
+    def test_reads_skip_the_users_table(self):
+        self.assertEqual(len(self.user_queries(STATION_URL)), 1)
+
+        self.assertEqual(self.user_queries(JOURNEY_URL), [])
+        self.assertEqual(self.user_queries(ROUTE_URL), [])
+
+    def test_staff_claim(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.authorize(self.obtain_tokens()["access"])
+
+        res = self.client.post(STATION_URL, {"name": "Lviv", "latitude": 49.8, "longitude": 24.0})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_deactivated_user_is_rejected(self):
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(STATION_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_revokes_tokens(self):
+        self.user.set_password("new_password")
+        self.user.save()
+
+        self.assertEqual(self.client.get(STATION_URL).status_code, status.HTTP_401_UNAUTHORIZED)
+        res = self.client.post(TOKEN_REFRESH_URL, {"refresh": self.tokens["refresh"]})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_rehash_keeps_tokens(self):
+        self.user.password = make_password("test_password")
+        self.user.save(update_fields=["password"])
+
+        self.assertEqual(self.client.get(STATION_URL).status_code, status.HTTP_200_OK)
+
+    def test_refresh_keeps_claims(self):
+        res = self.client.post(TOKEN_REFRESH_URL, {"refresh": self.tokens["refresh"]})
+        self.authorize(res.data["access"])
+
+        self.assertEqual(self.client.get(STATION_URL).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.user_queries(STATION_URL), [])
+
+    def test_tokens_without_claims_load_the_user(self):
+        self.authorize(str(RefreshToken.for_user(self.user).access_token))
+
+        self.assertEqual(len(self.user_queries(STATION_URL)), 1)
+        self.assertEqual(len(self.user_queries(STATION_URL)), 1)
+
+    def test_own_account(self):
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["email"], "test@test.com")
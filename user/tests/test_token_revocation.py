@@ -0,0 +1,132 @@
+import datetime
+import io
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from user.models import RevokedToken
+from user.revocation import BloomFilter, RevocationList
+from train_station.tests.api_urls import *
+
+TOKEN_URL = reverse("user:token_obtain_pair")
+TOKEN_REFRESH_URL = reverse("user:token_refresh")
+TOKEN_VERIFY_URL = reverse("user:token_verify")
+TOKEN_REVOKE_URL = reverse("user:token_revoke")
+
+
+def revoked_token(**params):
+    defaults = {
+        "jti": uuid.uuid4().hex,
+        "expires_at": aware_utcnow() + datetime.timedelta(days=1),
+    }
+    defaults.update(params)
+
+    return RevokedToken.objects.create(**defaults)
+
+
+class BloomFilterTests(TestCase):
+    def test_no_false_negatives_and_few_false_positives(self):
+        bloom = BloomFilter(1000, error_rate=0.01)
+        keys = [uuid.uuid4().hex for _ in range(1000)]
+        for key in keys:
+            bloom.add(key)
+
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+@override_settings(REVOCATION_SYNC_SECONDS=0)
+class RevocationListTests(TestCase):
+    def test_rows_of_other_processes_are_synced(self):
+        revocation_list = RevocationList()
+        self.assertNotIn("abc", revocation_list)
+
+        revoked_token(jti="abc")
+
+        self.assertIn("abc", revocation_list)
+
+    def test_rows_committed_out_of_order_are_synced(self):
+        earlier = revoked_token(jti="earlier")
+        later = revoked_token(jti="later")
+        earlier.delete()
+        revocation_list = RevocationList()
+        self.assertIn("later", revocation_list)
+
+        # Commits after the row with the higher id was synced
+        RevokedToken.objects.create(
+            id=earlier.id, jti="earlier", expires_at=earlier.expires_at
+        )
+        RevokedToken.objects.filter(id=earlier.id).update(created_at=later.created_at)
+
+        self.assertIn("earlier", revocation_list)
+        self.assertEqual(revocation_list._count, 2)
+
+    def test_expired_tokens_are_left_out(self):
+        revoked_token(jti="expired", expires_at=aware_utcnow() - datetime.timedelta(minutes=1))
+
+        self.assertNotIn("expired", RevocationList())
+
+    def test_unknown_tokens_are_checked_in_memory(self):
+        revoked_token(jti="abc")
+        revocation_list = RevocationList()
+        revocation_list.sync()
+
+        with self.settings(REVOCATION_SYNC_SECONDS=60), self.assertNumQueries(0):
+            self.assertNotIn(uuid.uuid4().hex, revocation_list)
+
+    def test_purge_command(self):
+        revoked_token(expires_at=aware_utcnow() - datetime.timedelta(minutes=1))
+        revoked_token()
+        stdout = io.StringIO()
+
+        call_command("purge_revoked_tokens", stdout=stdout)
+
+        self.assertIn("Purged 1 expired revoked token(s)", stdout.getvalue())
+        self.assertEqual(RevokedToken.objects.count(), 1)
+
+
+class TokenRevocationApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        get_user_model().objects.create_user("test@test.com", "test_password")
+        self.tokens = self.client.post(
+            TOKEN_URL, {"email": "test@test.com", "password": "test_password"}
+        ).data
+
+    def test_rotated_refresh_token_is_used_once(self):
+        res = self.client.post(TOKEN_REFRESH_URL, {"refresh": self.tokens["refresh"]})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        reused = self.client.post(TOKEN_REFRESH_URL, {"refresh": self.tokens["refresh"]})
+        self.assertEqual(reused.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        rotated = self.client.post(TOKEN_REFRESH_URL, {"refresh": res.data["refresh"]})
+        self.assertEqual(rotated.status_code, status.HTTP_200_OK)
+
+    def test_revoke_logs_out(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+
+        res = self.client.post(TOKEN_REVOKE_URL, {"refresh": self.tokens["refresh"]})
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.assertEqual(self.client.get(STATION_URL).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials()
+        res = self.client.post(TOKEN_REFRESH_URL, {"refresh": self.tokens["refresh"]})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        res = self.client.post(TOKEN_VERIFY_URL, {"token": self.tokens["access"]})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_revoke_invalid_token(self):
+        res = self.client.post(TOKEN_REVOKE_URL, {"refresh": "invalid"})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
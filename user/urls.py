@@ -1,17 +1,14 @@
 from django.urls import path
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-    TokenVerifyView
-)
+from rest_framework_simplejwt.views import TokenRefreshView, TokenVerifyView
 
-from user.views import CreateUserView, ManageUserView
+from user.views import CreateUserView, ManageUserView, RevokeTokenView, TokenObtainPairView
 
 urlpatterns = [
     path("register/", CreateUserView.as_view(), name="create"),
     path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("token/verify/", TokenVerifyView.as_view(), name="token_verify"),
+    path("token/revoke/", RevokeTokenView.as_view(), name="token_revoke"),
     path("me/", ManageUserView.as_view(), name="manage"),
 ]
 
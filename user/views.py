@@ -1,16 +1,41 @@
-from rest_framework import generics
+from django.contrib.auth import get_user_model
+from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework_simplejwt import views as jwt_views
 
-from user.serializers import UserSerializer
+from user.hashers import LimitedHashingMixin
+from user.revocation import revoke
+from user.serializers import UserSerializer, TokenRevokeSerializer
 
 
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(LimitedHashingMixin, generics.CreateAPIView):
     serializer_class = UserSerializer
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(LimitedHashingMixin, generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
     permission_classes = (IsAuthenticated,)
 
     def get_object(self):
-        return self.request.user
+        # request.user is built from the token and has no user row behind it
+        return get_user_model().objects.get(pk=self.request.user.id)
+
+
+class TokenObtainPairView(LimitedHashingMixin, jwt_views.TokenObtainPairView):
+    pass
+
+
+class RevokeTokenView(generics.GenericAPIView):
+    """Log out: revoke the refresh token and the access token sent with the request"""
+    serializer_class = TokenRevokeSerializer
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        if request.auth is not None:
+            revoke(request.auth)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)